@@ -0,0 +1,123 @@
+import argparse, json, sqlite3, time, yaml, numpy as np, pandas as pd
+from pathlib import Path
+from sklearn.model_selection import train_test_split
+from config import DB_SNAPSHOT_PATH, DEFAULT_CONFIG_PATH
+from ml_helpers.vectorizers import build_vectorizer_from_cfg
+from ml_helpers.cosine_knn import SparseCosineKNN
+from ml_helpers.ann_knn import IVFCosineKNN
+
+
+def load_dataset(cfg : dict, *, limit : int | None = None) -> tuple[pd.DataFrame, np.ndarray]:
+    with sqlite3.connect(DB_SNAPSHOT_PATH) as conn:
+        df = pd.read_sql(cfg["data"]["sql"], conn)
+    if limit:
+        df = df.sample(n=min(limit, len(df)), random_state=42)
+    y = df["label"].astype(int).to_numpy()
+    return df.drop(columns=["label"]), y
+
+
+def recall_at_k(ind_approx : np.ndarray, ind_exact : np.ndarray) -> float:
+    hits = [len(np.intersect1d(a, e)) for a, e in zip(ind_approx, ind_exact)]
+    return float(np.sum(hits) / ind_exact.size)
+
+
+def single_query_latency(model, X, n : int) -> dict[str, float]:
+    times = []
+    for i in range(min(n, X.shape[0])):
+        row = X[i]
+        t0 = time.perf_counter()
+        model.predict(row)
+        times.append(time.perf_counter() - t0)
+    ms = np.asarray(times) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)), "mean_ms": float(ms.mean())}
+
+
+def run(cfg : dict, *, n_neighbors : int, n_lists : int, n_probes : list[int], limit : int | None, n_single : int) -> dict:
+    df_X, y = load_dataset(cfg, limit=limit)
+    X_train_df, X_test_df, y_train, y_test = train_test_split(df_X, y, test_size=0.15, random_state=42, stratify=y)
+
+    feat = build_vectorizer_from_cfg(cfg)
+    X_train = feat.fit_transform(X_train_df, y_train)
+    X_test = feat.transform(X_test_df)
+
+    exact = SparseCosineKNN(n_neighbors=n_neighbors).fit(X_train, y_train)
+    t0 = time.perf_counter()
+    _, ind_exact = exact.kneighbors(X_test)
+    pred_exact = exact.predict(X_test)
+    exact_batch = time.perf_counter() - t0
+
+    report = {
+        "n_train": int(X_train.shape[0]),
+        "n_test": int(X_test.shape[0]),
+        "n_features": int(X_train.shape[1]),
+        "n_neighbors": n_neighbors,
+        "exact": {
+            "batch_s": exact_batch,
+            "accuracy": float((pred_exact == y_test).mean()),
+            "single": single_query_latency(exact, X_test, n_single),
+        },
+        "ivf": [],
+    }
+
+    for n_probe in n_probes:
+        t0 = time.perf_counter()
+        ann = IVFCosineKNN(n_neighbors=n_neighbors, n_lists=n_lists, n_probe=n_probe).fit(X_train, y_train)
+        fit_s = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        _, ind = ann.kneighbors(X_test)
+        pred = ann.predict(X_test)
+        batch_s = time.perf_counter() - t0
+
+        report["ivf"].append({
+            "n_lists": n_lists,
+            "n_probe": n_probe,
+            "fit_s": fit_s,
+            "batch_s": batch_s,
+            "recall_at_k": recall_at_k(ind, ind_exact),
+            "agreement": float((pred == pred_exact).mean()),
+            "accuracy": float((pred == y_test).mean()),
+            "single": single_query_latency(ann, X_test, n_single),
+        })
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recall/latency: IVFCosineKNN vs exact cosine kNN")
+    parser.add_argument("--config", type=Path, default=DEFAULT_CONFIG_PATH)
+    parser.add_argument("--n-neighbors", type=int, default=15)
+    parser.add_argument("--n-lists", type=int, default=64)
+    parser.add_argument("--n-probe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    parser.add_argument("--limit", type=int, default=None, help="случайная подвыборка строк датасета")
+    parser.add_argument("--n-single", type=int, default=200, help="сколько одиночных запросов для p50/p95")
+    parser.add_argument("--out", type=Path, default=None, help="куда сохранить JSON-отчёт")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+
+    report = run(
+        cfg,
+        n_neighbors=args.n_neighbors,
+        n_lists=args.n_lists,
+        n_probes=args.n_probe,
+        limit=args.limit,
+        n_single=args.n_single,
+    )
+
+    ex = report["exact"]
+    print(f"train={report['n_train']} test={report['n_test']} features={report['n_features']} k={report['n_neighbors']}")
+    print(f"exact: batch {ex['batch_s']:.3f}s, single p50 {ex['single']['p50_ms']:.2f}ms, acc {ex['accuracy']:.4f}")
+    for r in report["ivf"]:
+        print(
+            f"ivf n_probe={r['n_probe']:>3}: batch {r['batch_s']:.3f}s, single p50 {r['single']['p50_ms']:.2f}ms, "
+            f"recall@k {r['recall_at_k']:.4f}, agreement {r['agreement']:.4f}, acc {r['accuracy']:.4f}"
+        )
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+import hashlib, random, re, sqlite3, time, yaml
+from dataclasses import dataclass
+from pathlib import Path
+from config import DB_SNAPSHOT_PATH, TEMPLATES_YAML_PATH
+from processing_cpp import strip_cpp_comments
+
+
+# ошибка cl для шаблонов db/templates.yaml: код, идентификатор из сообщения (плейсхолдер шаблона или литерал) и текст.
+# Строка ошибки — первая строка исходника, где встречается этот идентификатор
+TEMPLATE_ERRORS = {
+    "Объявите переменную <IDENT_1> перед использованием": ("C2065", "<IDENT>", "undeclared identifier"),
+    "Подключите заголовок <INDENT_1> \"#include <<INDENT_1>>\"": ("C2065", "queue", "undeclared identifier"),
+    "Объявите функцию <IDENT_1> перед использованием": ("C3861", "<FUNC_NAME>", "identifier not found"),
+}
+
+@dataclass(frozen=True)
+class Sample:
+    source_code : str
+    error_text : str
+    error_line : int
+    origin : str            # "template:<номер шаблона>.<имя паттерна>" или "training_data:<id>"
+    label : int | None = None
+
+
+def source_key(source_code : str) -> str:
+    # ключ по исходнику после strip_cpp_comments — именно его получает компилятор в Recommender
+    return hashlib.sha256(strip_cpp_comments(source_code).encode("utf-8")).hexdigest()
+
+
+def _expand(source : str, placeholders : dict[str, list[str]], rng : random.Random) -> tuple[str, dict[str, str]]:
+    # как db.scripts.generate_data.generate_source_from_pattern, но с собственным генератором: корпус воспроизводим по seed
+    values = {}
+    for name, options in placeholders.items():
+        token = f"<{name}>"
+        if token in source:
+            values[name] = rng.choice(options)
+            source = source.replace(token, values[name])
+    return source, values
+
+
+def _error_line(source_code : str, ident : str) -> int:
+    word = re.compile(rf"(?<![\w]){re.escape(ident)}(?![\w])")
+    for i, line in enumerate(strip_cpp_comments(source_code).splitlines(), start=1):
+        if word.search(line):
+            return i
+    return 1
+
+
+def template_samples(n : int, *, seed : int = 0, path : str | Path = TEMPLATES_YAML_PATH) -> list[Sample]:
+    """
+    n уникальных исходников из паттернов db/templates.yaml (шаблоны и паттерны по кругу, плейсхолдеры — из seed)
+    с ошибкой, которую для них выдал бы cl (TEMPLATE_ERRORS). Шаблоны без описания ошибки пропускаются
+    """
+    rng = random.Random(seed)
+    config = yaml.safe_load(Path(path).read_text(encoding="utf-8"))
+    patterns = [
+        (t_idx, pattern, TEMPLATE_ERRORS[entry["template"]])
+        for t_idx, entry in enumerate(config)
+        if entry.get("template") in TEMPLATE_ERRORS
+        for pattern in entry["patterns"]
+    ]
+    if not patterns:
+        raise ValueError(f"No templates with known errors in {path}")
+
+    samples, seen = [], set()
+    # число различных подстановок конечно: после стольких повторов подряд новых исходников уже не будет
+    misses, max_misses = 0, 50 * n
+    while len(samples) < n and misses < max_misses:
+        # паттерны по кругу; исчерпанный паттерн сдвигает круг на следующий
+        t_idx, pattern, (code, ident, message) = patterns[(len(samples) + misses) % len(patterns)]
+        source_code, values = _expand(pattern["source"], pattern.get("placeholders", {}) or {}, rng)
+        key = source_key(source_code)
+        if key in seen:
+            misses += 1
+            continue
+        seen.add(key)
+        misses = 0
+        name = values.get(ident[1:-1], ident) if ident.startswith("<") else ident
+        samples.append(Sample(
+            source_code=source_code,
+            error_text=f"{code}: '{name}': {message}",
+            error_line=_error_line(source_code, name),
+            origin=f"template:{t_idx}.{pattern['name']}",
+            label=t_idx,
+        ))
+    return samples
+
+
+def training_data_samples(n : int, *, seed : int = 0, db_path : str | Path = DB_SNAPSHOT_PATH) -> list[Sample]:
+    """
+    Случайные (по seed) n строк training_data с ошибкой, которую выдал настоящий cl при разметке
+    """
+    with sqlite3.connect(db_path) as conn:
+        ids = [row[0] for row in conn.execute("SELECT training_data_id FROM training_data ORDER BY training_data_id")]
+        picked = sorted(random.Random(seed).sample(ids, min(n, len(ids))))
+        rows = []
+        for i in range(0, len(picked), 500):
+            chunk = picked[i:i + 500]
+            rows += conn.execute(
+                f"SELECT training_data_id, source_code, error_text, error_line, label FROM training_data "
+                f"WHERE training_data_id IN ({','.join('?' * len(chunk))}) ORDER BY training_data_id",
+                chunk,
+            ).fetchall()
+    return [
+        Sample(source_code=src, error_text=err, error_line=int(line), origin=f"training_data:{tid}", label=int(label))
+        for tid, src, err, line, label in rows
+    ]
+
+
+def build_corpus(n_templates : int, *, n_db : int = 0, seed : int = 0, db_path : str | Path = DB_SNAPSHOT_PATH) -> list[Sample]:
+    samples = template_samples(n_templates, seed=seed)
+    if n_db:
+        samples += training_data_samples(n_db, seed=seed, db_path=db_path)
+    return samples
+
+
+class StandInCompiler:
+    """
+    Детерминированная замена compile_get_error_info для Linux без MSVC: ответ по ключу исходника из корпуса,
+    для незнакомых исходников — (None, None), как для кода без ошибок.
+    latency_ms — искусственная задержка вызова (чтобы приблизить полный путь к реальному cl)
+    """
+    def __init__(self, samples : list[Sample], *, latency_ms : float = 0.0) -> None:
+        self.latency_ms = latency_ms
+        self.answers = {source_key(s.source_code): (s.error_text, s.error_line) for s in samples}
+
+    def __call__(self, source_code : str) -> tuple[str | None, int | None]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        key = hashlib.sha256(source_code.encode("utf-8")).hexdigest()
+        return self.answers.get(key, (None, None))
@@ -0,0 +1,213 @@
+import argparse, json, platform, sqlite3, subprocess, tempfile, time, joblib, sklearn, yaml, numpy as np, pandas as pd
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable
+from sklearn.pipeline import Pipeline
+from config import DB_PATH, DB_SNAPSHOT_PATH, DEFAULT_CONFIG_PATH, PROJECT_ROOT, SCHEMA_SQL_PATH, SEED_SQL_PATH
+from ml_app.normalize_data import build_features_from_ctx, error_tokenizer
+from ml_app.recommender import Recommender, extract_features
+from ml_helpers.cosine_knn import SparseCosineKNN
+from ml_helpers.vectorizers import build_vectorizer_from_cfg
+from processing_cpp import safe_extract_context, strip_cpp_comments
+from .corpus import Sample, StandInCompiler, build_corpus
+
+
+def latency_stats(seconds : list[float]) -> dict[str, float]:
+    ms = np.asarray(seconds) * 1000
+    total = float(np.sum(seconds))
+    return {
+        "n": len(seconds),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "max_ms": float(ms.max()),
+        "throughput_per_s": len(seconds) / total if total else 0.0,
+    }
+
+
+def _measure(fn : Callable, args : list[tuple], *, repeat : int, warmup : int) -> list[float]:
+    for a in args[:warmup]:
+        fn(*a)
+    times = []
+    for _ in range(repeat):
+        for a in args:
+            t0 = time.perf_counter()
+            fn(*a)
+            times.append(time.perf_counter() - t0)
+    return times
+
+
+def _model_row(row : dict[str, Any]) -> dict[str, Any]:
+    # строка для sklearn-модели: списки и словари признаков — JSON-строками, как в training_data
+    return {k: v if isinstance(v, str) else json.dumps(v, ensure_ascii=False) for k, v in row.items()}
+
+
+def _fit_model(samples : list[Sample], rows : list[dict[str, Any]], cfg : dict, out : Path) -> Path:
+    """
+    Модель для замера, если --model не задан: векторизатор из конфига + косинусный kNN на строках корпуса.
+    Метки — номера шаблонов, поэтому её ответы не имеют смысла, только задержки
+    """
+    X = pd.DataFrame([_model_row(r) for r in rows])
+    y = np.asarray([s.label if s.label is not None else -1 for s in samples])
+    pipe = Pipeline([("feat", build_vectorizer_from_cfg(cfg)), ("clf", SparseCosineKNN(n_neighbors=min(15, len(y))))]).fit(X, y)
+    out.mkdir(parents=True, exist_ok=True)
+    joblib.dump(pipe, out / "model.joblib")
+    meta = {"name": "benchmark", "versions": {"sklearn": sklearn.__version__}, "model": {"classes": pipe.classes_.tolist()}}
+    (out / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    return out
+
+
+def _recommendations_db(db_path : Path, tmp : Path) -> Path:
+    if db_path.exists():
+        return db_path
+    # без db/app.db таблица рекомендаций собирается из schema.sql и seed.sql
+    path = tmp / "app.db"
+    with sqlite3.connect(path) as conn:
+        conn.executescript(SCHEMA_SQL_PATH.read_text(encoding="utf-8"))
+        conn.executescript(SEED_SQL_PATH.read_text(encoding="utf-8"))
+    return path
+
+
+def _git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(
+    cfg : dict,
+    *,
+    n_templates : int = 300,
+    n_db : int = 0,
+    seed : int = 0,
+    repeat : int = 3,
+    warmup : int = 20,
+    compile_ms : float = 0.0,
+    model_dir : Path | None = None,
+    db_path : Path = DB_PATH,
+    snapshot_path : Path = DB_SNAPSHOT_PATH,
+) -> dict[str, Any]:
+    """
+    Задержки стадий пути strip -> compile -> safe_extract_context -> build_features_from_ctx / error_tokenizer ->
+    predict и всего Recommender.analyze (get_recommendation в UI) на воспроизводимом корпусе.
+    Компилятор — StandInCompiler (ответы корпуса с задержкой compile_ms), поэтому замер идёт без MSVC
+    """
+    samples = build_corpus(n_templates, n_db=n_db, seed=seed, db_path=snapshot_path)
+    compiler = StandInCompiler(samples, latency_ms=compile_ms)
+    stripped = [strip_cpp_comments(s.source_code) for s in samples]
+    contexts = [safe_extract_context(src, s.error_line, with_macros=True, radius=2) for src, s in zip(stripped, samples)]
+    rows = [extract_features(src, s.error_text, s.error_line) for src, s in zip(stripped, samples)]
+
+    model_name = str(model_dir) if model_dir else "fitted on corpus"
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        model_dir = model_dir or _fit_model(samples, rows, cfg, tmp / "model")
+        recommender = Recommender(model_dir, db_path=_recommendations_db(Path(db_path), tmp), cfg=cfg, compile_fn=compiler)
+
+        stage_args = {
+            "strip": (strip_cpp_comments, [(s.source_code,) for s in samples]),
+            "compile": (compiler, [(src,) for src in stripped]),
+            "extract_context": (lambda src, line: safe_extract_context(src, line, with_macros=True, radius=2),
+                                [(src, s.error_line) for src, s in zip(stripped, samples)]),
+            "features": (build_features_from_ctx, [(ctx,) for ctx in contexts]),
+            "error_tokenizer": (error_tokenizer, [(s.error_text,) for s in samples]),
+            "predict": (lambda row: recommender.predict_rows([row]), [(row,) for row in rows]),
+            "get_recommendation": (recommender.analyze, [(s.source_code,) for s in samples]),
+        }
+        stages = {name: latency_stats(_measure(fn, args, repeat=repeat, warmup=warmup)) for name, (fn, args) in stage_args.items()}
+
+        # пачкой: весь корпус одним вызовом predict_rows
+        batch = _measure(recommender.predict_rows, [(rows,)], repeat=repeat, warmup=1)
+        stages["predict_batch"] = {**latency_stats(batch), "throughput_per_s": len(rows) * repeat / float(np.sum(batch))}
+        paths = Counter(recommender.analyze(s.source_code)["path"] for s in samples)
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "git": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sklearn": sklearn.__version__,
+            "seed": seed,
+            "repeat": repeat,
+            "compile_ms": compile_ms,
+            "model": model_name,
+        },
+        "corpus": {
+            "n_samples": len(samples),
+            "origins": dict(Counter(s.origin.split(":")[0] for s in samples)),
+            "empty_contexts": sum(1 for ctx in contexts if not ctx),
+            "paths": dict(paths),
+        },
+        "stages": stages,
+    }
+
+
+def compare(report : dict, baseline : dict, *, key : str = "p50_ms") -> dict[str, dict[str, float]]:
+    """
+    Изменение key по стадиям относительно прошлого прогона: (текущее - прошлое) / прошлое
+    """
+    out = {}
+    for name, cur in report["stages"].items():
+        prev = baseline.get("stages", {}).get(name)
+        if prev and prev.get(key):
+            out[name] = {"baseline": prev[key], "current": cur[key], "change": (cur[key] - prev[key]) / prev[key]}
+    return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Задержки и пропускная способность стадий пути исходник -> рекомендация на синтетическом корпусе")
+    parser.add_argument("--config", type=Path, default=DEFAULT_CONFIG_PATH)
+    parser.add_argument("--templates", type=int, default=300, help="исходников из db/templates.yaml")
+    parser.add_argument("--db-samples", type=int, default=0, help="исходников из training_data (db/app.snapshot.db)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="проходов по корпусу на стадию")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--compile-ms", type=float, default=0.0, help="искусственная задержка компилятора-заглушки")
+    parser.add_argument("--no-rules", action="store_true", help="без разметочных функций (serving.rules): полный путь всегда через модель")
+    parser.add_argument("--model", type=Path, default=None, help="директория модели; по умолчанию kNN, обученный на корпусе")
+    parser.add_argument("--db", type=Path, default=DB_PATH, help="БД с таблицей recommendations")
+    parser.add_argument("--out", type=Path, default=None, help="куда сохранить JSON-отчёт")
+    parser.add_argument("--baseline", type=Path, default=None, help="JSON прошлого прогона для сравнения p50")
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    if args.no_rules:
+        cfg.setdefault("serving", {}).setdefault("rules", {})["enabled"] = False
+
+    report = run(
+        cfg,
+        n_templates=args.templates,
+        n_db=args.db_samples,
+        seed=args.seed,
+        repeat=args.repeat,
+        warmup=args.warmup,
+        compile_ms=args.compile_ms,
+        model_dir=args.model,
+        db_path=args.db,
+    )
+
+    print(f"samples={report['corpus']['n_samples']} paths={report['corpus']['paths']} git={report['meta']['git']}")
+    for name, s in report["stages"].items():
+        print(
+            f"{name:<20} p50 {s['p50_ms']:8.3f}ms  p95 {s['p95_ms']:8.3f}ms  p99 {s['p99_ms']:8.3f}ms  "
+            f"{s['throughput_per_s']:10.1f}/s"
+        )
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        report["compare"] = compare(report, baseline)
+        for name, c in report["compare"].items():
+            print(f"{name:<20} p50 {c['baseline']:8.3f}ms -> {c['current']:8.3f}ms ({c['change']:+.1%})")
+
+    if args.out:
+        args.out.parent.mkdir(parents=True, exist_ok=True)
+        args.out.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
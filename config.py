@@ -6,6 +6,7 @@ DB_DIR = PROJECT_ROOT / "db"
 DB_SCRIPTS_DIR = DB_DIR / "scripts"
 DB_PATH = DB_DIR / "app.db"
 DB_SNAPSHOT_PATH = DB_DIR / "app.snapshot.db"
+REPLAY_DB_PATH = DB_DIR / "compile_replay.db"
 SCHEMA_SQL_PATH = DB_DIR / "schema.sql"
 SEED_SQL_PATH = DB_DIR / "seed.sql"
 TEMPLATES_YAML_PATH = DB_DIR / "templates.yaml"
@@ -14,6 +15,10 @@ DEFAULT_CONFIG_PATH = NOTEBOOKS_DIR / "default.yaml"
 PROCESSING_CPP_DIR = PROJECT_ROOT / "processing_cpp"
 BUILD_DIR = PROCESSING_CPP_DIR / "build_tmp"
 MODELS_DIR = PROJECT_ROOT / "models"
+FEATURE_STORE_DIR = PROJECT_ROOT / "feature_store"
+PIPELINE_CACHE_DIR = PROJECT_ROOT / "sk_cache"
+CV_RESULTS_DB_PATH = PROJECT_ROOT / "cv_results.db"
 TEMP_OUTPUT_DIR = PROJECT_ROOT / "temp_output"
+PROFILES_DIR = PROJECT_ROOT / "profiles"
 PARQUETS_DIR = NOTEBOOKS_DIR / "parquets"
 CTX_JSONLS_DIR = NOTEBOOKS_DIR / "ctx_jsonls"
\ No newline at end of file
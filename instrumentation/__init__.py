@@ -0,0 +1,24 @@
+from .metrics import ENABLED, REGISTRY, MetricsRegistry, Histogram, SnapshotWriter, stage, timed, cache_event, call_collecting, reset_metrics, start_snapshots_from_env
+
+from .profiling import ProfileSession, profile_request, profiled, configure_profiling, collapsed_stacks, top_allocations
+
+
+__all__ = [
+    "ENABLED",
+    "REGISTRY",
+    "MetricsRegistry",
+    "Histogram",
+    "SnapshotWriter",
+    "stage",
+    "timed",
+    "cache_event",
+    "call_collecting",
+    "reset_metrics",
+    "start_snapshots_from_env",
+    "ProfileSession",
+    "profile_request",
+    "profiled",
+    "configure_profiling",
+    "collapsed_stacks",
+    "top_allocations",
+]
@@ -0,0 +1,278 @@
+import bisect, json, os, threading, time
+from contextlib import nullcontext
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable
+
+
+ENV_ENABLED = "TPPO_METRICS"
+ENV_SNAPSHOT_PATH = "TPPO_METRICS_SNAPSHOT"
+ENV_SNAPSHOT_INTERVAL = "TPPO_METRICS_INTERVAL_S"
+# границы корзин гистограммы, мс; последняя корзина (+Inf) неявная
+DEFAULT_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+PROMETHEUS_PREFIX = "tppo"
+
+def _env_flag(name : str) -> bool:
+    return os.environ.get(name, "").strip().lower() not in ("", "0", "false", "no", "off")
+
+
+ENABLED = _env_flag(ENV_ENABLED)
+_NULL = nullcontext()
+# сессия профилирования текущего потока (instrumentation.profiling): границы стадий нужны и ей
+_local = threading.local()
+
+class Histogram:
+    """
+    Гистограмма длительностей в мс с фиксированными корзинами (как histogram в Prometheus): counts[i] — наблюдения
+    не больше buckets[i], counts[-1] — больше последней границы
+    """
+    def __init__(self, buckets : tuple[float, ...] = DEFAULT_BUCKETS_MS) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms : float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.sum_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def quantile(self, q : float) -> float:
+        # верхняя граница корзины, в которую попадает квантиль; для хвоста за последней границей — максимум
+        if not self.count:
+            return 0.0
+        rank, acc = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank:
+                return float(self.buckets[i]) if i < len(self.buckets) else self.max_ms
+        return self.max_ms
+
+    def state(self) -> dict[str, Any]:
+        return {"counts": list(self.counts), "count": self.count, "sum_ms": self.sum_ms, "max_ms": self.max_ms}
+
+    def merge(self, state : dict[str, Any]) -> None:
+        self.counts = [a + b for a, b in zip(self.counts, state["counts"])]
+        self.count += state["count"]
+        self.sum_ms += state["sum_ms"]
+        self.max_ms = max(self.max_ms, state["max_ms"])
+
+
+class MetricsRegistry:
+    """
+    Длительности стадий запроса (гистограммы) и попадания в кеши. Потокобезопасен.
+    Из процессов пула состояние забирается pop_state() и добавляется в родительский реестр merge_state()
+    """
+    def __init__(self, buckets : tuple[float, ...] = DEFAULT_BUCKETS_MS) -> None:
+        self.buckets = buckets
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._stages : dict[str, Histogram] = {}
+        self._caches : dict[str, list[int]] = {}
+
+    def observe(self, stage : str, seconds : float) -> None:
+        with self._lock:
+            hist = self._stages.get(stage)
+            if hist is None:
+                hist = self._stages[stage] = Histogram(self.buckets)
+            hist.observe(seconds * 1000)
+
+    def cache(self, name : str, hit : bool) -> None:
+        with self._lock:
+            counts = self._caches.setdefault(name, [0, 0])
+            counts[0 if hit else 1] += 1
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                "timestamp": time.time(),
+                "uptime_s": time.time() - self.started_at,
+                "stages": {
+                    name: {
+                        "count": h.count,
+                        "mean_ms": h.sum_ms / h.count if h.count else 0.0,
+                        "p50_ms": h.quantile(0.5),
+                        "p95_ms": h.quantile(0.95),
+                        "p99_ms": h.quantile(0.99),
+                        "max_ms": h.max_ms,
+                    }
+                    for name, h in sorted(self._stages.items())
+                },
+                "caches": {
+                    name: {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+                    for name, (hits, misses) in sorted(self._caches.items())
+                },
+            }
+
+    def to_prometheus(self, prefix : str = PROMETHEUS_PREFIX) -> str:
+        """
+        Текстовый формат Prometheus (exposition format 0.0.4)
+        """
+        lines = [
+            f"# HELP {prefix}_stage_duration_seconds Duration of request stages",
+            f"# TYPE {prefix}_stage_duration_seconds histogram",
+        ]
+        with self._lock:
+            for name, h in sorted(self._stages.items()):
+                acc = 0
+                for bound, c in zip(h.buckets, h.counts):
+                    acc += c
+                    lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{name}",le="{bound / 1000:g}"}} {acc}')
+                lines.append(f'{prefix}_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {h.count}')
+                lines.append(f'{prefix}_stage_duration_seconds_sum{{stage="{name}"}} {h.sum_ms / 1000:.6f}')
+                lines.append(f'{prefix}_stage_duration_seconds_count{{stage="{name}"}} {h.count}')
+            lines += [
+                f"# HELP {prefix}_cache_requests_total Cache lookups by result",
+                f"# TYPE {prefix}_cache_requests_total counter",
+            ]
+            for name, (hits, misses) in sorted(self._caches.items()):
+                lines.append(f'{prefix}_cache_requests_total{{cache="{name}",result="hit"}} {hits}')
+                lines.append(f'{prefix}_cache_requests_total{{cache="{name}",result="miss"}} {misses}')
+        return "\n".join(lines) + "\n"
+
+    def pop_state(self) -> dict[str, Any]:
+        with self._lock:
+            state = {
+                "stages": {name: h.state() for name, h in self._stages.items()},
+                "caches": {name: list(c) for name, c in self._caches.items()},
+            }
+            self._stages.clear()
+            self._caches.clear()
+        return state
+
+    def merge_state(self, state : dict[str, Any]) -> None:
+        with self._lock:
+            for name, hs in state["stages"].items():
+                hist = self._stages.get(name)
+                if hist is None:
+                    hist = self._stages[name] = Histogram(self.buckets)
+                hist.merge(hs)
+            for name, (hits, misses) in state["caches"].items():
+                counts = self._caches.setdefault(name, [0, 0])
+                counts[0] += hits
+                counts[1] += misses
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stages.clear()
+            self._caches.clear()
+            self.started_at = time.time()
+
+    def write_snapshot(self, path : str | Path) -> Path:
+        # запись через временный файл: читатель не увидит наполовину записанный JSON
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(path.suffix + ".tmp")
+        tmp.write_text(json.dumps(self.snapshot(), ensure_ascii=False, indent=2), encoding="utf-8")
+        tmp.replace(path)
+        return path
+
+
+REGISTRY = MetricsRegistry()
+
+class _Stage:
+    __slots__ = ("name", "t0", "profile")
+
+    def __init__(self, name : str, profile = None) -> None:
+        self.name = name
+        self.profile = profile
+
+    def __enter__(self) -> "_Stage":
+        if self.profile is not None:
+            self.profile.stage_enter(self.name)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        elapsed = time.perf_counter() - self.t0
+        if self.profile is not None:
+            self.profile.stage_exit(self.name)
+        if ENABLED:
+            REGISTRY.observe(self.name, elapsed)
+
+
+def stage(name : str):
+    """
+    with stage("compile"): ... — длительность блока в гистограмму стадии (и границы стадии для профилирования);
+    без TPPO_METRICS и активной сессии профилирования — общий nullcontext
+    """
+    profile = getattr(_local, "profile", None)
+    if ENABLED or profile is not None:
+        return _Stage(name, profile)
+    return _NULL
+
+
+def timed(name : str) -> Callable:
+    """
+    Декоратор: вызов функции — стадия name. Без TPPO_METRICS функция возвращается как есть
+    """
+    def decorate(fn : Callable) -> Callable:
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                REGISTRY.observe(name, time.perf_counter() - t0)
+        return wrapper
+    return decorate
+
+
+def cache_event(name : str, hit : bool) -> None:
+    if ENABLED:
+        REGISTRY.cache(name, hit)
+
+
+def call_collecting(fn : Callable, *args) -> tuple[Any, dict[str, Any] | None]:
+    """
+    Для ProcessPoolExecutor: результат fn и метрики, накопленные в процессе пула (REGISTRY.merge_state в родителе)
+    """
+    result = fn(*args)
+    return result, REGISTRY.pop_state() if ENABLED else None
+
+
+def reset_metrics() -> None:
+    """
+    initializer для ProcessPoolExecutor: процесс, созданный через fork, наследует накопленное родителем состояние
+    """
+    REGISTRY.reset()
+
+
+class SnapshotWriter:
+    """
+    Фоновый поток, раз в interval_s записывающий REGISTRY.snapshot() в path
+    """
+    def __init__(self, path : str | Path, interval_s : float = 60.0, registry : MetricsRegistry = REGISTRY) -> None:
+        self.path = Path(path)
+        self.interval_s = interval_s
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.registry.write_snapshot(self.path)
+
+    def start(self) -> "SnapshotWriter":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.registry.write_snapshot(self.path)
+
+
+def start_snapshots_from_env() -> SnapshotWriter | None:
+    """
+    SnapshotWriter по TPPO_METRICS_SNAPSHOT (путь) и TPPO_METRICS_INTERVAL_S, если метрики включены
+    """
+    path = os.environ.get(ENV_SNAPSHOT_PATH)
+    if not ENABLED or not path:
+        return None
+    return SnapshotWriter(path, float(os.environ.get(ENV_SNAPSHOT_INTERVAL, "60"))).start()
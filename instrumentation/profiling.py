@@ -0,0 +1,270 @@
+import argparse, cProfile, io, itertools, json, os, pstats, random, threading, time, tracemalloc
+from collections import defaultdict
+from contextlib import nullcontext
+from functools import wraps
+from pathlib import Path
+from typing import Any, Callable
+from config import MODELS_DIR, PROFILES_DIR
+from . import metrics
+
+
+ENV_PROFILE = "TPPO_PROFILE"
+ENV_PROFILE_DIR = "TPPO_PROFILE_DIR"
+ENV_PROFILE_MEMORY = "TPPO_PROFILE_MEMORY"
+# глубина трассировки tracemalloc: хватает, чтобы дойти от libclang/sklearn до кода проекта
+TRACEMALLOC_FRAMES = 16
+TOP_ALLOCATIONS = 25
+_NULL = nullcontext()
+
+def _env_rate() -> float:
+    # TPPO_PROFILE=1 / true — каждый запрос, 0.01 — каждый сотый в среднем
+    value = os.environ.get(ENV_PROFILE, "").strip().lower()
+    if value in ("", "0", "false", "no", "off"):
+        return 0.0
+    if value in ("true", "yes", "on"):
+        return 1.0
+    return min(max(float(value), 0.0), 1.0)
+
+
+RATE = _env_rate()
+OUT_DIR = Path(os.environ.get(ENV_PROFILE_DIR) or PROFILES_DIR)
+TRACE_MEMORY = metrics._env_flag(ENV_PROFILE_MEMORY) if ENV_PROFILE_MEMORY in os.environ else True
+# профилировщик один на процесс: вложенные и параллельные запросы во время сессии не профилируются
+_busy = threading.Lock()
+_rng = random.Random()
+_seq = itertools.count()
+
+def configure_profiling(rate : float, out_dir : str | Path | None = None, *, memory : bool | None = None) -> None:
+    """
+    Включение профилирования из кода или флага CLI. Значения дублируются в окружение, чтобы их увидели
+    процессы пулов, запущенные через spawn
+    """
+    global RATE, OUT_DIR, TRACE_MEMORY
+    RATE = min(max(float(rate), 0.0), 1.0)
+    os.environ[ENV_PROFILE] = str(RATE)
+    if out_dir is not None:
+        OUT_DIR = Path(out_dir)
+        os.environ[ENV_PROFILE_DIR] = str(OUT_DIR)
+    if memory is not None:
+        TRACE_MEMORY = memory
+        os.environ[ENV_PROFILE_MEMORY] = "1" if memory else "0"
+
+
+def collapsed_stacks(profiler : cProfile.Profile) -> dict[str, float]:
+    """
+    Стеки в формате collapsed (flamegraph.pl, speedscope, inferno): "a;b;c" -> собственное время в мкс.
+    cProfile хранит только рёбра вызывающий -> вызываемый, поэтому стеки восстанавливаются обходом графа
+    от корней: время функции делится между её вызывающими пропорционально cumulative time по ребру.
+    Рекурсивные рёбра обрываются на повторе функции в стеке
+    """
+    stats = pstats.Stats(profiler).stats
+    children : dict[tuple, list[tuple[tuple, float]]] = defaultdict(list)
+    for func, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, ct) in callers.items():
+            children[caller].append((func, ct))
+
+    def label(func : tuple) -> str:
+        filename, line, name = func
+        if filename == "~":
+            return name
+        return f"{name} ({Path(filename).name}:{line})"
+
+    out : dict[str, float] = defaultdict(float)
+
+    def walk(func : tuple, share : float, path : tuple[str, ...], seen : frozenset) -> None:
+        _, _, tt, ct, _ = stats[func]
+        # ветки короче микросекунды во флеймграфе не видны, а число путей в графе вызовов растёт экспоненциально
+        if share < 1e-6 or ct <= 0:
+            return
+        scale = min(share / ct, 1.0)
+        path = path + (label(func),)
+        out[";".join(path)] += tt * scale * 1e6
+        for child, edge_ct in children.get(func, ()):
+            if child not in seen:
+                walk(child, edge_ct * scale, path, seen | {child})
+
+    roots = [func for func, (_, _, _, _, callers) in stats.items() if not callers]
+    for func in roots:
+        walk(func, stats[func][3], (), frozenset({func}))
+    return {stack: us for stack, us in out.items() if us >= 1}
+
+
+def top_allocations(before : tracemalloc.Snapshot, after : tracemalloc.Snapshot, top : int = TOP_ALLOCATIONS) -> list[dict[str, Any]]:
+    """
+    Строки кода с наибольшим приростом выделенной памяти между снимками
+    """
+    diff = [d for d in after.compare_to(before, "lineno") if d.size_diff > 0][:top]
+    return [
+        {
+            "location": f"{d.traceback[0].filename}:{d.traceback[0].lineno}",
+            "size_kib": round(d.size_diff / 1024, 1),
+            "count": d.count_diff,
+        }
+        for d in diff
+    ]
+
+
+def _snapshot() -> tracemalloc.Snapshot:
+    # собственные выделения tracemalloc и этого модуля в отчёт не попадают
+    return tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+
+
+class ProfileSession:
+    """
+    Профиль одного запроса или пачки: cProfile на весь блок и, если trace_memory, tracemalloc —
+    прирост памяти за весь блок и отдельно по стадиям instrumentation.stage внутри него.
+    На выходе в out_dir три файла с общим префиксом <время>_<name>_<pid>_<номер>:
+    .collapsed — стеки для флеймграфа, .prof — pstats (snakeviz, pstats.Stats), .alloc.json — топ выделений
+    """
+    def __init__(self, name : str, out_dir : str | Path = PROFILES_DIR, *, trace_memory : bool = True, top : int = TOP_ALLOCATIONS) -> None:
+        self.name = name
+        self.out_dir = Path(out_dir)
+        self.trace_memory = trace_memory
+        self.top = top
+        self.stages : dict[str, list[dict[str, Any]]] = {}
+        self.paths : dict[str, Path] = {}
+        self._stack : list[tracemalloc.Snapshot] = []
+        self._started_tracing = False
+
+    def stage_enter(self, stage : str) -> None:
+        if not self.trace_memory:
+            return
+        # снимок памяти не должен попасть во флеймграф
+        self.profiler.disable()
+        self._stack.append(_snapshot())
+        self.profiler.enable()
+
+    def stage_exit(self, stage : str) -> None:
+        if not self.trace_memory or not self._stack:
+            return
+        self.profiler.disable()
+        before = self._stack.pop()
+        self.stages.setdefault(stage, []).extend(top_allocations(before, _snapshot(), self.top))
+        self.profiler.enable()
+
+    def __enter__(self) -> "ProfileSession":
+        if self.trace_memory:
+            self._started_tracing = not tracemalloc.is_tracing()
+            if self._started_tracing:
+                tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._before = _snapshot()
+        metrics._local.profile = self
+        self.t0 = time.perf_counter()
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.profiler.disable()
+        self.seconds = time.perf_counter() - self.t0
+        metrics._local.profile = None
+        allocations = top_allocations(self._before, _snapshot(), self.top) if self.trace_memory else []
+        if self._started_tracing:
+            tracemalloc.stop()
+        self.write(allocations)
+
+    def write(self, allocations : list[dict[str, Any]]) -> dict[str, Path]:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        prefix = f"{time.strftime('%Y%m%d-%H%M%S')}_{self.name}_{os.getpid()}_{next(_seq)}"
+        stacks = collapsed_stacks(self.profiler)
+        collapsed = self.out_dir / f"{prefix}.collapsed"
+        collapsed.write_text("".join(f"{stack} {round(us)}\n" for stack, us in sorted(stacks.items())), encoding="utf-8")
+        prof = self.out_dir / f"{prefix}.prof"
+        self.profiler.dump_stats(prof)
+        self.paths = {"collapsed": collapsed, "prof": prof}
+        if self.trace_memory:
+            alloc = self.out_dir / f"{prefix}.alloc.json"
+            report = {"name": self.name, "seconds": round(self.seconds, 6), "total": allocations, "stages": self.stages}
+            alloc.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+            self.paths["alloc"] = alloc
+        return self.paths
+
+    def summary(self, limit : int = 20) -> str:
+        buf = io.StringIO()
+        pstats.Stats(self.profiler, stream=buf).sort_stats("cumulative").print_stats(limit)
+        return buf.getvalue()
+
+
+class _Guarded:
+    # сессия, которая держит _busy до конца блока
+    __slots__ = ("session",)
+
+    def __init__(self, session : ProfileSession) -> None:
+        self.session = session
+
+    def __enter__(self) -> ProfileSession:
+        try:
+            return self.session.__enter__()
+        except BaseException:
+            _busy.release()
+            raise
+
+    def __exit__(self, *exc) -> None:
+        try:
+            self.session.__exit__(*exc)
+        finally:
+            _busy.release()
+
+
+def profile_request(name : str):
+    """
+    with profile_request("analyze"): ... — с вероятностью TPPO_PROFILE блок профилируется (ProfileSession в TPPO_PROFILE_DIR).
+    Без TPPO_PROFILE, при проигрыше выборки или пока идёт другая сессия — общий nullcontext
+    """
+    if RATE <= 0.0 or (RATE < 1.0 and _rng.random() >= RATE):
+        return _NULL
+    if not _busy.acquire(blocking=False):
+        return _NULL
+    return _Guarded(ProfileSession(name, OUT_DIR, trace_memory=TRACE_MEMORY))
+
+
+def profiled(name : str) -> Callable:
+    """
+    Декоратор: каждый вызов функции — кандидат в выборку profile_request(name)
+    """
+    def decorate(fn : Callable) -> Callable:
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with profile_request(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Профиль анализа отдельных исходников: флеймграф (collapsed), pstats и топ выделений памяти по стадиям")
+    parser.add_argument("sources", type=Path, nargs="+", help=".cpp файлы")
+    parser.add_argument("--model", type=Path, default=None, help="директория модели (по умолчанию models/knn_cosine_1)")
+    parser.add_argument("--error", default=None, help="текст ошибки компилятора: без него исходник компилируется")
+    parser.add_argument("--line", type=int, default=None, help="строка ошибки вместе с --error")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--out", type=Path, default=OUT_DIR)
+    parser.add_argument("--no-memory", action="store_true", help="без tracemalloc: меньше искажение времени")
+    args = parser.parse_args()
+
+    # ml_app сам импортирует instrumentation через processing_cpp
+    from ml_app.recommender import Recommender, extract_features
+    recommender = Recommender(args.model or MODELS_DIR / "knn_cosine_1")
+    configure_profiling(1.0, args.out, memory=not args.no_memory)
+
+    for path in args.sources:
+        cpp_code = path.read_text(encoding="utf-8")
+        for _ in range(args.repeat):
+            with profile_request(path.stem) as session:
+                if args.error is None:
+                    result = recommender.analyze(cpp_code)
+                else:
+                    source_code = recommender.strip(cpp_code)
+                    label = recommender.rule_label(source_code, args.error, args.line)
+                    if label is None:
+                        label = int(recommender.predict_rows([extract_features(source_code, args.error, args.line)])[0])
+                    result = {"label": label}
+            print(json.dumps({"source": str(path), "seconds": round(session.seconds, 4), "label": result["label"],
+                              **{k: str(v) for k, v in session.paths.items()}}, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
-import traceback, threading, sqlite3, json, tkinter as tk, pandas as pd
+import os, traceback, threading, yaml, tkinter as tk
 from tkinter import ttk, font
 from tkinter.scrolledtext import ScrolledText
 from pygments import lex
 from pygments.lexers import CppLexer
 from pygments.token import Token
-from processing_cpp import compile_get_error_info, strip_cpp_comments, safe_extract_context, clear_build_tmp
-from .normalize_data import build_features_from_ctx, error_tokenizer
-from .import_model import load_sklearn_model_bundle
-from config import MODELS_DIR, DB_PATH
+from processing_cpp import clear_build_tmp
+from .recommender import Recommender
+from .service import ServiceClient
+from config import MODELS_DIR, DB_PATH, DEFAULT_CONFIG_PATH
 
 
 def enable_windows_dpi_awareness() -> None:
@@ -164,13 +164,14 @@ class CompileErrorAdvisorApp(tk.Tk):
         self._closing = threading.Event()
         self._worker_thread = None
 
-        bundle = load_sklearn_model_bundle(
-            MODELS_DIR / "knn_cosine_1",
-            strict_versions=False,
-            expected_steps=("feat", "clf"),
-        )
-        self.pipe = bundle.pipe
-        self.meta = bundle.meta
+        with open(DEFAULT_CONFIG_PATH, "r", encoding="utf-8") as f:
+            cfg = yaml.safe_load(f)
+        # с адресом сервиса (python -m ml_app.service) окно — только клиент, модель в процесс не загружается
+        service_url = os.environ.get("TPPO_SERVICE_URL") or ((cfg.get("serving", {}) or {}).get("service", {}) or {}).get("url")
+        if service_url:
+            self.recommender = ServiceClient(service_url)
+        else:
+            self.recommender = Recommender(MODELS_DIR / "knn_cosine_1", db_path=DB_PATH, cfg=cfg)
 
         self.title("ML C++ Compile Error Advisor")
         self.minsize(900, 600)
@@ -236,37 +237,7 @@ class CompileErrorAdvisorApp(tk.Tk):
 
 
     def get_recommendation(self, cpp_code : str) -> str:
-        source_code = strip_cpp_comments(cpp_code)
-        if not source_code:
-            return "Вставьте исходный C++ код, затем нажмите «Получить рекомендацию»"
-        
-        error_text, error_line = compile_get_error_info(source_code)
-        if not error_text or not error_line:
-            return "Вставленный код не имеет ошибок компиляции"
-
-        ctx = safe_extract_context(source_code, error_line, with_macros = True, radius = 2)
-
-        ctx_tokens, ctx_numeric = build_features_from_ctx(ctx)
-        error_text_tokens = error_tokenizer(error_text)
-
-        X = pd.DataFrame([{
-            "error_text_tokens": json.dumps(error_text_tokens, ensure_ascii=False),
-            "ctx_tokens": json.dumps(ctx_tokens, ensure_ascii=False),
-            "ctx_numeric": json.dumps(ctx_numeric, ensure_ascii=False),
-        }])
-
-        label = int(self.pipe.predict(X)[0])
-
-        with sqlite3.connect(DB_PATH) as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                            SELECT recommendation
-                            FROM recommendations
-                            WHERE recommendation_id = ?
-                        """, (label,))
-            row = cur.fetchone()
-
-        return row[0] if row else "Рекомендация для данного класса не найдена"
+        return self.recommender.recommend(cpp_code)
 
 
     def on_check_clicked(self) -> None:
@@ -1,9 +1,19 @@
 from .normalize_data import error_tokenizer, build_features_from_ctx
 from .import_model import load_sklearn_model_bundle
+from .flat_predictor import FlatPredictor, compile_pipeline, load_flat_predictor
+from .micro_batcher import MicroBatcher, make_micro_batcher
+from .rule_cascade import RuleCascade, make_rule_cascade
 
 
 __all__ = [
     "error_tokenizer",
     "build_features_from_ctx",
     "load_sklearn_model_bundle",
+    "FlatPredictor",
+    "compile_pipeline",
+    "load_flat_predictor",
+    "MicroBatcher",
+    "make_micro_batcher",
+    "RuleCascade",
+    "make_rule_cascade",
 ]
\ No newline at end of file
@@ -0,0 +1,51 @@
+import argparse, json, shutil, time, joblib
+from pathlib import Path
+from ml_helpers.compact_bundle import save_compact_bundle
+from ml_helpers.dawg_vocab import convert_vocabularies
+from .import_model import load_sklearn_model_bundle
+
+
+def convert_bundle(src : str | Path, out_dir : str | Path, *, bundle_format : str | None = None) -> list[dict]:
+    """
+    Переводит словари n-грамм модели из src в DAWG и сохраняет бандл в out_dir.
+    Формат сохранения по умолчанию тот же, что у исходного бандла (meta.json: bundle_format);
+    meta.json и report_test.txt копируются, в meta добавляется vocabulary: "dawg"
+    """
+    bundle = load_sklearn_model_bundle(src, mmap=False)
+    out = Path(out_dir)
+    if out.resolve() == bundle.root.resolve():
+        raise ValueError("out_dir должен отличаться от исходной директории модели")
+    out.mkdir(parents=True, exist_ok=True)
+
+    report = convert_vocabularies(bundle.pipe)
+    fmt = bundle_format or bundle.meta.get("bundle_format", "joblib")
+    if fmt == "compact":
+        save_compact_bundle(bundle.pipe, out)
+    elif fmt == "joblib":
+        joblib.dump(bundle.pipe, out / "model.joblib", compress=3)
+    else:
+        raise ValueError(f"Unsupported bundle format: {fmt!r}")
+
+    meta = dict(bundle.meta, bundle_format=fmt, vocabulary="dawg")
+    (out / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2), encoding="utf-8")
+    if bundle.report_test is not None:
+        shutil.copyfile(bundle.root / "report_test.txt", out / "report_test.txt")
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Перевод словарей TfidfVectorizer сохранённой модели в DAWG")
+    parser.add_argument("src", type=Path, help="директория модели (или путь к model.joblib)")
+    parser.add_argument("out", type=Path, help="куда сохранить сконвертированную модель")
+    parser.add_argument("--format", choices=["joblib", "compact"], default=None, help="по умолчанию как у исходной модели")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    report = convert_bundle(args.src, args.out, bundle_format=args.format)
+    for r in report:
+        print(f"{r['path']}: {r['n_terms']} терминов, DAWG {r['dawg_bytes'] / 2**20:.1f} МБ")
+    print(f"готово за {time.perf_counter() - t0:.1f}s -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
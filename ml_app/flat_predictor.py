@@ -0,0 +1,353 @@
+import argparse, json, sqlite3, time, yaml, numpy as np, pandas as pd, scipy.sparse as sp
+from pathlib import Path
+from typing import Any
+from sklearn.feature_extraction import DictVectorizer
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+from sklearn.feature_selection import SelectorMixin
+from sklearn.linear_model._base import LinearClassifierMixin
+from sklearn.model_selection import train_test_split
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import MaxAbsScaler, StandardScaler, normalize
+from config import DB_SNAPSHOT_PATH, DEFAULT_CONFIG_PATH
+from ml_helpers.compact_bundle import save_compact_bundle, load_compact_model, is_compact_bundle
+from ml_helpers.cosine_knn import SparseCosineKNN
+from ml_helpers.knn_search import cosine_topk, neighbor_weights, vote_predict
+from ml_helpers.prototypes import PrototypeSelectionClassifier
+from ml_helpers.reduction import DenseReducer
+from ml_helpers.transformers import _identity, _tokens_col_to_tokens, _dict_col_to_dicts
+from .import_model import load_sklearn_model_bundle
+
+
+FLAT_DIRNAME = "flat"
+
+def _parse(value, kind : type):
+    # поле строки — уже разобранный список/словарь или JSON-строка, как в столбцах DataFrame
+    return value if isinstance(value, kind) else json.loads(value)
+
+
+class _TextField:
+    """
+    to_tokens -> CountVectorizer/TfidfVectorizer -> [SelectKBest] -> MaxAbsScaler одного текстового поля.
+    Операции над data те же и в том же порядке, что у sklearn (log, *idf, l2 построчно, *1/scale),
+    поэтому значения совпадают побитово
+    """
+    def __init__(self, column : str, steps : list) -> None:
+        to_tokens, vect, *rest = steps
+        if getattr(to_tokens, "func", None) is not _tokens_col_to_tokens:
+            raise ValueError(f"{column}: ожидался to_tokens(_tokens_col_to_tokens), получено {to_tokens!r}")
+        if not isinstance(vect, CountVectorizer):
+            raise ValueError(f"{column}: неподдерживаемый векторизатор {type(vect).__name__}")
+        if vect.analyzer != "word" or vect.preprocessor is not _identity or vect.tokenizer is not _identity:
+            raise ValueError(f"{column}: поддерживается только analyzer='word' с identity preprocessor/tokenizer")
+
+        self.column = column
+        self.vocabulary = vect.vocabulary_
+        self.ngram_range = tuple(vect.ngram_range)
+        stop_words = vect.get_stop_words()
+        self.stop_words = frozenset(stop_words) if stop_words is not None else None
+        self.binary = bool(vect.binary)
+        self.n_features = len(vect.vocabulary_)
+
+        tfidf = isinstance(vect, TfidfVectorizer)
+        self.sublinear_tf = tfidf and vect.sublinear_tf
+        self.idf = vect.idf_ if tfidf and vect.use_idf else None
+        self.norm = vect.norm if tfidf else None
+        if self.norm not in (None, "l2"):
+            raise ValueError(f"{column}: поддерживается только norm='l2' или None, получено {self.norm!r}")
+
+        # выбранные SelectKBest столбцы: старый индекс -> новый, -1 — отброшен
+        self.select_map = None
+        self.inv_scale = None
+        for step in rest:
+            if isinstance(step, SelectorMixin):
+                support = step.get_support(indices=True)
+                self.select_map = np.full(self.n_features, -1, dtype=np.intp)
+                self.select_map[support] = np.arange(len(support))
+                self.n_features = len(support)
+            elif isinstance(step, MaxAbsScaler):
+                self.inv_scale = 1.0 / step.scale_
+            else:
+                raise ValueError(f"{column}: неподдерживаемый шаг {type(step).__name__}")
+
+    def _ngrams(self, tokens : list[str]) -> list[str]:
+        # CountVectorizer._word_ngrams
+        if self.stop_words is not None:
+            tokens = [w for w in tokens if w not in self.stop_words]
+        min_n, max_n = self.ngram_range
+        if max_n == 1:
+            return tokens
+        out = list(tokens) if min_n == 1 else []
+        min_n = max(min_n, 2)
+        space_join = " ".join
+        n_tokens = len(tokens)
+        for n in range(min_n, min(max_n + 1, n_tokens + 1)):
+            for i in range(n_tokens - n + 1):
+                out.append(space_join(tokens[i : i + n]))
+        return out
+
+    def transform(self, values : list) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        vocab_get = self.vocabulary.get
+        indices, counts, indptr = [], [], [0]
+        for value in values:
+            counter : dict[int, int] = {}
+            for gram in self._ngrams(_parse(value, list)):
+                idx = vocab_get(gram)
+                if idx is not None:
+                    counter[idx] = counter.get(idx, 0) + 1
+            for idx in sorted(counter):
+                indices.append(idx)
+                counts.append(counter[idx])
+            indptr.append(len(indices))
+
+        indices = np.asarray(indices, dtype=np.intp)
+        data = np.asarray(counts, dtype=np.float64)
+        indptr = np.asarray(indptr, dtype=np.intp)
+        if self.binary:
+            data.fill(1)
+        if self.sublinear_tf:
+            np.log(data, data)
+            data += 1.0
+        if self.idf is not None:
+            data *= self.idf[indices]
+        if self.norm == "l2":
+            for lo, hi in zip(indptr[:-1], indptr[1:]):
+                if hi > lo:
+                    # сумма квадратов последовательно, как inplace_csr_row_normalize_l2
+                    ss = np.cumsum(data[lo:hi] * data[lo:hi])[-1]
+                    if ss != 0.0:
+                        data[lo:hi] /= np.sqrt(ss)
+
+        if self.select_map is not None:
+            new = self.select_map[indices]
+            keep = new >= 0
+            row_of = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            indptr = np.concatenate([[0], np.cumsum(np.bincount(row_of[keep], minlength=len(indptr) - 1))])
+            indices, data = new[keep], data[keep]
+        if self.inv_scale is not None:
+            data *= self.inv_scale[indices]
+        return data, indices, indptr
+
+
+class _NumericField:
+    """
+    to_dicts -> DictVectorizer -> StandardScaler(with_mean=False) числового поля
+    """
+    def __init__(self, column : str, steps : list) -> None:
+        to_dicts, dv, *rest = steps
+        if getattr(to_dicts, "func", None) is not _dict_col_to_dicts:
+            raise ValueError(f"{column}: ожидался to_dicts(_dict_col_to_dicts), получено {to_dicts!r}")
+        if not isinstance(dv, DictVectorizer):
+            raise ValueError(f"{column}: неподдерживаемый векторизатор {type(dv).__name__}")
+        self.column = column
+        self.vocabulary = dv.vocabulary_
+        self.separator = dv.separator
+        self.dtype = dv.dtype
+        self.n_features = len(dv.vocabulary_)
+        self.inv_scale = None
+        for step in rest:
+            if isinstance(step, StandardScaler) and not step.with_mean:
+                self.inv_scale = 1 / step.scale_ if step.scale_ is not None else None
+            else:
+                raise ValueError(f"{column}: неподдерживаемый шаг {step!r}")
+
+    def transform(self, values : list) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        vocab = self.vocabulary
+        indices, data, indptr = [], [], [0]
+        for value in values:
+            row = []
+            for f, v in _parse(value, dict).items():
+                if isinstance(v, str):
+                    f, v = f"{f}{self.separator}{v}", 1
+                idx = vocab.get(f)
+                if idx is not None:
+                    row.append((idx, self.dtype(v)))
+            row.sort(key=lambda t: t[0])
+            indices.extend(i for i, _ in row)
+            data.extend(v for _, v in row)
+            indptr.append(len(indices))
+
+        indices = np.asarray(indices, dtype=np.intp)
+        data = np.asarray(data, dtype=np.float64)
+        if self.inv_scale is not None:
+            data *= self.inv_scale[indices]
+        return data, indices, np.asarray(indptr, dtype=np.intp)
+
+
+class FlatPredictor:
+    """
+    Скомпилированный обученный Pipeline (feat + clf) для предсказания без pandas и проверок sklearn:
+    словари n-грамм, idf, векторы масштабирования и массивы классификатора применяются прямо
+    к спискам токенов и словарям числовых признаков. Строка запроса — dict со столбцами модели
+    (error_text_tokens, ctx_tokens, ctx_numeric) в виде списков/словарей или JSON-строк.
+    kNN по косинусу и линейные модели считаются своими массивами, остальные классификаторы — их predict
+    """
+    def __init__(self, pipe : Pipeline) -> None:
+        feat, clf = pipe.named_steps["feat"], pipe.named_steps["clf"]
+        self.reducer = None
+        if isinstance(feat, Pipeline):
+            feat, reducer = feat.named_steps["columns"], feat.named_steps["reduce"]
+            if not isinstance(reducer, DenseReducer):
+                raise ValueError(f"Неподдерживаемый шаг reduce: {type(reducer).__name__}")
+            self.reducer = reducer
+        if not feat.sparse_output_:
+            raise ValueError("Поддерживается только разреженный выход ColumnTransformer")
+
+        self.fields = []
+        for name, trans, column in feat.transformers_:
+            if name == "remainder" or trans == "drop":
+                continue
+            steps = [s for _, s in trans.steps]
+            kind = _TextField if getattr(steps[0], "func", None) is _tokens_col_to_tokens else _NumericField
+            self.fields.append(kind(column, steps))
+        self.offsets = np.cumsum([0] + [f.n_features for f in self.fields])
+        self.n_features = int(self.offsets[-1])
+
+        if isinstance(clf, PrototypeSelectionClassifier):
+            clf = clf.estimator_
+        self.classes_ = clf.classes_
+        self.kind = "estimator"
+        if isinstance(clf, SparseCosineKNN):
+            self.kind = "knn"
+            self.ref_T, self.y_enc = clf._fit_X_T, clf._y
+            self.n_neighbors, self.weights = clf.n_neighbors, clf.weights
+        elif isinstance(clf, KNeighborsClassifier) and clf.metric == "cosine" and sp.issparse(clf._fit_X) and not callable(clf.weights):
+            self.kind = "knn"
+            self.ref_T, self.y_enc = normalize(clf._fit_X, copy=True).T.tocsr(), clf._y
+            self.n_neighbors, self.weights = clf.n_neighbors, clf.weights
+        elif isinstance(clf, LinearClassifierMixin):
+            self.kind = "linear"
+            self.coef_T = np.ascontiguousarray(clf.coef_.T)
+            self.intercept = clf.intercept_
+        else:
+            self.estimator = clf
+
+    def transform(self, rows : list[dict[str, Any]]):
+        n = len(rows)
+        parts = [f.transform([r[f.column] for r in rows]) for f in self.fields]
+        # построчная склейка полей со сдвигом индексов, как sparse.hstack(...).tocsr() в ColumnTransformer
+        data, indices, indptr = [], [], [0]
+        for i in range(n):
+            for (d, ind, ptr), off in zip(parts, self.offsets):
+                lo, hi = ptr[i], ptr[i + 1]
+                data.append(d[lo:hi])
+                indices.append(ind[lo:hi] + off)
+            indptr.append(indptr[-1] + sum(int(ptr[i + 1] - ptr[i]) for _, _, ptr in parts))
+        X = sp.csr_matrix((np.concatenate(data), np.concatenate(indices), indptr), shape=(n, self.n_features))
+        X.has_sorted_indices = True
+        return self.reducer.transform(X) if self.reducer is not None else X
+
+    def predict(self, rows : list[dict[str, Any]]) -> np.ndarray:
+        X = self.transform(rows)
+        if self.kind == "knn":
+            dist, ind = cosine_topk(X, self.ref_T, self.n_neighbors)
+            w = neighbor_weights(dist, self.weights)
+            return self.classes_[vote_predict(self.y_enc[ind], w, len(self.classes_))]
+        if self.kind == "linear":
+            scores = X @ self.coef_T + self.intercept
+            scores = np.asarray(scores)
+            if scores.shape[1] == 1:
+                return self.classes_[(scores[:, 0] > 0).astype(int)]
+            return self.classes_[scores.argmax(axis=1)]
+        return self.estimator.predict(X)
+
+    def predict_one(self, row : dict[str, Any]):
+        return self.predict([row])[0]
+
+
+def compile_pipeline(pipe) -> FlatPredictor:
+    if not isinstance(pipe, Pipeline):
+        raise TypeError(f"Ожидался обученный sklearn.pipeline.Pipeline (feat + clf), получено: {type(pipe)!r}")
+    return FlatPredictor(pipe)
+
+
+def verify_flat_predictor(flat : FlatPredictor, pipe : Pipeline, X : pd.DataFrame) -> dict[str, Any]:
+    """
+    Сверка с pipe на X: признаки — побитово (те же индексы и data), предсказания — точное совпадение меток
+    """
+    rows = X.to_dict("records")
+    expected_X = pipe.named_steps["feat"].transform(X)
+    got_X = flat.transform(rows)
+    if sp.issparse(expected_X):
+        expected_X = sp.csr_matrix(expected_X)
+        expected_X.sort_indices()
+        same_features = (
+            np.array_equal(expected_X.indptr, got_X.indptr)
+            and np.array_equal(expected_X.indices, got_X.indices)
+            and np.array_equal(expected_X.data.view(np.uint64), got_X.data.view(np.uint64))
+        )
+    else:
+        same_features = np.array_equal(np.asarray(expected_X).view(np.uint32), np.asarray(got_X).view(np.uint32))
+
+    expected = pipe.predict(X)
+    got = flat.predict(rows)
+    return {
+        "n_rows": len(rows),
+        "same_features": bool(same_features),
+        "prediction_mismatches": int(np.sum(expected != got)),
+    }
+
+
+def save_flat_predictor(flat : FlatPredictor, out_dir : str | Path) -> Path:
+    return save_compact_bundle(flat, out_dir)
+
+
+def load_flat_predictor(path : str | Path, *, mmap : bool = True) -> FlatPredictor | None:
+    """
+    path — директория модели (ищется подпапка flat/) или сама директория предсказателя; None, если его нет
+    """
+    root = Path(path)
+    for cand in (root / FLAT_DIRNAME, root):
+        if is_compact_bundle(cand):
+            obj = load_compact_model(cand, mmap=mmap)
+            if isinstance(obj, FlatPredictor):
+                return obj
+    return None
+
+
+def _load_test_split(cfg : dict) -> pd.DataFrame:
+    # тот же test, что в training_models.ipynb
+    with sqlite3.connect(DB_SNAPSHOT_PATH) as conn:
+        df = pd.read_sql(cfg["data"]["sql"], conn)
+    y = df["label"].astype(int).to_numpy()
+    _, X_test, _, _ = train_test_split(df.drop(columns=["label"]), y, test_size=0.15, random_state=42, stratify=y)
+    return X_test
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Компиляция модели в FlatPredictor со сверкой против pipe.predict на test")
+    parser.add_argument("model", type=Path, help="директория модели")
+    parser.add_argument("--out", type=Path, default=None, help="по умолчанию <model>/flat")
+    parser.add_argument("--config", type=Path, default=DEFAULT_CONFIG_PATH)
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+
+    bundle = load_sklearn_model_bundle(args.model)
+    flat = compile_pipeline(bundle.pipe)
+    X_test = _load_test_split(cfg)
+
+    report = verify_flat_predictor(flat, bundle.pipe, X_test)
+    print(report)
+    if not report["same_features"] or report["prediction_mismatches"]:
+        raise SystemExit("FlatPredictor расходится с pipe.predict, не сохраняю")
+
+    rows = X_test.head(200).to_dict("records")
+    t_pipe = [time.perf_counter()]
+    for i in range(len(rows)):
+        bundle.pipe.predict(X_test.iloc[[i]])
+        t_pipe.append(time.perf_counter())
+    t_flat = [time.perf_counter()]
+    for row in rows:
+        flat.predict_one(row)
+        t_flat.append(time.perf_counter())
+    p50 = lambda t: float(np.percentile(np.diff(t) * 1000, 50))
+    print(f"single p50: pipe {p50(t_pipe):.2f}ms, flat {p50(t_flat):.2f}ms")
+
+    out = save_flat_predictor(flat, args.out or bundle.root / FLAT_DIRNAME)
+    print(f"-> {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,12 +3,14 @@ from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Optional
 from sklearn.pipeline import Pipeline
+from ml_helpers.routed import ErrorCodeRouter
+from ml_helpers.compact_bundle import is_compact_bundle, load_compact_model
 
 
 @dataclass(frozen=True)
 class ModelBundle:
     root : Path
-    pipe : Pipeline
+    pipe : Pipeline | ErrorCodeRouter
     meta : dict[str, Any]
     report_test : Optional[str] = None
 
@@ -21,14 +23,16 @@ def load_sklearn_model_bundle(
     report_filename: str = "report_test.txt",
     expected_steps: tuple[str, ...] = ("feat", "clf"),
     strict_versions: bool = False,
+    mmap: bool = True,
 ) -> ModelBundle:
     """
-    Загружает sklearn Pipeline + meta.json из директории
+    Загружает sklearn Pipeline (или ErrorCodeRouter с Pipeline на каждый код ошибки) + meta.json из директории
 
     Аргументы, которые обычно удобны:
       - path: директория модели (…/2025-12-25_1830_logreg_v1) ИЛИ путь к model.joblib
       - strict_versions: если True — падать при несовпадении sklearn-версии (и др. при наличии)
       - expected_steps: контроль, что Pipeline содержит нужные шаги ("feat","clf")
+      - mmap: для компактного формата (bundle.json) — открывать массивы через memmap
     """
     p = Path(path)
 
@@ -37,8 +41,9 @@ def load_sklearn_model_bundle(
     model_path = p if p.is_file() else (root / model_filename)
     meta_path = root / meta_filename
     report_path = root / report_filename
+    compact = p.is_dir() and is_compact_bundle(root)
 
-    if not model_path.exists():
+    if not compact and not model_path.exists():
         raise FileNotFoundError(f"Не найден файл модели: {model_path}")
     if not meta_path.exists():
         raise FileNotFoundError(f"Не найден meta.json: {meta_path}")
@@ -63,17 +68,24 @@ def load_sklearn_model_bundle(
             import warnings
             warnings.warn(msg, RuntimeWarning)
 
-    pipe = joblib.load(model_path)
+    # компактный формат (bundle.json): массивы открываются через memmap, без распаковки всего pickle
+    pipe = load_compact_model(root, mmap=mmap) if compact else joblib.load(model_path)
 
-    if not isinstance(pipe, Pipeline):
-        raise TypeError(f"Ожидался sklearn.pipeline.Pipeline, получено: {type(pipe)!r}")
+    # маршрутизируемая модель: шаги проверяются у каждой подмодели-Pipeline (константные ответы пропускаются)
+    if isinstance(pipe, ErrorCodeRouter):
+        sub_pipes = [m for m in (*pipe.models_.values(), pipe.fallback_) if isinstance(m, Pipeline)]
+    elif isinstance(pipe, Pipeline):
+        sub_pipes = [pipe]
+    else:
+        raise TypeError(f"Ожидался sklearn.pipeline.Pipeline или ErrorCodeRouter, получено: {type(pipe)!r}")
 
-    missing = [s for s in expected_steps if s not in pipe.named_steps]
-    if missing:
-        raise ValueError(
-            f"Pipeline не содержит ожидаемых шагов {expected_steps}. "
-            f"Отсутствуют: {missing}. Имеются: {tuple(pipe.named_steps.keys())}"
-        )
+    for sub in sub_pipes:
+        missing = [s for s in expected_steps if s not in sub.named_steps]
+        if missing:
+            raise ValueError(
+                f"Pipeline не содержит ожидаемых шагов {expected_steps}. "
+                f"Отсутствуют: {missing}. Имеются: {tuple(sub.named_steps.keys())}"
+            )
 
     report_test = report_path.read_text(encoding="utf-8") if report_path.exists() else None
     return ModelBundle(root=root, pipe=pipe, meta=meta, report_test=report_test)
\ No newline at end of file
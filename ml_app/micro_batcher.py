@@ -0,0 +1,206 @@
+import json, queue, threading, time, numpy as np, pandas as pd
+from collections import deque
+from concurrent.futures import Future
+from typing import Any, Callable, Sequence
+
+
+_STOP = object()
+
+class BatchCounters:
+    """
+    Счётчики микробатчера: число запросов и батчей, распределение размеров батча,
+    задержка запроса (от submit до результата) и ожидание в очереди по последним window запросам
+    """
+    def __init__(self, window : int = 10_000) -> None:
+        self._lock = threading.Lock()
+        self.started_at = time.perf_counter()
+        self.n_requests = 0
+        self.n_batches = 0
+        self.n_errors = 0
+        self.batch_sizes : deque[int] = deque(maxlen=window)
+        self.latency_ms : deque[float] = deque(maxlen=window)
+        self.queue_ms : deque[float] = deque(maxlen=window)
+        self.predict_ms : deque[float] = deque(maxlen=window)
+
+    def record(self, size : int, queue_ms : list[float], predict_ms : float, latency_ms : list[float], *, error : bool) -> None:
+        with self._lock:
+            self.n_requests += size
+            self.n_batches += 1
+            self.n_errors += size if error else 0
+            self.batch_sizes.append(size)
+            self.queue_ms.extend(queue_ms)
+            self.latency_ms.extend(latency_ms)
+            self.predict_ms.append(predict_ms)
+
+    def snapshot(self) -> dict[str, float]:
+        with self._lock:
+            elapsed = time.perf_counter() - self.started_at
+            lat = np.asarray(self.latency_ms) if self.latency_ms else np.zeros(1)
+            wait = np.asarray(self.queue_ms) if self.queue_ms else np.zeros(1)
+            return {
+                "requests": self.n_requests,
+                "batches": self.n_batches,
+                "errors": self.n_errors,
+                "mean_batch_size": float(np.mean(self.batch_sizes)) if self.batch_sizes else 0.0,
+                "max_batch_size": int(max(self.batch_sizes, default=0)),
+                "throughput_rps": self.n_requests / elapsed if elapsed > 0 else 0.0,
+                "latency_p50_ms": float(np.percentile(lat, 50)),
+                "latency_p95_ms": float(np.percentile(lat, 95)),
+                "latency_p99_ms": float(np.percentile(lat, 99)),
+                "queue_p50_ms": float(np.percentile(wait, 50)),
+                "predict_mean_ms": float(np.mean(self.predict_ms)) if self.predict_ms else 0.0,
+            }
+
+
+class MicroBatcher:
+    """
+    Сборка одиночных запросов в батч внутри процесса: первый запрос открывает окно max_wait_ms,
+    батч уходит в predict_fn, как только набралось max_batch_size запросов или окно закрылось.
+    predict_fn получает список запросов и возвращает результаты в том же порядке;
+    каждый submit возвращает свой Future, ошибка predict_fn выставляется во все Future батча
+    """
+    def __init__(
+        self,
+        predict_fn : Callable[[list[Any]], Sequence[Any]],
+        *,
+        max_batch_size : int = 32,
+        max_wait_ms : float = 5.0,
+        name : str = "micro-batcher",
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be >= 1, got {max_batch_size}")
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.counters = BatchCounters()
+        self._queue : queue.Queue = queue.Queue()
+        self._closed = threading.Event()
+        # проверка _closed и put в submit атомарны относительно close: после _STOP в очередь ничего не попадает
+        self._submit_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, item : Any) -> Future:
+        fut : Future = Future()
+        with self._submit_lock:
+            if self._closed.is_set():
+                raise RuntimeError("MicroBatcher is closed")
+            self._queue.put((item, fut, time.perf_counter()))
+        return fut
+
+    def predict(self, item : Any, timeout : float | None = None) -> Any:
+        return self.submit(item).result(timeout=timeout)
+
+    def _collect(self, first) -> list:
+        batch = [first]
+        deadline = first[2] + self.max_wait_ms / 1000
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                # окно закрыто — забираем только то, что уже в очереди
+                try:
+                    nxt = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            else:
+                try:
+                    nxt = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if nxt is _STOP:
+                self._queue.put(_STOP)
+                break
+            batch.append(nxt)
+        return batch
+
+    def _fail_pending(self) -> None:
+        # страховка: запрос, оказавшийся в очереди после _STOP, не должен ждать вечно
+        while True:
+            try:
+                nxt = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if nxt is not _STOP:
+                nxt[1].set_exception(RuntimeError("MicroBatcher is closed"))
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                self._fail_pending()
+                return
+            batch = self._collect(first)
+            items = [item for item, _, _ in batch]
+
+            t0 = time.perf_counter()
+            error = None
+            try:
+                results = self.predict_fn(items)
+                if len(results) != len(items):
+                    raise ValueError(f"predict_fn returned {len(results)} results for {len(items)} requests")
+            except Exception as exc:
+                error = exc
+            t1 = time.perf_counter()
+
+            for i, (_, fut, _) in enumerate(batch):
+                if error is not None:
+                    fut.set_exception(error)
+                else:
+                    fut.set_result(results[i])
+            done = time.perf_counter()
+            self.counters.record(
+                len(batch),
+                [(t0 - ts) * 1000 for _, _, ts in batch],
+                (t1 - t0) * 1000,
+                [(done - ts) * 1000 for _, _, ts in batch],
+                error=error is not None,
+            )
+
+    def stats(self) -> dict[str, float]:
+        return self.counters.snapshot()
+
+    def close(self, timeout : float | None = None) -> None:
+        # запросы, поставленные до close, ещё обрабатываются
+        with self._submit_lock:
+            if not self._closed.is_set():
+                self._closed.set()
+                self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def __enter__(self) -> "MicroBatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _model_row(row : dict[str, Any]) -> dict[str, Any]:
+    # списки и словари признаков (extract_features) — JSON-строками, как в training_data и Recommender.predict_rows
+    return {k: v if isinstance(v, str) else json.dumps(v, ensure_ascii=False) for k, v in row.items()}
+
+
+def batch_predict_fn(model, *, method : str = "predict") -> Callable[[list[dict]], Sequence[Any]]:
+    """
+    predict_fn для модели: FlatPredictor принимает строки как есть, Pipeline / ErrorCodeRouter — DataFrame из строк
+    (нестроковые поля кодируются в JSON, как в обучении)
+    """
+    from .flat_predictor import FlatPredictor
+
+    if isinstance(model, FlatPredictor):
+        if method != "predict":
+            raise ValueError("FlatPredictor supports only method='predict'")
+        return model.predict
+    fn = getattr(model, method)
+    return lambda rows: fn(pd.DataFrame([_model_row(r) for r in rows]))
+
+
+def make_micro_batcher(model, cfg : dict, *, method : str = "predict") -> MicroBatcher:
+    """
+    MicroBatcher по секции serving.micro_batch конфига; при enabled: false каждый запрос идёт в predict отдельно
+    """
+    mb_cfg = (cfg.get("serving", {}) or {}).get("micro_batch", {}) or {}
+    return MicroBatcher(
+        batch_predict_fn(model, method=method),
+        max_batch_size=int(mb_cfg.get("max_batch_size", 32)) if mb_cfg.get("enabled", True) else 1,
+        max_wait_ms=float(mb_cfg.get("max_wait_ms", 5.0)),
+    )
@@ -0,0 +1,152 @@
+import json, sqlite3, threading, yaml, numpy as np, pandas as pd
+from pathlib import Path
+from typing import Any, Callable
+from processing_cpp import compile_get_error_info, strip_cpp_comments, safe_extract_context
+from config import DB_PATH, DEFAULT_CONFIG_PATH
+from ml_helpers.fingerprint import load_fingerprint_index
+from instrumentation import stage, cache_event, profiled
+from .normalize_data import build_features_from_ctx, error_tokenizer
+from .import_model import load_sklearn_model_bundle
+from .flat_predictor import load_flat_predictor
+from .rule_cascade import make_rule_cascade
+
+
+NO_SOURCE_MSG = "Вставьте исходный C++ код, затем нажмите «Получить рекомендацию»"
+NO_ERRORS_MSG = "Вставленный код не имеет ошибок компиляции"
+NOT_FOUND_MSG = "Рекомендация для данного класса не найдена"
+
+def extract_features(source_code : str, error_text : str, error_line : int) -> dict[str, Any]:
+    """
+    Разбор libclang и признаки одной ошибки — строка модели со списками/словарями вместо JSON.
+    Функция уровня модуля: её можно отдавать в ProcessPoolExecutor
+    """
+    ctx = safe_extract_context(source_code, error_line, with_macros = True, radius = 2)
+    with stage("features"):
+        ctx_tokens, ctx_numeric = build_features_from_ctx(ctx)
+        return {
+            # код ошибки для маршрутизируемой модели (ErrorCodeRouter), обычный Pipeline этот столбец отбрасывает
+            "error_code": error_text[:5],
+            "error_text_tokens": error_tokenizer(error_text),
+            "ctx_tokens": ctx_tokens,
+            "ctx_numeric": ctx_numeric,
+        }
+
+
+class Recommender:
+    """
+    Весь путь от исходника до рекомендации без UI, по стадиям:
+    strip -> compile -> rules (разметочные функции) -> extract_features (libclang) -> predict_rows -> lookup.
+    analyze проходит их последовательно; сервис (ml_app.service) раскладывает те же стадии по своим пулам.
+    compile_fn — функция компиляции (по умолчанию cl через processing_cpp.compile_get_error_info)
+    """
+    def __init__(
+        self,
+        model_dir : str | Path,
+        *,
+        db_path : str | Path = DB_PATH,
+        cfg : dict | None = None,
+        compile_fn : Callable[[str], tuple[str | None, int | None]] = compile_get_error_info,
+    ) -> None:
+        if cfg is None:
+            with open(DEFAULT_CONFIG_PATH, "r", encoding="utf-8") as f:
+                cfg = yaml.safe_load(f)
+        bundle = load_sklearn_model_bundle(model_dir, strict_versions=False, expected_steps=("feat", "clf"))
+        self.pipe = bundle.pipe
+        self.meta = bundle.meta
+        # скомпилированный предсказатель (python -m ml_app.flat_predictor), если он есть в директории модели
+        self.flat = load_flat_predictor(bundle.root)
+        # индекс точных совпадений с обучающими данными (bundle.fingerprints), если модель сохранена с ним
+        self.fingerprints = load_fingerprint_index(bundle.root)
+        # разметочные функции до разбора libclang и модели (serving.rules)
+        self.rules = make_rule_cascade(cfg, db_path)
+        self.db_path = db_path
+        self.compile_fn = compile_fn
+        self._recommendations : dict[int, str | None] = {}
+        self._lock = threading.Lock()
+
+    def strip(self, cpp_code : str) -> str:
+        return strip_cpp_comments(cpp_code)
+
+    def compile(self, source_code : str) -> tuple[str | None, int | None]:
+        return self.compile_fn(source_code)
+
+    def rule_label(self, source_code : str, error_text : str, error_line : int) -> int | None:
+        if self.rules is None:
+            return None
+        with stage("rules"):
+            label = self.rules.predict_one({
+                "error_code": error_text[:5],
+                "error_text": error_text,
+                "source_code": source_code,
+                "error_line": error_line,
+            })
+        # быстрый путь считается как кеш: попадание — ответ без libclang и модели
+        cache_event("rules", label is not None)
+        return label
+
+    def predict_rows(self, rows : list[dict[str, Any]]) -> np.ndarray:
+        """
+        Метки для пачки строк признаков: сначала индекс отпечатков, модель — только на промахах
+        """
+        labels = np.zeros(len(rows), dtype=np.int64)
+        hit = np.zeros(len(rows), dtype=bool)
+        if self.fingerprints is not None:
+            with stage("fingerprint"):
+                fp_labels, hit = self.fingerprints.lookup_many(rows)
+            labels[hit] = fp_labels[hit]
+            for h in hit:
+                cache_event("fingerprint", bool(h))
+        miss = np.flatnonzero(~hit)
+        if len(miss):
+            rest = [rows[i] for i in miss]
+            with stage("predict"):
+                if self.flat is not None:
+                    labels[miss] = self.flat.predict(rest)
+                else:
+                    X = pd.DataFrame([{k: v if isinstance(v, str) else json.dumps(v, ensure_ascii=False) for k, v in r.items()} for r in rest])
+                    labels[miss] = self.pipe.predict(X)
+        return labels
+
+    def lookup(self, label : int) -> str:
+        # таблица рекомендаций маленькая и почти не меняется — ответы кешируются на всё время жизни процесса
+        label = int(label)
+        with self._lock:
+            cached = label in self._recommendations
+            text = self._recommendations.get(label)
+        cache_event("recommendation", cached)
+        if cached:
+            return text if text is not None else NOT_FOUND_MSG
+        with stage("db_lookup"), sqlite3.connect(self.db_path) as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                            SELECT recommendation
+                            FROM recommendations
+                            WHERE recommendation_id = ?
+                        """, (label,))
+            row = cur.fetchone()
+        with self._lock:
+            self._recommendations[label] = row[0] if row else None
+        return row[0] if row else NOT_FOUND_MSG
+
+    @profiled("analyze")
+    def analyze(self, cpp_code : str) -> dict[str, Any]:
+        """
+        {"recommendation": текст, "label": recommendation_id или None, "path": "no_source" | "no_errors" | "rules" | "model"}
+        """
+        source_code = self.strip(cpp_code)
+        if not source_code:
+            return {"recommendation": NO_SOURCE_MSG, "label": None, "path": "no_source"}
+
+        error_text, error_line = self.compile(source_code)
+        if not error_text or not error_line:
+            return {"recommendation": NO_ERRORS_MSG, "label": None, "path": "no_errors"}
+
+        # быстрый путь: разметочные функции по тексту ошибки и исходнику, без libclang и модели
+        label, path = self.rule_label(source_code, error_text, error_line), "rules"
+        if label is None:
+            row = extract_features(source_code, error_text, error_line)
+            label, path = int(self.predict_rows([row])[0]), "model"
+        return {"recommendation": self.lookup(label), "label": int(label), "path": path}
+
+    def recommend(self, cpp_code : str) -> str:
+        return self.analyze(cpp_code)["recommendation"]
@@ -0,0 +1,203 @@
+import argparse, re, sqlite3, time, yaml, numpy as np, pandas as pd
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable
+from sklearn.model_selection import train_test_split
+from config import DB_PATH, DB_SNAPSHOT_PATH, DEFAULT_CONFIG_PATH
+from label_functions import LFS
+from .import_model import load_sklearn_model_bundle
+
+
+LF_CODE_RE = re.compile(r"^lf_(C\d{4})_")
+
+RECOMMENDATION_IDS_SQL = """
+    SELECT ec.error_code, r.recommendation_code, r.recommendation_id
+    FROM error_codes ec
+    JOIN recommendations r ON r.error_code_id = ec.error_code_id
+    WHERE r.is_active = 1
+"""
+
+# те же строки и тот же порядок, что у data.sql, плюс сырые поля для разметочных функций
+RAW_SQL = """
+    SELECT label, error_code, error_text, error_line, source_code, error_text_tokens, ctx_tokens, ctx_numeric
+    FROM training_data
+    WHERE is_in_train = 1
+"""
+
+def load_recommendation_ids(db_path : str | Path = DB_PATH) -> dict[tuple[str, str], int]:
+    """
+    (error_code, recommendation_code) -> recommendation_id активных рекомендаций
+    """
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute(RECOMMENDATION_IDS_SQL).fetchall()
+    return {(code, rec_code): int(rec_id) for code, rec_code, rec_id in rows}
+
+
+class RuleCascade:
+    """
+    Быстрый путь до libclang и модели: разметочные функции (label_functions.LFS) по тексту ошибки и исходнику.
+    Для строки запускаются только LF её кода ошибки (код берётся из имени lf_CXXXX_...);
+    ответ есть, если сработало не меньше min_votes LF и все они вернули один recommendation_code,
+    и этот код есть среди рекомендаций кода ошибки в БД. Иначе None — дальше полный конвейер.
+    codes — коды ошибок, для которых быстрый путь разрешён (None — все), обычно отобранные
+    по согласию с моделью (rule_cascade_report, whitelist_codes).
+    Строка — dict/Series с error_code, error_text, source_code, error_line
+    """
+    def __init__(
+        self,
+        recommendation_ids : dict[tuple[str, str], int],
+        lfs : list[Callable] = LFS,
+        *,
+        min_votes : int = 1,
+        codes : list[str] | None = None,
+    ) -> None:
+        self.recommendation_ids = recommendation_ids
+        self.min_votes = min_votes
+        self.codes = None if codes is None else frozenset(codes)
+        self.lfs_by_code : dict[str, list[Callable]] = defaultdict(list)
+        for lf in lfs:
+            m = LF_CODE_RE.match(lf.__name__)
+            # LF без кода в имени проверяют код сами — запускаются для любой строки
+            self.lfs_by_code[m.group(1) if m else None].append(lf)
+
+    def votes(self, row) -> list[str]:
+        lfs = self.lfs_by_code.get(row.get("error_code"), []) + self.lfs_by_code.get(None, [])
+        return [code for code in (lf(row) for lf in lfs) if code is not None]
+
+    def predict_one(self, row) -> int | None:
+        if self.codes is not None and row.get("error_code") not in self.codes:
+            return None
+        try:
+            votes = self.votes(row)
+        except Exception:
+            # LF — эвристики по сырому тексту: ошибка в одной из них не должна ронять запрос, отвечает модель
+            return None
+        if len(votes) < self.min_votes or len(set(votes)) != 1:
+            return None
+        return self.recommendation_ids.get((row.get("error_code"), votes[0]))
+
+    def predict(self, rows) -> np.ndarray:
+        """
+        recommendation_id для каждой строки, -1 там, где быстрый путь не сработал
+        """
+        if isinstance(rows, pd.DataFrame):
+            rows = rows.to_dict("records")
+        return np.array([-1 if (r := self.predict_one(row)) is None else r for row in rows], dtype=np.int64)
+
+
+def make_rule_cascade(cfg : dict, db_path : str | Path = DB_PATH) -> RuleCascade | None:
+    """
+    RuleCascade по секции serving.rules конфига; None, если она выключена
+    """
+    rules_cfg = (cfg.get("serving", {}) or {}).get("rules", {}) or {}
+    if not rules_cfg.get("enabled", False):
+        return None
+    return _cascade_from_cfg(rules_cfg, load_recommendation_ids(db_path))
+
+
+def _cascade_from_cfg(rules_cfg : dict, recommendation_ids : dict[tuple[str, str], int]) -> RuleCascade:
+    codes = rules_cfg.get("codes")
+    return RuleCascade(
+        recommendation_ids,
+        min_votes=int(rules_cfg.get("min_votes", 1)),
+        codes=None if codes is None else [str(c) for c in codes],
+    )
+
+
+def rule_cascade_report(cascade : RuleCascade, model, df : pd.DataFrame, *, n_single : int = 200) -> dict[str, float]:
+    """
+    Как часто срабатывает быстрый путь на df, совпадение его ответа с моделью и с метками, accuracy каскада
+    против одной модели и p50 времени LF против model.predict на строках, где быстрый путь сработал.
+    df — сырые поля (error_text, source_code, error_line) вместе с признаками модели и label.
+    Часть меток training_data сама получена этими LF (notebooks/add_labels.ipynb), поэтому совпадение с метками
+    завышено; честная оценка быстрого пути — согласие с моделью
+    """
+    y = df["label"].astype(int).to_numpy()
+    rule_pred = cascade.predict(df)
+    fired = rule_pred >= 0
+    model_pred = model.predict(df)
+    cascade_pred = np.where(fired, rule_pred, model_pred)
+
+    n_fired = int(fired.sum())
+    rows = df.to_dict("records")
+    t_rule, t_model = [], []
+    for i in np.flatnonzero(fired)[:n_single]:
+        t0 = time.perf_counter()
+        cascade.predict_one(rows[i])
+        t1 = time.perf_counter()
+        model.predict(df.iloc[[i]])
+        t2 = time.perf_counter()
+        t_rule.append(t1 - t0)
+        t_model.append(t2 - t1)
+    p50 = lambda t: float(np.percentile(np.asarray(t) * 1000, 50)) if t else 0.0
+
+    codes = df["error_code"].to_numpy()
+    by_code, agreement_by_code, fired_by_code = {}, {}, {}
+    for code in sorted(df["error_code"].unique()):
+        in_code = codes == code
+        fired_code = fired & in_code
+        by_code[code] = float(fired[in_code].mean())
+        fired_by_code[code] = int(fired_code.sum())
+        if fired_code.any():
+            agreement_by_code[code] = float(np.mean(rule_pred[fired_code] == model_pred[fired_code]))
+    return {
+        "n_rows": len(y),
+        "fire_rate": n_fired / len(y) if len(y) else 0.0,
+        "agreement_with_model": float(np.mean(rule_pred[fired] == model_pred[fired])) if n_fired else 0.0,
+        "rule_accuracy": float(np.mean(rule_pred[fired] == y[fired])) if n_fired else 0.0,
+        "model_accuracy_on_fired": float(np.mean(model_pred[fired] == y[fired])) if n_fired else 0.0,
+        "model_accuracy": float(np.mean(model_pred == y)),
+        "cascade_accuracy": float(np.mean(cascade_pred == y)),
+        "rule_p50_ms": p50(t_rule),
+        "model_p50_ms": p50(t_model),
+        "fire_rate_by_code": by_code,
+        "fired_by_code": fired_by_code,
+        "agreement_by_code": agreement_by_code,
+    }
+
+
+def whitelist_codes(report : dict, *, min_agreement : float, min_fired : int = 20) -> list[str]:
+    """
+    Коды ошибок для serving.rules.codes: быстрый путь сработал хотя бы min_fired раз
+    и совпал с моделью не реже min_agreement
+    """
+    return sorted(
+        code for code, agreement in report["agreement_by_code"].items()
+        if report["fired_by_code"][code] >= min_fired and agreement >= min_agreement
+    )
+
+
+def _load_test_rows(db_path : str | Path) -> pd.DataFrame:
+    # разбиение как в training_models.ipynb: тот же y, тот же порядок строк, random_state=42
+    with sqlite3.connect(db_path) as conn:
+        df = pd.read_sql(RAW_SQL, conn)
+    y = df["label"].astype(int).to_numpy()
+    _, df_test = train_test_split(df, test_size=0.15, random_state=42, stratify=y)
+    return df_test
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Отчёт по быстрому пути на разметочных функциях против модели на test")
+    parser.add_argument("model", type=Path, help="директория модели")
+    parser.add_argument("--db", type=Path, default=DB_SNAPSHOT_PATH)
+    parser.add_argument("--config", type=Path, default=DEFAULT_CONFIG_PATH)
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    rules_cfg = (cfg.get("serving", {}) or {}).get("rules", {}) or {}
+
+    bundle = load_sklearn_model_bundle(args.model)
+    # отчёт по всем кодам: whitelist отбирается из него же
+    cascade = _cascade_from_cfg({**rules_cfg, "codes": None}, load_recommendation_ids(args.db))
+    report = rule_cascade_report(cascade, bundle.pipe, _load_test_rows(args.db))
+    for k, v in report.items():
+        print(f"{k}: {v:.4f}" if isinstance(v, float) else f"{k}: {v}")
+    min_agreement = float(rules_cfg.get("min_agreement", 0.98))
+    min_fired = int(rules_cfg.get("min_fired", 20))
+    print(f"serving.rules.codes (согласие с моделью >= {min_agreement}, срабатываний >= {min_fired}): "
+          f"{whitelist_codes(report, min_agreement=min_agreement, min_fired=min_fired)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,430 @@
+import argparse, asyncio, json, time, traceback, urllib.error, urllib.request, yaml
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any
+from config import DEFAULT_CONFIG_PATH, MODELS_DIR
+from instrumentation import REGISTRY, call_collecting, configure_profiling, profile_request, profiled, reset_metrics, start_snapshots_from_env
+from .micro_batcher import MicroBatcher
+from .recommender import NO_ERRORS_MSG, NO_SOURCE_MSG, Recommender, extract_features
+
+
+MAX_BODY_BYTES = 1 << 20
+
+class Overloaded(Exception):
+    pass
+
+
+def _parse_in_worker(source_code : str, error_text : str, error_line : int) -> tuple[dict, dict | None]:
+    # выполняется в процессе пула: профиль (TPPO_PROFILE) снимается там же, метрики стадий возвращаются со строкой
+    with profile_request("parse"):
+        return call_collecting(extract_features, source_code, error_text, error_line)
+
+
+@dataclass
+class _Job:
+    code : str
+    future : asyncio.Future
+    started : float = field(default_factory=time.perf_counter)
+    source_code : str = ""
+    error_text : str = ""
+    error_line : int = 0
+    row : dict | None = None
+    label : int | None = None
+    path : str = ""
+    timings : dict[str, float] = field(default_factory=dict)
+    stage : str = ""
+    stage_started : float = 0.0
+
+
+class _StageStats:
+    def __init__(self) -> None:
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+
+    def as_dict(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "mean_ms": self.seconds / self.count * 1000 if self.count else 0.0,
+        }
+
+
+STAGES = ("compile", "parse", "predict", "lookup")
+
+class AnalysisService:
+    """
+    Конвейер Recommender по стадиям, у каждой свой ограниченный пул:
+      - compile: потоки, каждый ждёт свой процесс компилятора (compile_workers одновременных cl)
+      - parse: процессы с libclang (parse_workers), разбор держит GIL, поэтому не потоки
+      - predict: MicroBatcher — запросы из разных соединений собираются в один predict
+      - lookup: кешируемый запрос рекомендации в БД (Recommender.lookup)
+    Между стадиями — asyncio.Queue(queue_size): заполненная очередь останавливает предыдущую стадию,
+    а при заполненной первой submit сразу отказывает (Overloaded -> HTTP 503)
+    """
+    def __init__(
+        self,
+        recommender : Recommender,
+        *,
+        compile_workers : int = 4,
+        parse_workers : int = 2,
+        queue_size : int = 64,
+        max_batch_size : int = 32,
+        max_wait_ms : float = 5.0,
+        request_timeout_s : float = 30.0,
+    ) -> None:
+        self.recommender = recommender
+        self.compile_workers = compile_workers
+        self.parse_workers = parse_workers
+        self.queue_size = queue_size
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.request_timeout_s = request_timeout_s
+        self.stats = {name: _StageStats() for name in STAGES}
+        self.paths : dict[str, int] = {}
+        self.rejected = 0
+        self.timeouts = 0
+        self.abandoned = 0
+        self.started_at = time.time()
+        self._tasks : list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self.compile_pool = ThreadPoolExecutor(self.compile_workers, thread_name_prefix="compile")
+        self.parse_pool = ProcessPoolExecutor(self.parse_workers, initializer=reset_metrics)
+        self.lookup_pool = ThreadPoolExecutor(1, thread_name_prefix="lookup")
+        self.batcher = MicroBatcher(
+            profiled("predict_batch")(self.recommender.predict_rows),
+            max_batch_size=self.max_batch_size,
+            max_wait_ms=self.max_wait_ms,
+        )
+        self.queues = {name: asyncio.Queue(self.queue_size) for name in STAGES}
+        workers = {
+            "compile": (self._compile_stage, self.compile_workers),
+            "parse": (self._parse_stage, self.parse_workers),
+            # батч собирается только из одновременно ожидающих запросов
+            "predict": (self._predict_stage, self.max_batch_size),
+            "lookup": (self._lookup_stage, 1),
+        }
+        for name, (fn, n) in workers.items():
+            self._tasks += [asyncio.create_task(self._worker(name, fn), name=f"{name}-{i}") for i in range(n)]
+
+    async def close(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self.batcher.close()
+        self.compile_pool.shutdown(wait=False, cancel_futures=True)
+        self.parse_pool.shutdown(wait=False, cancel_futures=True)
+        self.lookup_pool.shutdown(wait=False)
+
+    async def submit(self, code : str) -> dict[str, Any]:
+        job = _Job(code, asyncio.get_running_loop().create_future())
+        try:
+            self.queues["compile"].put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise Overloaded(f"compile queue is full ({self.queue_size})")
+        try:
+            return await asyncio.wait_for(job.future, self.request_timeout_s)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    def _finish(self, job : _Job, recommendation : str) -> None:
+        job.timings[job.stage] = time.perf_counter() - job.stage_started
+        self.paths[job.path] = self.paths.get(job.path, 0) + 1
+        if not job.future.done():
+            job.future.set_result({
+                "recommendation": recommendation,
+                "label": job.label,
+                "path": job.path,
+                "timings_ms": {k: round(v * 1000, 3) for k, v in job.timings.items()},
+                "total_ms": round((time.perf_counter() - job.started) * 1000, 3),
+            })
+
+    async def _worker(self, name : str, fn) -> None:
+        """
+        Стадия возвращает имя следующей очереди (или None, если ответ уже готов). Время стадии
+        снимается до put: ожидание места в следующей очереди — это backpressure, а не работа стадии
+        """
+        queue, stats = self.queues[name], self.stats[name]
+        while True:
+            job = await queue.get()
+            if job.future.done():
+                # submit уже ответил (504) или соединение закрыто — дальше запрос не считается
+                self.abandoned += 1
+                queue.task_done()
+                continue
+            t0 = time.perf_counter()
+            job.stage, job.stage_started = name, t0
+            nxt = None
+            try:
+                nxt = await fn(job)
+            except Exception as exc:
+                stats.errors += 1
+                if not job.future.done():
+                    job.future.set_exception(exc)
+            finally:
+                dt = time.perf_counter() - t0
+                stats.count += 1
+                stats.seconds += dt
+                job.timings.setdefault(name, dt)
+                queue.task_done()
+            if nxt is not None:
+                await self.queues[nxt].put(job)
+
+    def _compile_in_thread(self, code : str) -> tuple[str, str | None, int | None, int | None]:
+        # strip — посимвольный цикл по телу до MAX_BODY_BYTES, rules — регулярные выражения:
+        # вместе с компиляцией в потоке пула, чтобы не держать цикл событий
+        rec = self.recommender
+        source_code = rec.strip(code)
+        if not source_code:
+            return source_code, None, None, None
+        error_text, error_line = rec.compile(source_code)
+        if not error_text or not error_line:
+            return source_code, error_text, error_line, None
+        return source_code, error_text, error_line, rec.rule_label(source_code, error_text, error_line)
+
+    async def _compile_stage(self, job : _Job) -> str | None:
+        loop = asyncio.get_running_loop()
+        job.source_code, error_text, error_line, job.label = await loop.run_in_executor(
+            self.compile_pool, self._compile_in_thread, job.code,
+        )
+        if not job.source_code:
+            job.path = "no_source"
+            return self._finish(job, NO_SOURCE_MSG)
+        if not error_text or not error_line:
+            job.path = "no_errors"
+            return self._finish(job, NO_ERRORS_MSG)
+        job.error_text, job.error_line = error_text, error_line
+        if job.label is not None:
+            job.path = "rules"
+            return "lookup"
+        return "parse"
+
+    async def _parse_stage(self, job : _Job) -> str:
+        loop = asyncio.get_running_loop()
+        # стадии parse/index/extract/features считаются в процессе пула — их метрики возвращаются вместе со строкой
+        job.row, state = await loop.run_in_executor(
+            self.parse_pool, _parse_in_worker, job.source_code, job.error_text, job.error_line,
+        )
+        if state is not None:
+            REGISTRY.merge_state(state)
+        return "predict"
+
+    async def _predict_stage(self, job : _Job) -> str:
+        job.label = int(await asyncio.wrap_future(self.batcher.submit(job.row)))
+        job.path = "model"
+        return "lookup"
+
+    async def _lookup_stage(self, job : _Job) -> None:
+        loop = asyncio.get_running_loop()
+        self._finish(job, await loop.run_in_executor(self.lookup_pool, self.recommender.lookup, job.label))
+
+    def health(self) -> dict[str, Any]:
+        return {
+            "status": "ok",
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "queues": {name: q.qsize() for name, q in self.queues.items()},
+        }
+
+    def metrics(self) -> dict[str, Any]:
+        return {
+            **self.health(),
+            "queue_size": self.queue_size,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "abandoned": self.abandoned,
+            "paths": dict(self.paths),
+            "stages": {name: s.as_dict() for name, s in self.stats.items()},
+            "batcher": self.batcher.stats(),
+            "instrumentation": REGISTRY.snapshot(),
+        }
+
+    def prometheus(self) -> str:
+        lines = [
+            "# HELP tppo_queue_depth Jobs waiting before a service stage",
+            "# TYPE tppo_queue_depth gauge",
+            *(f'tppo_queue_depth{{stage="{name}"}} {q.qsize()}' for name, q in self.queues.items()),
+            "# HELP tppo_requests_total Finished requests by answer path",
+            "# TYPE tppo_requests_total counter",
+            *(f'tppo_requests_total{{path="{p}"}} {n}' for p, n in sorted(self.paths.items())),
+            "# HELP tppo_rejected_total Requests rejected with 503 (full compile queue)",
+            "# TYPE tppo_rejected_total counter",
+            f"tppo_rejected_total {self.rejected}",
+            "# HELP tppo_timeouts_total Requests answered with 504",
+            "# TYPE tppo_timeouts_total counter",
+            f"tppo_timeouts_total {self.timeouts}",
+            "# HELP tppo_abandoned_total Jobs dropped at a stage entry because their request had already been answered",
+            "# TYPE tppo_abandoned_total counter",
+            f"tppo_abandoned_total {self.abandoned}",
+        ]
+        return "\n".join(lines) + "\n" + REGISTRY.to_prometheus()
+
+
+async def _read_request(reader : asyncio.StreamReader) -> tuple[str, str, bytes]:
+    request_line = (await reader.readline()).decode("latin-1").strip()
+    if not request_line:
+        raise ConnectionResetError
+    method, target, _ = request_line.split(" ", 2)
+    length = 0
+    while True:
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            break
+        key, _, value = line.partition(":")
+        if key.strip().lower() == "content-length":
+            length = int(value.strip())
+    if length > MAX_BODY_BYTES:
+        raise ValueError(f"request body too large: {length} bytes")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], body
+
+
+def _response(status : HTTPStatus, payload : dict | str) -> bytes:
+    # строка — текстовый формат Prometheus, остальное — JSON
+    if isinstance(payload, str):
+        body, content_type = payload.encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+    else:
+        body, content_type = json.dumps(payload, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8"
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+async def _handle(service : AnalysisService, method : str, path : str, body : bytes) -> tuple[HTTPStatus, dict | str]:
+    if method == "GET" and path == "/health":
+        return HTTPStatus.OK, service.health()
+    if method == "GET" and path == "/metrics":
+        return HTTPStatus.OK, service.prometheus()
+    if method == "GET" and path == "/metrics.json":
+        return HTTPStatus.OK, service.metrics()
+    if method == "POST" and path == "/recommend":
+        try:
+            code = json.loads(body or b"{}")["code"]
+        except (ValueError, KeyError, TypeError):
+            return HTTPStatus.BAD_REQUEST, {"error": 'expected JSON body {"code": "..."}'}
+        try:
+            return HTTPStatus.OK, await service.submit(code)
+        except Overloaded as exc:
+            return HTTPStatus.SERVICE_UNAVAILABLE, {"error": str(exc)}
+        except asyncio.TimeoutError:
+            return HTTPStatus.GATEWAY_TIMEOUT, {"error": f"no answer in {service.request_timeout_s}s"}
+        except Exception:
+            # трассировка — только в лог сервера: клиенту не нужны пути и внутренности
+            traceback.print_exc()
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": "internal error"}
+    return HTTPStatus.NOT_FOUND, {"error": f"{method} {path} not found"}
+
+
+async def serve(service : AnalysisService, host : str, port : int) -> None:
+    async def on_connection(reader : asyncio.StreamReader, writer : asyncio.StreamWriter) -> None:
+        try:
+            try:
+                method, path, body = await _read_request(reader)
+            except (ConnectionResetError, asyncio.IncompleteReadError):
+                return
+            except ValueError as exc:
+                status, payload = HTTPStatus.BAD_REQUEST, {"error": str(exc)}
+            else:
+                status, payload = await _handle(service, method, path, body)
+            writer.write(_response(status, payload))
+            await writer.drain()
+        finally:
+            writer.close()
+
+    await service.start()
+    snapshots = start_snapshots_from_env()
+    server = await asyncio.start_server(on_connection, host, port)
+    print(f"listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+        if snapshots is not None:
+            snapshots.stop()
+
+
+class ServiceClient:
+    """
+    Клиент сервиса с тем же analyze/recommend, что у Recommender, — его может использовать CompileErrorAdvisorApp
+    """
+    def __init__(self, url : str, *, timeout : float = 60.0) -> None:
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, path : str, payload : dict | None = None) -> dict:
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        req = urllib.request.Request(self.url + path, data=data, headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return json.loads(resp.read().decode("utf-8"))
+        except urllib.error.HTTPError as exc:
+            text = exc.read().decode("utf-8", errors="replace")
+            try:
+                detail = json.loads(text or "{}").get("error", "")
+            except (ValueError, AttributeError):
+                # ответ не от сервиса (страница прокси, пустой 502)
+                detail = text.strip()
+            raise RuntimeError(f"service {exc.code}: {detail}") from exc
+
+    def analyze(self, cpp_code : str) -> dict[str, Any]:
+        return self._request("/recommend", {"code": cpp_code})
+
+    def recommend(self, cpp_code : str) -> str:
+        return self.analyze(cpp_code)["recommendation"]
+
+    def health(self) -> dict:
+        return self._request("/health")
+
+    def metrics(self) -> dict:
+        return self._request("/metrics.json")
+
+
+def make_service(recommender : Recommender, cfg : dict) -> AnalysisService:
+    """
+    AnalysisService по секциям serving.service и serving.micro_batch конфига
+    """
+    serving = cfg.get("serving", {}) or {}
+    svc_cfg = serving.get("service", {}) or {}
+    mb_cfg = serving.get("micro_batch", {}) or {}
+    return AnalysisService(
+        recommender,
+        compile_workers=int(svc_cfg.get("compile_workers", 4)),
+        parse_workers=int(svc_cfg.get("parse_workers", 2)),
+        queue_size=int(svc_cfg.get("queue_size", 64)),
+        max_batch_size=int(mb_cfg.get("max_batch_size", 32)) if mb_cfg.get("enabled", True) else 1,
+        max_wait_ms=float(mb_cfg.get("max_wait_ms", 5.0)),
+        request_timeout_s=float(svc_cfg.get("request_timeout_s", 30.0)),
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HTTP/JSON сервис рекомендаций: POST /recommend, GET /health, GET /metrics (Prometheus), GET /metrics.json")
+    parser.add_argument("--model", type=Path, default=MODELS_DIR / "knn_cosine_1")
+    parser.add_argument("--config", type=Path, default=DEFAULT_CONFIG_PATH)
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--profile", type=float, default=None, metavar="RATE",
+                        help="доля профилируемых запросов/пачек (cProfile + tracemalloc), как TPPO_PROFILE")
+    parser.add_argument("--profile-dir", type=Path, default=None)
+    args = parser.parse_args()
+    if args.profile is not None:
+        configure_profiling(args.profile, args.profile_dir)
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    svc_cfg = (cfg.get("serving", {}) or {}).get("service", {}) or {}
+    service = make_service(Recommender(args.model, cfg=cfg), cfg)
+    asyncio.run(serve(service, args.host or svc_cfg.get("host", "127.0.0.1"), args.port or int(svc_cfg.get("port", 8765))))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+import argparse, json, re, shutil, sqlite3, time, joblib, yaml, pandas as pd
+from datetime import datetime, timezone
+from pathlib import Path
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
+from config import DB_SNAPSHOT_PATH, DEFAULT_CONFIG_PATH
+from ml_helpers.compact_bundle import save_compact_bundle
+from ml_helpers.dawg_vocab import convert_vocabularies
+from ml_helpers.fingerprint import FINGERPRINT_DIRNAME, FingerprintIndex, load_fingerprint_index
+from ml_helpers.incremental import append_rows
+from .flat_predictor import FLAT_DIRNAME, compile_pipeline, load_flat_predictor, save_flat_predictor, verify_flat_predictor
+from .import_model import load_sklearn_model_bundle
+
+
+INCREMENTS_DIRNAME = "increments"
+VERSION_SUFFIX_RE = re.compile(r"_u\d+$")
+
+def read_rows(path : str | Path) -> pd.DataFrame:
+    """
+    Новые размеченные строки: .jsonl / .parquet / .csv со столбцами label, error_code, error_text_tokens, ctx_tokens, ctx_numeric
+    """
+    path = Path(path)
+    if path.suffix == ".jsonl":
+        df = pd.read_json(path, lines=True, dtype=False)
+    elif path.suffix == ".parquet":
+        df = pd.read_parquet(path)
+    elif path.suffix == ".csv":
+        df = pd.read_csv(path)
+    else:
+        raise ValueError(f"Unsupported rows file: {path}")
+    # признаки хранятся JSON-строками, как в training_data
+    for col in ("error_text_tokens", "ctx_tokens", "ctx_numeric"):
+        df[col] = df[col].map(lambda v: v if isinstance(v, str) else json.dumps(v, ensure_ascii=False))
+    return df
+
+
+def _increment_rows(root : Path) -> list[pd.DataFrame]:
+    inc_dir = root / INCREMENTS_DIRNAME
+    return [pd.read_json(p, lines=True, dtype=False) for p in sorted(inc_dir.glob("*.jsonl"))] if inc_dir.exists() else []
+
+
+def _dev_rows(training : dict, cfg : dict, db_path : str | Path) -> tuple[pd.DataFrame, str]:
+    """
+    Dev-часть исходного разбиения: SQL из meta бандла (у старых бандлов — data.sql из cfg),
+    train_test_split с test_size и random_state_split из meta.training и stratify=y, как в training_models.ipynb.
+    Без test_size в meta берутся все строки. Если число строк в БД разошлось с сохранённым n_rows, разбиение не воспроизвести — ValueError
+    """
+    sql = training.get("sql") or cfg["data"]["sql"]
+    with sqlite3.connect(db_path) as conn:
+        df = pd.read_sql(sql, conn)
+    n_rows = training.get("n_rows")
+    if n_rows is not None and len(df) != int(n_rows):
+        raise ValueError(f"В БД {len(df)} строк вместо {n_rows}: test-часть исходного разбиения не восстановить")
+    test_size = training.get("test_size")
+    if not test_size:
+        return df, sql
+    y = df["label"].astype(int).to_numpy()
+    df_dev, _ = train_test_split(df, test_size=test_size, random_state=training.get("random_state_split"), stratify=y)
+    return df_dev, sql
+
+
+def update_bundle(
+    src : str | Path,
+    new_rows : pd.DataFrame,
+    cfg : dict,
+    *,
+    out_dir : str | Path | None = None,
+    refresh : bool | None = None,
+    db_path : str | Path = DB_SNAPSHOT_PATH,
+) -> dict:
+    """
+    Новая версия бандла src с добавленными строками new_rows.
+    По умолчанию векторизатор заморожен и строки дописываются в опорную выборку kNN (ml_helpers.incremental.append_rows);
+    каждые update.refresh_every версий (или при refresh=True) модель переобучается с теми же гиперпараметрами
+    на dev-часть исходного разбиения (_dev_rows) плюс все накопленные строки — так обновляются словари и idf,
+    а test остаётся отложенным.
+    Накопленные строки хранятся в increments/ бандла и переходят в следующие версии.
+    Индекс отпечатков и FlatPredictor, если они были у src, обновляются вместе с моделью.
+    Результат — директория <имя без _uN>_u<версия> рядом с src (или out_dir), её принимает load_sklearn_model_bundle
+    """
+    t0 = time.perf_counter()
+    bundle = load_sklearn_model_bundle(src, mmap=False)
+    lineage = dict(bundle.meta.get("update") or {})
+    version = int(lineage.get("version", 0)) + 1
+    since_refresh = int(lineage.get("since_refresh", 0)) + 1
+    refresh_every = int((cfg.get("update", {}) or {}).get("refresh_every", 0) or 0)
+    if refresh is None:
+        refresh = bool(refresh_every) and since_refresh >= refresh_every
+
+    out = Path(out_dir) if out_dir is not None else bundle.root.parent / f"{VERSION_SUFFIX_RE.sub('', bundle.root.name)}_u{version}"
+    if out.resolve() == bundle.root.resolve():
+        raise ValueError("out_dir должен отличаться от исходной директории модели")
+    out.mkdir(parents=True, exist_ok=True)
+
+    increments = _increment_rows(bundle.root)
+    X_new, y_new = new_rows.drop(columns=["label"]), new_rows["label"].astype(int).to_numpy()
+    model = bundle.pipe
+    training = dict(bundle.meta.get("training") or {})
+    if refresh:
+        base, sql = _dev_rows(training, cfg, db_path)
+        full = pd.concat([base, *increments, new_rows], ignore_index=True)
+        X_all, y_all = full.drop(columns=["label"]), full["label"].astype(int).to_numpy()
+        if hasattr(model, "named_steps"):
+            model.set_params(memory=None)
+        model = clone(model).fit(X_all, y_all)
+        if bundle.meta.get("vocabulary") == "dawg":
+            convert_vocabularies(model)
+        report = {"n_added": len(y_new), "n_reference": len(y_all), "n_base_rows": len(base), "sql": sql}
+        # оценка подбора относилась к модели до переобучения
+        training.update(sql=sql, best_score_val=None)
+        since_refresh = 0
+    else:
+        report = append_rows(model, X_new, y_new)
+    t_model = time.perf_counter() - t0
+
+    fmt = bundle.meta.get("bundle_format", "joblib")
+    if fmt == "compact":
+        save_compact_bundle(model, out)
+    else:
+        joblib.dump(model, out / "model.joblib", compress=3)
+
+    # строки всех инкрементов переходят в новую версию: без них переобучение на БД их бы потеряло
+    inc_dir = out / INCREMENTS_DIRNAME
+    if (bundle.root / INCREMENTS_DIRNAME).exists() and bundle.root / INCREMENTS_DIRNAME != inc_dir:
+        shutil.copytree(bundle.root / INCREMENTS_DIRNAME, inc_dir, dirs_exist_ok=True)
+    inc_dir.mkdir(exist_ok=True)
+    new_rows.to_json(inc_dir / f"rows_u{version:04d}.jsonl", orient="records", lines=True, force_ascii=False)
+
+    fingerprints = load_fingerprint_index(bundle.root, mmap=False)
+    if fingerprints is not None:
+        if refresh:
+            fingerprints = FingerprintIndex(fingerprints.min_count, fingerprints.min_purity).fit(X_all, y_all)
+        else:
+            fingerprints.partial_fit(X_new, y_new)
+        fingerprints.save(out / FINGERPRINT_DIRNAME)
+        report["fingerprints"] = len(fingerprints)
+
+    if load_flat_predictor(bundle.root) is not None:
+        flat = compile_pipeline(model)
+        check = verify_flat_predictor(flat, model, X_new)
+        if not check["same_features"] or check["prediction_mismatches"]:
+            raise ValueError(f"FlatPredictor расходится с обновлённой моделью: {check}")
+        save_flat_predictor(flat, out / FLAT_DIRNAME)
+
+    report.update(mode="refresh" if refresh else "append", seconds=round(time.perf_counter() - t0, 3), model_seconds=round(t_model, 3))
+    meta = dict(bundle.meta)
+    if training:
+        meta["training"] = training
+    meta["update"] = {
+        "version": version,
+        "parent": bundle.root.name,
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "since_refresh": since_refresh,
+        "n_increment_rows": sum(len(d) for d in increments) + len(y_new),
+        **report,
+    }
+    if fingerprints is not None:
+        meta["fingerprints"] = len(fingerprints)
+    # классы могли пополниться новыми рекомендациями
+    meta.setdefault("model", {})["classes"] = model.classes_.tolist()
+    (out / "meta.json").write_text(json.dumps(meta, ensure_ascii=False, indent=2, default=repr), encoding="utf-8")
+    return {"out": str(out), **meta["update"]}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Новая версия kNN-модели с добавленными размеченными строками без полного обучения")
+    parser.add_argument("model", type=Path, help="директория модели")
+    parser.add_argument("rows", type=Path, help="новые строки: .jsonl / .parquet / .csv")
+    parser.add_argument("--out", type=Path, default=None, help="по умолчанию <model без _uN>_u<версия> рядом с моделью")
+    parser.add_argument("--refresh", action=argparse.BooleanOptionalAction, default=None,
+                        help="переобучить векторизатор и модель (по умолчанию — по update.refresh_every)")
+    parser.add_argument("--db", type=Path, default=DB_SNAPSHOT_PATH)
+    parser.add_argument("--config", type=Path, default=DEFAULT_CONFIG_PATH)
+    args = parser.parse_args()
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        cfg = yaml.safe_load(f)
+    report = update_bundle(args.model, read_rows(args.rows), cfg, out_dir=args.out, refresh=args.refresh, db_path=args.db)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,23 @@
 from .tuning import prepare_param_grids, _infer_max_resources_from_grid, _import_obj
 from .vectorizers import build_vectorizer_from_cfg
+from .reduction import DenseReducer
+from .caching import get_cache_cfg, make_pipeline_memory, release_pipeline_memory
+from .fold_search import FoldFeatures, FoldSearchResult, precompute_cv_features, fold_grid_search
+from .knn_search import cosine_topk
+from .cosine_knn import SparseCosineKNN
+from .ann_knn import IVFCosineKNN
+from .routed import ErrorCodeRouter
+from .prototypes import PrototypeSelectionClassifier
+from .cascade import ConfidenceCascadeClassifier
+from .incremental import append_rows, append_to_classifier
+from .evaluation import evaluate_model, compare_models
+from .compact_bundle import save_compact_bundle, load_compact_model, is_compact_bundle
+from .dawg_vocab import DawgVocabulary, DawgTfidfVectorizer, convert_vocabularies, vocabulary_equivalence
+from .fingerprint import FingerprintIndex, canonical_fingerprint, load_fingerprint_index, predict_with_fingerprints
+from .path_search import REG_PATH_PARAMS
+from .results_store import CVResultsStore, make_results_store
+from .shared_sparse import SharedCSR, SharedFolds, share_cv_features, parallel_fold_outputs, parallel_cross_val_predict
+from .feature_store import FeatureSet, build_or_load_feature_set, build_or_load_fold_features, load_feature_set, fit_on_feature_set, feature_set_matrix, feature_config_hash, data_fingerprint
 
 
 __all__ = [
@@ -7,4 +25,49 @@ __all__ = [
     "_infer_max_resources_from_grid",
     "_import_obj",
     "build_vectorizer_from_cfg",
+    "DenseReducer",
+    "FeatureSet",
+    "build_or_load_feature_set",
+    "build_or_load_fold_features",
+    "fit_on_feature_set",
+    "feature_set_matrix",
+    "load_feature_set",
+    "feature_config_hash",
+    "data_fingerprint",
+    "get_cache_cfg",
+    "make_pipeline_memory",
+    "release_pipeline_memory",
+    "FoldFeatures",
+    "FoldSearchResult",
+    "precompute_cv_features",
+    "fold_grid_search",
+    "cosine_topk",
+    "SparseCosineKNN",
+    "IVFCosineKNN",
+    "ErrorCodeRouter",
+    "PrototypeSelectionClassifier",
+    "ConfidenceCascadeClassifier",
+    "append_rows",
+    "append_to_classifier",
+    "evaluate_model",
+    "compare_models",
+    "save_compact_bundle",
+    "load_compact_model",
+    "is_compact_bundle",
+    "DawgVocabulary",
+    "DawgTfidfVectorizer",
+    "convert_vocabularies",
+    "vocabulary_equivalence",
+    "FingerprintIndex",
+    "canonical_fingerprint",
+    "load_fingerprint_index",
+    "predict_with_fingerprints",
+    "REG_PATH_PARAMS",
+    "CVResultsStore",
+    "make_results_store",
+    "SharedCSR",
+    "SharedFolds",
+    "share_cv_features",
+    "parallel_fold_outputs",
+    "parallel_cross_val_predict",
 ]
\ No newline at end of file
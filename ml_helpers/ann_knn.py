@@ -0,0 +1,132 @@
+import numpy as np, scipy.sparse as sp
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import normalize
+from sklearn.random_projection import SparseRandomProjection
+from sklearn.utils.validation import check_is_fitted
+from .knn_search import neighbor_weights, vote_predict, vote_proba
+
+
+class IVFCosineKNN(ClassifierMixin, BaseEstimator):
+    """
+    Приближённый kNN по косинусу (IVF): обучающие строки разбиты на n_lists списков по центроидам
+    сферического k-means в пространстве случайной проекции (projection_dim), запрос просматривает
+    только n_probe ближайших списков и точно переранжирует их строки по косинусу в исходном TF-IDF.
+    n_probe = n_lists даёт точный ответ, меньшие значения — быстрее ценой полноты (recall)
+    """
+    def __init__(
+        self,
+        n_neighbors : int = 5,
+        weights : str = "uniform",
+        n_lists : int = 64,
+        n_probe : int = 8,
+        projection_dim : int = 128,
+        random_state : int | None = 42,
+    ) -> None:
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.projection_dim = projection_dim
+        self.random_state = random_state
+
+    def _project(self, Xn : sp.csr_matrix) -> np.ndarray:
+        # то же, что SparseRandomProjection.transform, но без проверок входа на каждый запрос
+        Z = (Xn @ self._components_T).toarray()
+        return normalize(Z.astype(np.float32, copy=False))
+
+    def fit(self, X, y):
+        X = sp.csr_matrix(X, dtype=np.float64)
+        y = np.asarray(y)
+        if X.shape[0] != y.shape[0]:
+            raise ValueError(f"X has {X.shape[0]} rows, y has {y.shape[0]}")
+        if self.weights not in {"uniform", "distance"}:
+            raise ValueError(f"Unsupported weights: {self.weights!r}")
+
+        Xn = normalize(X, copy=True)
+        n_lists = max(1, min(self.n_lists, X.shape[0]))
+
+        projection = SparseRandomProjection(n_components=self.projection_dim, random_state=self.random_state).fit(Xn)
+        self._components_T = sp.csr_matrix(projection.components_.T)
+        Z = self._project(Xn)
+        km = MiniBatchKMeans(n_clusters=n_lists, n_init=3, random_state=self.random_state).fit(Z)
+        self.centroids_ = normalize(km.cluster_centers_.astype(np.float32))
+        assign = np.argmax(Z @ self.centroids_.T, axis=1)
+
+        # строки упорядочены по спискам: список l — позиции [list_offsets_[l], list_offsets_[l + 1]) в list_rows_;
+        # для каждого списка хранится уже транспонированная нормированная матрица
+        order = np.argsort(assign, kind="stable")
+        self.list_offsets_ = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))])
+        self.list_rows_ = order
+        Xs = Xn[order]
+        self._lists_T = [
+            Xs[lo:hi].T.tocsr() for lo, hi in zip(self.list_offsets_[:-1], self.list_offsets_[1:])
+        ]
+
+        self.classes_, self._y = np.unique(y, return_inverse=True)
+        self.n_features_in_ = X.shape[1]
+        self.n_samples_fit_ = X.shape[0]
+        return self
+
+    def _probe_lists(self, Zq : np.ndarray, k : int) -> list[np.ndarray]:
+        # списки по убыванию близости центроида; берём n_probe, но не меньше, чем нужно для k кандидатов
+        sizes = np.diff(self.list_offsets_)
+        order = np.argsort(-(Zq @ self.centroids_.T), axis=1)
+        covered = np.cumsum(sizes[order], axis=1)
+        n_needed = np.argmax(covered >= k, axis=1) + 1
+        n_take = np.maximum(n_needed, min(self.n_probe, len(sizes)))
+        return [order[i, :n] for i, n in enumerate(n_take)]
+
+    def kneighbors(self, X, n_neighbors : int | None = None, return_distance : bool = True):
+        check_is_fitted(self, "_lists_T")
+        k = n_neighbors or self.n_neighbors
+        if k > self.n_samples_fit_:
+            raise ValueError(f"Expected n_neighbors <= n_samples_fit, but n_neighbors = {k}, n_samples_fit = {self.n_samples_fit_}")
+
+        Xq = normalize(sp.csr_matrix(X, dtype=np.float64), copy=True)
+        if Xq.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {Xq.shape[1]} features, but IVFCosineKNN is expecting {self.n_features_in_}")
+        probes = self._probe_lists(self._project(Xq), k)
+
+        # по каждому списку считаем косинусы сразу для всех запросов, которые его просматривают
+        by_list : dict[int, list[int]] = {}
+        for qi, lists in enumerate(probes):
+            for l in lists:
+                by_list.setdefault(int(l), []).append(qi)
+
+        n_query = Xq.shape[0]
+        best_d = np.full((n_query, k), np.inf)
+        best_i = np.full((n_query, k), -1, dtype=np.intp)
+        for l, qs in by_list.items():
+            lo, hi = self.list_offsets_[l], self.list_offsets_[l + 1]
+            if lo == hi:
+                continue
+            qs = np.asarray(qs)
+            S = (Xq[qs] @ self._lists_T[l]).toarray()
+            D = np.clip(1.0 - S, 0.0, 2.0)
+
+            cand_d = np.hstack([best_d[qs], D])
+            cand_i = np.hstack([best_i[qs], np.broadcast_to(np.arange(lo, hi), D.shape)])
+            top = np.argpartition(cand_d, k - 1, axis=1)[:, :k]
+            rows = np.arange(len(qs))[:, None]
+            best_d[qs] = cand_d[rows, top]
+            best_i[qs] = cand_i[rows, top]
+
+        rows = np.arange(n_query)[:, None]
+        srt = np.argsort(best_d, axis=1, kind="stable")
+        best_d, best_i = best_d[rows, srt], best_i[rows, srt]
+        # индексы в исходной нумерации обучающей выборки
+        ind = self.list_rows_[best_i]
+        return (best_d, ind) if return_distance else ind
+
+    def _neighbors_votes(self, X) -> tuple[np.ndarray, np.ndarray | None]:
+        dist, ind = self.kneighbors(X)
+        return self._y[ind], neighbor_weights(dist, self.weights)
+
+    def predict(self, X) -> np.ndarray:
+        neigh_y, w = self._neighbors_votes(X)
+        return self.classes_[vote_predict(neigh_y, w, len(self.classes_))]
+
+    def predict_proba(self, X) -> np.ndarray:
+        neigh_y, w = self._neighbors_votes(X)
+        return vote_proba(neigh_y, w, len(self.classes_))
@@ -0,0 +1,58 @@
+import shutil
+from datetime import timedelta
+from pathlib import Path
+from joblib import Memory
+from config import PIPELINE_CACHE_DIR
+
+
+CACHE_MODES = {"none", "memory", "precompute"}
+
+def get_cache_cfg(cfg : dict) -> dict:
+    cache_cfg = dict(cfg.get("training", {}).get("feature_cache", {}) or {})
+    mode = cache_cfg.setdefault("mode", "none")
+    if mode not in CACHE_MODES:
+        raise ValueError(f"Unknown feature_cache mode: {mode!r}, expected one of {sorted(CACHE_MODES)}")
+    return cache_cfg
+
+
+def make_pipeline_memory(cache_cfg : dict) -> Memory | None:
+    """
+    joblib.Memory для Pipeline(memory=...) и кеша фолдов.
+    Перед возвратом кеш подрезается по bytes_limit / age_limit_hours, чтобы не рос бесконечно между запусками
+    """
+    if cache_cfg.get("mode", "none") == "none":
+        return None
+
+    location = Path(cache_cfg.get("dir") or PIPELINE_CACHE_DIR)
+    location.mkdir(parents=True, exist_ok=True)
+    memory = Memory(str(location), verbose=int(cache_cfg.get("verbose", 0)))
+    reduce_pipeline_memory(memory, cache_cfg)
+    return memory
+
+
+def reduce_pipeline_memory(memory : Memory | None, cache_cfg : dict) -> None:
+    if memory is None:
+        return
+
+    bytes_limit = cache_cfg.get("bytes_limit")
+    items_limit = cache_cfg.get("items_limit")
+    age_limit_hours = cache_cfg.get("age_limit_hours")
+    age_limit = timedelta(hours=float(age_limit_hours)) if age_limit_hours is not None else None
+
+    if bytes_limit is None and items_limit is None and age_limit is None:
+        return
+    memory.reduce_size(bytes_limit=bytes_limit, items_limit=items_limit, age_limit=age_limit)
+
+
+def release_pipeline_memory(memory : Memory | None, cache_cfg : dict) -> None:
+    """
+    Вызывается после поиска: либо полностью очищает кеш (clear_on_finish), либо подрезает его по лимитам
+    """
+    if memory is None:
+        return
+
+    if cache_cfg.get("clear_on_finish", False):
+        memory.clear(warn=False)
+        shutil.rmtree(memory.location, ignore_errors=True)
+        return
+    reduce_pipeline_memory(memory, cache_cfg)
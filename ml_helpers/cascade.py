@@ -0,0 +1,126 @@
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.model_selection import train_test_split
+from sklearn.utils.validation import check_is_fitted
+
+
+def proba_margin(proba : np.ndarray) -> np.ndarray:
+    """
+    Разница двух старших вероятностей строки; при одном классе — 1
+    """
+    if proba.shape[1] < 2:
+        return np.ones(proba.shape[0])
+    top2 = np.partition(proba, -2, axis=1)[:, -2:]
+    return top2[:, 1] - top2[:, 0]
+
+
+def choose_threshold(margin : np.ndarray, fast_ok : np.ndarray, slow_ok : np.ndarray, tolerance : float) -> tuple[float, float]:
+    """
+    Наименьший порог margin (чем он меньше, тем чаще отвечает быстрая модель), при котором точность каскада
+    на калибровочной выборке не ниже точности медленной модели минус tolerance.
+    Строки с margin >= порога отвечает быстрая модель, остальные — медленная. Возвращает (порог, точность каскада)
+    """
+    n = len(margin)
+    order = np.argsort(-margin, kind="stable")
+    m, f, s = margin[order], fast_ok[order].astype(np.int64), slow_ok[order].astype(np.int64)
+    # быстрой модели отдаются первые i строк по убыванию margin: верных f[:i] + s[i:]
+    correct = np.concatenate([[0], np.cumsum(f)]) + np.concatenate([np.cumsum(s[::-1])[::-1], [0]])
+    target = s.sum() - tolerance * n
+    # отсечь можно только между разными значениями margin
+    cuts = np.concatenate([[0], np.flatnonzero(np.diff(m) != 0) + 1, [n]])
+    ok = cuts[correct[cuts] >= target - 1e-9]
+    i = int(ok.max())
+    threshold = np.inf if i == 0 else float(m[i - 1])
+    return threshold, float(correct[i] / n)
+
+
+class ConfidenceCascadeClassifier(ClassifierMixin, BaseEstimator):
+    """
+    Два уровня на одних признаках: быстрая модель (обычно линейная) отвечает, если разница двух старших
+    вероятностей её predict_proba не ниже threshold_, остальные строки уходят в медленную (kNN).
+    threshold_ подбирается при fit на отложенной доле calibration_size: наименьший, при котором точность
+    каскада не ниже точности медленной модели минус tolerance; затем обе модели дообучаются на всех данных.
+    threshold задаёт порог вручную (калибровка пропускается, calibration_ = None)
+    """
+    def __init__(
+        self,
+        fast,
+        slow,
+        *,
+        tolerance : float = 0.005,
+        calibration_size : float = 0.2,
+        threshold : float | None = None,
+        random_state : int | None = 42,
+    ) -> None:
+        self.fast = fast
+        self.slow = slow
+        self.tolerance = tolerance
+        self.calibration_size = calibration_size
+        self.threshold = threshold
+        self.random_state = random_state
+
+    def _calibrate(self, X, y : np.ndarray) -> float:
+        _, counts = np.unique(y, return_counts=True)
+        X_fit, X_cal, y_fit, y_cal = train_test_split(
+            X, y,
+            test_size=self.calibration_size,
+            random_state=self.random_state,
+            stratify=y if counts.min() >= 2 else None,
+        )
+        fast = clone(self.fast).fit(X_fit, y_fit)
+        slow = clone(self.slow)
+        # kNN на калибровочном срезе: соседей не может быть больше, чем строк
+        k = slow.get_params().get("n_neighbors")
+        if isinstance(k, int) and k > len(y_fit):
+            slow.set_params(n_neighbors=len(y_fit))
+        slow.fit(X_fit, y_fit)
+
+        proba = fast.predict_proba(X_cal)
+        fast_ok = fast.classes_[proba.argmax(axis=1)] == y_cal
+        slow_ok = slow.predict(X_cal) == y_cal
+        threshold, cascade_acc = choose_threshold(proba_margin(proba), fast_ok, slow_ok, self.tolerance)
+        self.calibration_ = {
+            "n_rows": len(y_cal),
+            "fast_accuracy": float(fast_ok.mean()),
+            "slow_accuracy": float(slow_ok.mean()),
+            "cascade_accuracy": cascade_acc,
+            "fast_rate": float(np.mean(proba_margin(proba) >= threshold)),
+        }
+        return threshold
+
+    def fit(self, X, y):
+        y = np.asarray(y)
+        self.classes_ = np.unique(y)
+        if self.threshold is not None:
+            self.threshold_, self.calibration_ = float(self.threshold), None
+        else:
+            self.threshold_ = self._calibrate(X, y)
+        self.fast_ = clone(self.fast).fit(X, y)
+        self.slow_ = clone(self.slow).fit(X, y)
+        return self
+
+    def _route(self, X) -> tuple[np.ndarray, np.ndarray]:
+        check_is_fitted(self, "fast_")
+        proba = self.fast_.predict_proba(X)
+        return proba, proba_margin(proba) < self.threshold_
+
+    def predict(self, X) -> np.ndarray:
+        proba, slow = self._route(X)
+        pred = self.fast_.classes_[proba.argmax(axis=1)]
+        if slow.any():
+            pred[slow] = self.slow_.predict(X[np.flatnonzero(slow)])
+        return pred
+
+    def predict_proba(self, X) -> np.ndarray:
+        proba, slow = self._route(X)
+        proba = proba.copy()
+        if slow.any():
+            proba[slow] = self.slow_.predict_proba(X[np.flatnonzero(slow)])
+        return proba
+
+    def fast_rate(self, X) -> float:
+        """
+        Доля строк X, на которых отвечает быстрая модель
+        """
+        _, slow = self._route(X)
+        return float(1.0 - slow.mean()) if len(slow) else 0.0
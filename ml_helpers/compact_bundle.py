@@ -0,0 +1,160 @@
+import io, json, pickle, shutil, numpy as np, scipy.sparse as sp
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+
+BUNDLE_FORMAT = "compact-v1"
+BUNDLE_FILENAME = "bundle.json"
+MODEL_PICKLE_FILENAME = "model.pkl"
+ARRAYS_DIRNAME = "arrays"
+MIN_ARRAY_BYTES = 4096
+
+# атрибуты разреженных матриц scipy с индексами: только их int64 -> int32 без изменения поведения модели
+SPARSE_INDEX_ATTRS = ("indices", "indptr", "row", "col")
+
+def _can_downcast_int(a : np.ndarray) -> bool:
+    if a.dtype != np.int64 or a.size == 0:
+        return False
+    info = np.iinfo(np.int32)
+    return bool(a.min() >= info.min and a.max() <= info.max)
+
+
+class _ArrayPickler(pickle.Pickler):
+    """
+    Крупные числовые ndarray уходят в arrays/*.npy (несжатые, чтобы открывать через memmap),
+    в pickle остаётся только ссылка на файл
+    """
+    def __init__(self, file, arrays_dir : Path, *, downcast_float32 : bool, min_bytes : int) -> None:
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrays_dir = arrays_dir
+        self.downcast_float32 = downcast_float32
+        self.min_bytes = min_bytes
+        self.arrays : dict[str, dict[str, Any]] = {}
+        self._by_id : dict[int, str] = {}
+        self._keep_alive : list[Any] = []
+        self._sparse_index_ids : set[int] = set()
+
+    def persistent_id(self, obj):
+        if sp.issparse(obj):
+            # матрица сериализуется раньше своих атрибутов: запоминаем её массивы индексов
+            for attr in SPARSE_INDEX_ATTRS:
+                a = getattr(obj, attr, None)
+                if isinstance(a, np.ndarray):
+                    self._sparse_index_ids.add(id(a))
+                    self._keep_alive.append(a)
+            return None
+        if type(obj) is not np.ndarray and not isinstance(obj, np.memmap):
+            return None
+        if obj.dtype.hasobject or obj.nbytes < self.min_bytes:
+            return None
+        if id(obj) in self._by_id:
+            return ("npy", self._by_id[id(obj)])
+
+        name = f"a{len(self.arrays):05d}"
+        arr = np.asarray(obj)
+        original = str(arr.dtype)
+        sparse_index = id(obj) in self._sparse_index_ids
+        if self.downcast_float32 and arr.dtype == np.float64:
+            arr = arr.astype(np.float32)
+        elif sparse_index and _can_downcast_int(arr):
+            # индексы разреженных матриц в int32 без потерь; прочие int64 (например, classes_) не трогаются
+            arr = arr.astype(np.int32)
+        np.save(self.arrays_dir / f"{name}.npy", np.ascontiguousarray(arr), allow_pickle=False)
+
+        self.arrays[name] = {
+            "shape": list(arr.shape),
+            "dtype": str(arr.dtype),
+            "original_dtype": original,
+            "sparse_index": sparse_index,
+            "nbytes": int(arr.nbytes),
+        }
+        self._by_id[id(obj)] = name
+        self._keep_alive.append(obj)   # id() уникален только пока объект жив
+        return ("npy", name)
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    def __init__(self, file, arrays_dir : Path, arrays : dict[str, dict[str, Any]], *, mmap : bool) -> None:
+        super().__init__(file)
+        self.arrays_dir = arrays_dir
+        self.arrays = arrays
+        self.mmap_mode = "r" if mmap else None
+        self._cache : dict[str, np.ndarray] = {}
+
+    def persistent_load(self, pid):
+        kind, name = pid
+        if kind != "npy":
+            raise pickle.UnpicklingError(f"Unknown persistent id: {pid!r}")
+        if name not in self._cache:
+            arr = np.load(self.arrays_dir / f"{name}.npy", mmap_mode=self.mmap_mode, allow_pickle=False)
+            info = self.arrays.get(name, {})
+            original = info.get("original_dtype", str(arr.dtype))
+            # int-массивы, сжатые не как индексы разреженных матриц (бандлы до sparse_index), возвращаются к
+            # исходному типу копией; индексы и явный downcast_float32 остаются как есть (memmap)
+            if original != str(arr.dtype) and np.dtype(original).kind in "iu" and not info.get("sparse_index", False):
+                arr = arr.astype(original)
+            self._cache[name] = arr
+        return self._cache[name]
+
+
+def save_compact_bundle(
+    model,
+    out_dir : str | Path,
+    *,
+    downcast_float32 : bool = False,
+    min_array_bytes : int = MIN_ARRAY_BYTES,
+    verify_X = None,
+) -> Path:
+    """
+    Сохраняет модель в компактном формате: pickle без массивов + arrays/*.npy + bundle.json.
+    downcast_float32 переводит float64-массивы в float32 (вдвое меньше на диске и в памяти);
+    с verify_X модель сразу перечитывается и её predict сверяется с исходной
+    """
+    root = Path(out_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    arrays_dir = root / ARRAYS_DIRNAME
+    if arrays_dir.exists():
+        shutil.rmtree(arrays_dir)
+    arrays_dir.mkdir()
+
+    buf = io.BytesIO()
+    pickler = _ArrayPickler(buf, arrays_dir, downcast_float32=downcast_float32, min_bytes=min_array_bytes)
+    pickler.dump(model)
+    (root / MODEL_PICKLE_FILENAME).write_bytes(buf.getvalue())
+
+    bundle = {
+        "format": BUNDLE_FORMAT,
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "model": MODEL_PICKLE_FILENAME,
+        "downcast_float32": downcast_float32,
+        "pickle_bytes": len(buf.getvalue()),
+        "arrays": pickler.arrays,
+    }
+    (root / BUNDLE_FILENAME).write_text(json.dumps(bundle, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if verify_X is not None:
+        expected = model.predict(verify_X)
+        got = load_compact_model(root).predict(verify_X)
+        mismatch = int(np.sum(expected != got))
+        if mismatch:
+            raise ValueError(f"Compact bundle changes {mismatch} of {len(expected)} predictions (downcast_float32={downcast_float32})")
+    return root
+
+
+def is_compact_bundle(root : str | Path) -> bool:
+    return (Path(root) / BUNDLE_FILENAME).exists()
+
+
+def load_compact_model(root : str | Path, *, mmap : bool = True):
+    """
+    Читает модель компактного формата; массивы открываются через np.load(mmap_mode="r"),
+    поэтому загрузка не читает их целиком, а страницы общие для всех процессов с этой моделью
+    """
+    root = Path(root)
+    bundle = json.loads((root / BUNDLE_FILENAME).read_text(encoding="utf-8"))
+    if bundle.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Unsupported bundle format: {bundle.get('format')!r}, expected {BUNDLE_FORMAT!r}")
+
+    with open(root / bundle["model"], "rb") as f:
+        return _ArrayUnpickler(f, root / ARRAYS_DIRNAME, bundle.get("arrays", {}), mmap=mmap).load()
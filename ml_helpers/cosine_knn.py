@@ -0,0 +1,61 @@
+import numpy as np, scipy.sparse as sp
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.preprocessing import normalize
+from sklearn.utils.validation import check_is_fitted
+from .knn_search import cosine_topk, neighbor_weights, vote_predict, vote_proba
+
+
+class SparseCosineKNN(ClassifierMixin, BaseEstimator):
+    """
+    Точный kNN по косинусному расстоянию для разреженных TF-IDF признаков.
+    Обучающая матрица L2-нормируется и транспонируется один раз в fit, запрос считается
+    блоками строк (sparse @ sparse) в пределах working_memory (МБ, по умолчанию sklearn working_memory),
+    top-k выбирается через argpartition. Предсказания совпадают с
+    KNeighborsClassifier(metric="cosine", algorithm="brute") с точностью до равных расстояний на границе k
+    """
+    def __init__(self, n_neighbors : int = 5, weights : str = "uniform", working_memory : float | None = None) -> None:
+        self.n_neighbors = n_neighbors
+        self.weights = weights
+        self.working_memory = working_memory
+
+    def fit(self, X, y):
+        X = sp.csr_matrix(X, dtype=np.float64)
+        y = np.asarray(y)
+        if y.ndim != 1:
+            raise ValueError(f"SparseCosineKNN expects 1d y, got shape {y.shape}")
+        if X.shape[0] != y.shape[0]:
+            raise ValueError(f"X has {X.shape[0]} rows, y has {y.shape[0]}")
+        if self.weights not in {"uniform", "distance"}:
+            raise ValueError(f"Unsupported weights: {self.weights!r}")
+
+        self.classes_, self._y = np.unique(y, return_inverse=True)
+        self._fit_X_T = normalize(X, copy=True).T.tocsr()
+        self.n_features_in_ = X.shape[1]
+        self.n_samples_fit_ = X.shape[0]
+        return self
+
+    def _check_X(self, X) -> sp.csr_matrix:
+        check_is_fitted(self, "_fit_X_T")
+        X = sp.csr_matrix(X, dtype=np.float64)
+        if X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[1]} features, but SparseCosineKNN is expecting {self.n_features_in_}")
+        return X
+
+    def kneighbors(self, X, n_neighbors : int | None = None, return_distance : bool = True):
+        k = n_neighbors or self.n_neighbors
+        if k > self.n_samples_fit_:
+            raise ValueError(f"Expected n_neighbors <= n_samples_fit, but n_neighbors = {k}, n_samples_fit = {self.n_samples_fit_}")
+        dist, ind = cosine_topk(self._check_X(X), self._fit_X_T, k, working_memory=self.working_memory)
+        return (dist, ind) if return_distance else ind
+
+    def _neighbors_votes(self, X) -> tuple[np.ndarray, np.ndarray | None]:
+        dist, ind = self.kneighbors(X)
+        return self._y[ind], neighbor_weights(dist, self.weights)
+
+    def predict(self, X) -> np.ndarray:
+        neigh_y, w = self._neighbors_votes(X)
+        return self.classes_[vote_predict(neigh_y, w, len(self.classes_))]
+
+    def predict_proba(self, X) -> np.ndarray:
+        neigh_y, w = self._neighbors_votes(X)
+        return vote_proba(neigh_y, w, len(self.classes_))
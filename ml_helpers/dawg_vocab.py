@@ -0,0 +1,346 @@
+import copy, numpy as np
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Iterator
+from dawg_python import IntCompletionDAWG
+from dawg_python import wrapper
+from sklearn.base import BaseEstimator
+from sklearn.feature_extraction.text import CountVectorizer, TfidfVectorizer
+
+
+# формат dawgdic (его читает dawg_python): uint32-юниты двойного массива + guide (child, sibling) для обхода ключей
+IS_LEAF_BIT = 1 << 31
+HAS_LEAF_BIT = 1 << 8
+EXTENSION_BIT = 1 << 9
+BLOCK_SIZE = 256
+NUM_OPEN_BLOCKS = 16
+
+def _encode_offset(rel : int) -> int:
+    if rel < 1 << 21:
+        return rel << 10
+    return (rel << 2) | EXTENSION_BIT
+
+
+def _valid_offset(rel : int) -> bool:
+    # смещение юнита: либо < 2^21, либо кратно 256 и < 2^29
+    return rel < 1 << 21 or (rel & 0xFF == 0 and rel < 1 << 29)
+
+
+class _DoubleArrayBuilder:
+    """
+    Раскладка префиксного дерева в двойной массив dawgdic. Дети узла лежат по адресам base ^ label
+    в одном блоке из 256 юнитов, base у каждого узла свой (иначе follow_char мог бы найти чужого ребёнка).
+    Значение ключа — лист-юнит с IS_LEAF_BIT по адресу base (метка 0).
+    Свободные места ищутся только в последних NUM_OPEN_BLOCKS блоках, как в dawgdic: более старые блоки
+    считаются заполненными, их пустые юниты остаются нулями
+    """
+    def __init__(self) -> None:
+        self.units = array("I")
+        self.guide_child = bytearray()
+        self.guide_sibling = bytearray()
+        self.fixed = bytearray()
+        self.used_bases : set[int] = set()
+        # свободные позиции открытых блоков — двусвязный список, как extras в dawgdic; -1 — конец списка
+        self.next_free = array("i")
+        self.prev_free = array("i")
+        self.free_head = self.free_tail = -1
+        self.open_blocks : list[int] = []
+
+    def _add_block(self) -> int:
+        start = len(self.units)
+        self.units.extend([0] * BLOCK_SIZE)
+        self.guide_child.extend(bytes(BLOCK_SIZE))
+        self.guide_sibling.extend(bytes(BLOCK_SIZE))
+        self.fixed.extend(bytes(BLOCK_SIZE))
+        self.next_free.extend(range(start + 1, start + BLOCK_SIZE + 1))
+        self.prev_free.extend(range(start - 1, start + BLOCK_SIZE - 1))
+        self.next_free[-1] = -1
+        self.prev_free[start] = self.free_tail
+        if self.free_tail == -1:
+            self.free_head = start
+        else:
+            self.next_free[self.free_tail] = start
+        self.free_tail = start + BLOCK_SIZE - 1
+
+        self.open_blocks.append(start)
+        if len(self.open_blocks) > NUM_OPEN_BLOCKS:
+            closed = self.open_blocks.pop(0)
+            for pos in range(closed, closed + BLOCK_SIZE):
+                if not self.fixed[pos]:
+                    self._unlink(pos)
+        return start
+
+    def _unlink(self, pos : int) -> None:
+        nxt, prv = self.next_free[pos], self.prev_free[pos]
+        if prv == -1:
+            self.free_head = nxt
+        else:
+            self.next_free[prv] = nxt
+        if nxt == -1:
+            self.free_tail = prv
+        else:
+            self.prev_free[nxt] = prv
+
+    def _fix(self, pos : int) -> None:
+        self.fixed[pos] = 1
+        self._unlink(pos)
+
+    def _find_base(self, index : int, labels : list[int]) -> int:
+        fixed, used, next_free = self.fixed, self.used_bases, self.next_free
+        first, rest = labels[0], labels[1:]
+        pos = self.free_head
+        while pos != -1:
+            base = pos ^ first
+            if base not in used and _valid_offset(index ^ base) and all(not fixed[base ^ c] for c in rest):
+                return base
+            pos = next_free[pos]
+        # в новом блоке свободно всё; младший байт base как у index — смещение кратно 256
+        return self._add_block() | (index & 0xFF)
+
+    def arrange(self, index : int, node : list) -> list[tuple[int, list]]:
+        children, value = node
+        labels = sorted(children)
+        if value is not None:
+            labels.insert(0, 0)
+        base = self._find_base(index, labels)
+        self.used_bases.add(base)
+        for c in labels:
+            self._fix(base ^ c)
+
+        unit = (self.units[index] & 0xFF) | _encode_offset(index ^ base)
+        if value is not None:
+            unit |= HAS_LEAF_BIT
+            self.units[base] = value | IS_LEAF_BIT
+        self.units[index] = unit
+
+        # guide: у узла — первая ненулевая метка ребёнка, у ребёнка — метка следующего брата
+        char_labels = [c for c in labels if c]
+        if char_labels:
+            self.guide_child[index] = char_labels[0]
+        for c, nxt in zip(char_labels, char_labels[1:] + [0]):
+            self.units[base ^ c] = c
+            self.guide_sibling[base ^ c] = nxt
+        return [(base ^ c, children[c]) for c in char_labels]
+
+
+def build_dawg_bytes(vocabulary : Mapping[str, int]) -> bytes:
+    """
+    Собирает файл IntCompletionDAWG (формат dawgdic) из словаря термин -> индекс столбца.
+    Значения уникальны, поэтому минимизация DAWG ничего не даёт — строится префиксное дерево
+    """
+    root : list = [{}, None]
+    for term, idx in vocabulary.items():
+        key = term.encode("utf-8")
+        if b"\x00" in key:
+            raise ValueError(f"DAWG keys cannot contain NUL: {term!r}")
+        if not 0 <= idx < IS_LEAF_BIT:
+            raise ValueError(f"DAWG value out of range: {term!r} -> {idx}")
+        node = root
+        for b in key:
+            node = node[0].setdefault(b, [{}, None])
+        node[1] = int(idx)
+
+    builder = _DoubleArrayBuilder()
+    builder._add_block()
+    builder._fix(0)   # корень
+    stack = [(0, root)]
+    while stack:
+        index, node = stack.pop()
+        stack.extend(reversed(builder.arrange(index, node)))
+
+    n = len(builder.units)
+    guide = bytearray(2 * n)
+    guide[0::2] = builder.guide_child
+    guide[1::2] = builder.guide_sibling
+    return (
+        array("I", [n]).tobytes() + builder.units.tobytes()
+        + array("I", [n]).tobytes() + bytes(guide)
+    )
+
+
+def _load_dawg(data) -> IntCompletionDAWG:
+    """
+    IntCompletionDAWG поверх буфера без копирования: юниты и guide — memoryview на data
+    (для memmap из компактного бандла или load() страницы остаются общими между процессами)
+    """
+    buf = memoryview(data).cast("B")
+    n = buf[:4].cast("I")[0]
+    units_end = 4 + 4 * n
+    guide_n = buf[units_end:units_end + 4].cast("I")[0]
+    dawg = IntCompletionDAWG()
+    dawg.dct = wrapper.Dictionary()
+    dawg.guide = wrapper.Guide()
+    dawg.dct._units = buf[4:units_end].cast("I")
+    dawg.guide._units = buf[units_end + 4:units_end + 4 + 2 * guide_n]
+    return dawg
+
+
+class DawgVocabulary(Mapping):
+    """
+    Read-only словарь термин -> индекс столбца поверх IntCompletionDAWG (dawg_python).
+    Поиск такой же, как у dict в sklearn: [] кидает KeyError для незнакомого термина, get/in — точное совпадение.
+    В pickle хранится байтовый образ DAWG как uint8-ndarray: в компактном бандле он уходит отдельным файлом в arrays/
+    """
+    def __init__(self, data : bytes | np.ndarray, n_keys : int) -> None:
+        self._data = np.frombuffer(data, dtype=np.uint8) if isinstance(data, (bytes, bytearray)) else data
+        self._n_keys = int(n_keys)
+        self._dawg = _load_dawg(self._data)
+        self._units = self._dawg.dct._units
+
+    @classmethod
+    def from_dict(cls, vocabulary : Mapping[str, int]) -> "DawgVocabulary":
+        return cls(build_dawg_bytes(vocabulary), len(vocabulary))
+
+    @classmethod
+    def load(cls, path : str | Path) -> "DawgVocabulary":
+        # файл открывается через memmap; число ключей в формате dawgdic не хранится — считается обходом
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        return cls(data, sum(1 for _ in _load_dawg(data).iterkeys()))
+
+    def save(self, path : str | Path) -> Path:
+        # файл читается и напрямую: dawg_python.IntCompletionDAWG().load(path)
+        path = Path(path)
+        np.asarray(self._data).tofile(path)
+        return path
+
+    @property
+    def nbytes(self) -> int:
+        return int(self._data.nbytes)
+
+    def _find(self, term : str) -> int:
+        # то же, что Dictionary.find из dawg_python, но без вызова методов на каждый байт — это горячий путь transform
+        units = self._units
+        index = 0
+        for c in term.encode("utf-8"):
+            u = units[index]
+            index ^= ((u >> 10) << ((u & EXTENSION_BIT) >> 6)) ^ c
+            if units[index] & (IS_LEAF_BIT | 0xFF) != c:
+                return -1
+        u = units[index]
+        if not u & HAS_LEAF_BIT:
+            return -1
+        return units[index ^ ((u >> 10) << ((u & EXTENSION_BIT) >> 6))] & ~IS_LEAF_BIT
+
+    def __getitem__(self, term : str) -> int:
+        idx = self._find(term) if isinstance(term, str) else -1
+        if idx < 0:
+            raise KeyError(term)
+        return idx
+
+    def get(self, term : str, default=None):
+        idx = self._find(term) if isinstance(term, str) else -1
+        return default if idx < 0 else idx
+
+    def __contains__(self, term) -> bool:
+        return isinstance(term, str) and self._find(term) >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        return self._dawg.iterkeys()
+
+    def __len__(self) -> int:
+        return self._n_keys
+
+    def items(self):
+        return self._dawg.items()
+
+    def __getstate__(self) -> dict:
+        return {"data": self._data, "n_keys": self._n_keys}
+
+    def __setstate__(self, state : dict) -> None:
+        self.__init__(state["data"], state["n_keys"])
+
+    def __repr__(self) -> str:
+        return f"DawgVocabulary(n_keys={self._n_keys}, nbytes={self.nbytes})"
+
+
+def _to_dawg(vect : CountVectorizer) -> DawgVocabulary:
+    vocab = vect.vocabulary_
+    dawg = DawgVocabulary.from_dict(vocab)
+    vect.vocabulary_ = dawg
+    # stop_words_ нужен только для интроспекции, а при min_df/max_features бывает больше самого словаря
+    if hasattr(vect, "stop_words_"):
+        del vect.stop_words_
+    return dawg
+
+
+class DawgTfidfVectorizer(TfidfVectorizer):
+    """
+    TfidfVectorizer, у которого после fit словарь vocabulary_ хранится в DawgVocabulary.
+    transform даёт ту же матрицу, что и обычный TfidfVectorizer с теми же параметрами
+    """
+    def fit(self, raw_documents, y=None):
+        super().fit(raw_documents, y)
+        _to_dawg(self)
+        return self
+
+    def fit_transform(self, raw_documents, y=None):
+        X = super().fit_transform(raw_documents, y)
+        _to_dawg(self)
+        return X
+
+
+def _iter_vectorizers(obj, path : str = "", seen : set[int] | None = None):
+    # обход обученной модели: Pipeline.steps, ColumnTransformer.transformers_, models_ роутера, estimator_ и т.д.
+    seen = set() if seen is None else seen
+    if id(obj) in seen:
+        return
+    seen.add(id(obj))
+    if isinstance(obj, CountVectorizer) and hasattr(obj, "vocabulary_"):
+        yield path, obj
+        return
+    if isinstance(obj, BaseEstimator):
+        items = vars(obj).items()
+    elif isinstance(obj, dict):
+        items = obj.items()
+    elif isinstance(obj, (list, tuple)):
+        items = enumerate(obj)
+    else:
+        return
+    for key, value in items:
+        yield from _iter_vectorizers(value, f"{path}.{key}" if path else str(key), seen)
+
+
+def vocabulary_equivalence(reference, converted, X=None) -> dict[str, int]:
+    """
+    Сверка модели с DAWG-словарями (converted) с той же моделью на dict (reference).
+    Словари — поэлементно в обе стороны (термины dict находятся в DAWG с тем же индексом, обход DAWG даёт
+    ровно термины dict); с X — ещё transform шагов до классификатора (Pipeline) и predict.
+    Возвращает число расхождений по каждой проверке, все нули — модели эквивалентны
+    """
+    pairs = list(zip(_iter_vectorizers(reference), _iter_vectorizers(converted)))
+    out = {"vectorizers": len(pairs), "vocabulary": 0}
+    for (path, ref), (_, conv) in pairs:
+        ref_vocab, conv_vocab = ref.vocabulary_, conv.vocabulary_
+        out["vocabulary"] += sum(1 for term, idx in ref_vocab.items() if conv_vocab.get(term) != idx)
+        out["vocabulary"] += len(set(conv_vocab).symmetric_difference(ref_vocab))
+    if X is not None:
+        if hasattr(reference, "named_steps") and len(reference.steps) > 1:
+            out["transform"] = int((reference[:-1].transform(X) != converted[:-1].transform(X)).nnz)
+        out["predict"] = int(np.sum(np.asarray(reference.predict(X)) != np.asarray(converted.predict(X))))
+    return out
+
+
+def convert_vocabularies(model, *, verify_X=None) -> list[dict]:
+    """
+    Заменяет vocabulary_ всех обученных CountVectorizer/TfidfVectorizer внутри модели на DawgVocabulary (на месте).
+    Каждый собранный DAWG сверяется с исходным dict поэлементно; с verify_X модель после замены
+    сверяется с копией исходной (vocabulary_equivalence: transform и predict на verify_X).
+    Возвращает по строке на векторизатор: путь, число терминов, размер DAWG в байтах
+    """
+    reference = copy.deepcopy(model) if verify_X is not None else None
+    report = []
+    for path, vect in _iter_vectorizers(model):
+        vocab = vect.vocabulary_
+        if isinstance(vocab, DawgVocabulary):
+            continue
+        dawg = _to_dawg(vect)
+        if len(dawg) != len(vocab) or any(dawg.get(term) != idx for term, idx in vocab.items()):
+            vect.vocabulary_ = vocab
+            raise ValueError(f"DAWG vocabulary mismatch for {path}")
+        report.append({"path": path, "n_terms": len(dawg), "dawg_bytes": dawg.nbytes})
+    if reference is not None:
+        diff = vocabulary_equivalence(reference, model, verify_X)
+        if any(v for k, v in diff.items() if k != "vectorizers"):
+            raise ValueError(f"DAWG vocabularies change the model: {diff}")
+    return report
@@ -0,0 +1,74 @@
+import pickle, time, numpy as np
+from sklearn.metrics import accuracy_score, f1_score
+
+
+def model_size_bytes(model) -> int:
+    return len(pickle.dumps(model, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def feature_dimensions(feat) -> dict[str, int]:
+    """
+    Число выходных столбцов каждого поля обученного ColumnTransformer и их сумма (total);
+    при features.reduction (Pipeline columns -> reduce) ещё и размерность после сжатия (reduced)
+    """
+    if hasattr(feat, "named_steps"):
+        dims = feature_dimensions(feat.named_steps["columns"])
+        dims["reduced"] = int(feat.named_steps["reduce"].n_components_)
+        return dims
+    dims = {name: sl.stop - sl.start for name, sl in feat.output_indices_.items() if name != "remainder"}
+    dims["total"] = sum(dims.values())
+    return dims
+
+
+def _slice_rows(X, i : int):
+    return X.iloc[[i]] if hasattr(X, "iloc") else X[i : i + 1]
+
+
+def evaluate_model(model, X, y, *, n_single : int = 200) -> dict[str, float]:
+    """
+    Качество (accuracy, f1_weighted) и стоимость модели: время пакетного predict,
+    задержка одиночного запроса (p50/p95, мс) и размер в pickle
+    """
+    y = np.asarray(y)
+    t0 = time.perf_counter()
+    pred = model.predict(X)
+    batch_s = time.perf_counter() - t0
+
+    times = []
+    for i in range(min(n_single, len(y))):
+        row = _slice_rows(X, i)
+        t0 = time.perf_counter()
+        model.predict(row)
+        times.append(time.perf_counter() - t0)
+    ms = np.asarray(times) * 1000 if times else np.zeros(1)
+
+    return {
+        "accuracy": float(accuracy_score(y, pred)),
+        "f1_weighted": float(f1_score(y, pred, average="weighted")),
+        "batch_s": batch_s,
+        "single_p50_ms": float(np.percentile(ms, 50)),
+        "single_p95_ms": float(np.percentile(ms, 95)),
+        "size_bytes": model_size_bytes(model),
+    }
+
+
+def compare_models(reference, candidate, X, y, *, n_single : int = 200) -> dict[str, dict[str, float]]:
+    """
+    Сравнение модели-кандидата с эталонной на одних данных: метрики обеих и разница (candidate - reference),
+    для времени и размера — ещё и отношение reference / candidate (во сколько раз выигрыш)
+    """
+    ref = evaluate_model(reference, X, y, n_single=n_single)
+    cand = evaluate_model(candidate, X, y, n_single=n_single)
+    delta = {k: cand[k] - ref[k] for k in ref}
+    gain = {k: ref[k] / cand[k] for k in ("batch_s", "single_p50_ms", "single_p95_ms", "size_bytes") if cand[k] > 0}
+    return {"reference": ref, "candidate": cand, "delta": delta, "gain": gain}
+
+
+def format_comparison(report : dict[str, dict[str, float]]) -> str:
+    ref, cand, delta = report["reference"], report["candidate"], report["delta"]
+    lines = [f"{'metric':<16}{'reference':>14}{'candidate':>14}{'delta':>14}"]
+    for k in ref:
+        lines.append(f"{k:<16}{ref[k]:>14.4f}{cand[k]:>14.4f}{delta[k]:>+14.4f}")
+    if report["gain"]:
+        lines.append("gain: " + ", ".join(f"{k} x{v:.2f}" for k, v in report["gain"].items()))
+    return "\n".join(lines)
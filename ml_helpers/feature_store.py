@@ -0,0 +1,239 @@
+import hashlib, json, shutil, joblib, numpy as np, pandas as pd
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+from sklearn.base import clone
+from sklearn.pipeline import Pipeline
+from config import FEATURE_STORE_DIR
+from .vectorizers import build_vectorizer_from_cfg
+from .sparse_io import save_csr, load_csr
+from .fold_search import FoldFeatures, precompute_cv_features
+
+
+VECTORIZER_FILENAME = "vectorizer.joblib"
+META_FILENAME = "meta.json"
+LABELS_FILENAME = "labels.npy"
+ROW_INDEX_FILENAME = "row_index.npy"
+FOLDS_DIRNAME = "folds"
+
+@dataclass(frozen=True)
+class FeatureSet:
+    key : str
+    root : Path
+    feat : Any
+    X : dict[str, Any]
+    y : dict[str, np.ndarray]
+    meta : dict[str, Any]
+    row_index : dict[str, np.ndarray]
+
+
+def data_fingerprint(df : pd.DataFrame, y : np.ndarray | None = None) -> str:
+    h = hashlib.sha256()
+    h.update(",".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    if y is not None:
+        h.update(np.ascontiguousarray(y).tobytes())
+    return h.hexdigest()[:16]
+
+
+def feature_config_hash(cfg : dict, *, extra : dict | None = None) -> str:
+    """
+    Ключ хранилища: секция features + SQL выборки данных (+ доп. параметры, например сплит и отпечаток данных)
+    """
+    payload = {
+        "features": cfg["features"],
+        "data_sql": cfg["data"]["sql"],
+        "extra": extra or {},
+    }
+    raw = json.dumps(payload, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def save_feature_set(
+    key : str,
+    feat,
+    X : dict[str, Any],
+    y : dict[str, np.ndarray],
+    *,
+    store_dir : str | Path = FEATURE_STORE_DIR,
+    row_index : dict[str, np.ndarray] | None = None,
+    meta_extra : dict | None = None,
+) -> Path:
+    root = Path(store_dir) / key
+    tmp = root.with_name(root.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    tmp.mkdir(parents=True)
+
+    joblib.dump(feat, tmp / VECTORIZER_FILENAME)
+
+    splits = {}
+    for name, X_split in X.items():
+        split_dir = tmp / name
+        save_csr(X_split, split_dir)
+        np.save(split_dir / LABELS_FILENAME, np.asarray(y[name]), allow_pickle=False)
+        if row_index and name in row_index and row_index[name].dtype.kind in "iu":
+            np.save(split_dir / ROW_INDEX_FILENAME, np.asarray(row_index[name]), allow_pickle=False)
+        splits[name] = {"shape": list(X_split.shape), "nnz": int(X_split.nnz)}
+
+    meta = {
+        "key": key,
+        "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "splits": splits,
+        **(meta_extra or {}),
+    }
+    (tmp / META_FILENAME).write_text(json.dumps(meta, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+
+    # атомарная замена: незавершённая запись не должна выглядеть как валидный набор
+    if root.exists():
+        shutil.rmtree(root)
+    tmp.rename(root)
+    return root
+
+
+def load_feature_set(key : str, *, store_dir : str | Path = FEATURE_STORE_DIR, mmap : bool = True) -> FeatureSet | None:
+    root = Path(store_dir) / key
+    meta_path = root / META_FILENAME
+    if not meta_path.exists():
+        return None
+
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    feat = joblib.load(root / VECTORIZER_FILENAME)
+
+    X, y, row_index = {}, {}, {}
+    for name in meta["splits"]:
+        split_dir = root / name
+        X[name] = load_csr(split_dir, mmap=mmap)
+        y[name] = np.load(split_dir / LABELS_FILENAME, allow_pickle=False)
+        if (split_dir / ROW_INDEX_FILENAME).exists():
+            row_index[name] = np.load(split_dir / ROW_INDEX_FILENAME, allow_pickle=False)
+    return FeatureSet(key=key, root=root, feat=feat, X=X, y=y, meta=meta, row_index=row_index)
+
+
+def _same_rows(fs : FeatureSet, splits : dict[str, tuple[pd.DataFrame, np.ndarray]]) -> bool:
+    # строки матриц должны идти в том же порядке, что и строки текущих DataFrame
+    for name, (df, y_split) in splits.items():
+        if name not in fs.X or fs.X[name].shape[0] != len(df) or not np.array_equal(fs.y[name], np.asarray(y_split)):
+            return False
+        if name in fs.row_index and not np.array_equal(fs.row_index[name], df.index.to_numpy()):
+            return False
+    return True
+
+
+def build_or_load_feature_set(
+    cfg : dict,
+    splits : dict[str, tuple[pd.DataFrame, np.ndarray]],
+    *,
+    fit_split : str = "dev",
+    extra : dict | None = None,
+    store_dir : str | Path | None = None,
+    force : bool = False,
+) -> FeatureSet:
+    """
+    Возвращает обученный ColumnTransformer и CSR-матрицы для всех сплитов.
+    Векторизатор обучается только на fit_split, остальные сплиты лишь трансформируются.
+    Если набор с тем же ключом уже есть на диске — матрицы открываются через memmap без пересчёта
+    """
+    store_cfg = cfg.get("feature_store", {}) or {}
+    store_dir = Path(store_dir or store_cfg.get("dir") or FEATURE_STORE_DIR)
+    mmap = bool(store_cfg.get("mmap", True))
+
+    if fit_split not in splits:
+        raise ValueError(f"fit_split={fit_split!r} is not among splits: {tuple(splits)}")
+
+    fingerprints = {name: data_fingerprint(df, y) for name, (df, y) in splits.items()}
+    key = feature_config_hash(cfg, extra={**(extra or {}), "fit_split": fit_split, "data": fingerprints})
+
+    if not force:
+        cached = load_feature_set(key, store_dir=store_dir, mmap=mmap)
+        if cached is not None and _same_rows(cached, splits):
+            return cached
+
+    feat = build_vectorizer_from_cfg(cfg)
+    df_fit, y_fit = splits[fit_split]
+    X = {fit_split: feat.fit_transform(df_fit, y_fit)}
+    for name, (df, _) in splits.items():
+        if name != fit_split:
+            X[name] = feat.transform(df)
+
+    y = {name: np.asarray(y_split) for name, (_, y_split) in splits.items()}
+    row_index = {name: df.index.to_numpy() for name, (df, _) in splits.items()}
+    meta_extra = {
+        "features": cfg["features"],
+        "data_sql": cfg["data"]["sql"],
+        "fit_split": fit_split,
+        "data_fingerprints": fingerprints,
+        "extra": extra or {},
+    }
+    save_feature_set(key, feat, X, y, store_dir=store_dir, row_index=row_index, meta_extra=meta_extra)
+    return load_feature_set(key, store_dir=store_dir, mmap=mmap)   # type: ignore
+
+
+def build_or_load_fold_features(
+    fs : FeatureSet,
+    X : pd.DataFrame,
+    y,
+    cv,
+    *,
+    n_jobs : int | None = None,
+    mmap : bool = True,
+    force : bool = False,
+) -> list[FoldFeatures]:
+    """
+    Матрицы фолдов CV для строк fit-сплита набора fs (векторизатор обучается на train-части каждого фолда,
+    как в precompute_cv_features) — в подпапке folds/<хеш разбиения> набора, при повторном запуске через memmap.
+    Результат принимают fold_grid_search, parallel_fold_outputs и parallel_cross_val_predict
+    """
+    y = np.asarray(y)
+    splits = list(cv.split(X, y))
+    h = hashlib.sha256()
+    for tr_idx, va_idx in splits:
+        h.update(np.ascontiguousarray(tr_idx, dtype=np.int64).tobytes())
+        h.update(b"|")
+        h.update(np.ascontiguousarray(va_idx, dtype=np.int64).tobytes())
+    root = fs.root / FOLDS_DIRNAME / h.hexdigest()[:16]
+
+    if not force and (root / META_FILENAME).exists():
+        return [
+            FoldFeatures(
+                fold=i,
+                train_idx=tr_idx,
+                val_idx=va_idx,
+                X_train=load_csr(root / f"fold_{i}" / "train", mmap=mmap),
+                X_val=load_csr(root / f"fold_{i}" / "val", mmap=mmap),
+            )
+            for i, (tr_idx, va_idx) in enumerate(splits)
+        ]
+
+    folds = precompute_cv_features(fs.feat, X, y, cv, n_jobs=n_jobs)
+    tmp = root.with_name(root.name + ".tmp")
+    if tmp.exists():
+        shutil.rmtree(tmp)
+    for fold in folds:
+        save_csr(fold.X_train, tmp / f"fold_{fold.fold}" / "train")
+        save_csr(fold.X_val, tmp / f"fold_{fold.fold}" / "val")
+    meta = {"n_splits": len(folds), "created_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")}
+    (tmp / META_FILENAME).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    if root.exists():
+        shutil.rmtree(root)
+    tmp.rename(root)
+    return folds
+
+
+def fit_on_feature_set(pipe : Pipeline, fs : FeatureSet, *, split : str = "dev") -> Pipeline:
+    """
+    Pipeline(feat, clf), обученный без повторной векторизации: feat — сохранённый векторизатор набора,
+    clf (клон шага clf из pipe с его параметрами) обучается на матрице split
+    """
+    clf = clone(pipe.named_steps["clf"]).fit(fs.X[split], fs.y[split])
+    return Pipeline([("feat", fs.feat), ("clf", clf)])
+
+
+def feature_set_matrix(fs : FeatureSet | None, estimator, split : str):
+    """
+    Матрица split из набора, если estimator — Pipeline с векторизатором этого набора (fit_on_feature_set), иначе None
+    """
+    if fs is None or not hasattr(estimator, "named_steps") or estimator.named_steps.get("feat") is not fs.feat:
+        return None
+    return fs.X[split]
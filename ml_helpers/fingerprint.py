@@ -0,0 +1,224 @@
+import hashlib, json, time, numpy as np, pandas as pd
+from pathlib import Path
+from typing import Any, Iterable
+
+
+FINGERPRINT_DIRNAME = "fingerprints"
+FEATURE_COLUMNS = ("error_text_tokens", "ctx_tokens", "ctx_numeric")
+
+def _parse(value, kind : type):
+    return value if isinstance(value, kind) else json.loads(value)
+
+
+def canonical_fingerprint(row : dict[str, Any]) -> int:
+    """
+    64-битный хеш канонической тройки признаков строки: токены ошибки и контекста в исходном порядке
+    (от него зависят n-граммы), числовые признаки — отсортированные по имени, значения приведены к float.
+    Поля строки — списки/словари или JSON-строки, как в столбцах DataFrame
+    """
+    numeric = _parse(row["ctx_numeric"], dict)
+    canon = json.dumps(
+        [
+            _parse(row["error_text_tokens"], list),
+            _parse(row["ctx_tokens"], list),
+            sorted((k, float(v)) for k, v in numeric.items()),
+        ],
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+    return int.from_bytes(hashlib.blake2b(canon.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _iter_rows(X) -> Iterable[dict[str, Any]]:
+    if isinstance(X, pd.DataFrame):
+        return X[list(FEATURE_COLUMNS)].to_dict("records")
+    return X
+
+
+def _count_votes(keys : np.ndarray, labels : np.ndarray, counts : np.ndarray | None = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # (отпечаток, метка) -> число строк; результат отсортирован по отпечатку, внутри — по метке
+    order = np.lexsort((labels, keys))
+    keys, labels = keys[order], labels[order]
+    counts = np.ones(len(keys), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)[order]
+    if not len(keys):
+        return keys, labels, counts
+    start = np.flatnonzero(np.r_[True, (keys[1:] != keys[:-1]) | (labels[1:] != labels[:-1])])
+    return keys[start], labels[start], np.add.reduceat(counts, start)
+
+
+class FingerprintIndex:
+    """
+    Индекс точных совпадений: отпечаток признаков (canonical_fingerprint) -> метка большинства среди
+    обучающих строк с этим отпечатком. Ключи хранятся отсортированным uint64-массивом, поиск — searchsorted,
+    поэтому при загрузке массивы открываются через memmap.
+    Отпечатки, у которых меньше min_count строк или доля большинства ниже min_purity, в индекс не попадают.
+    Рядом хранится полная таблица голосов (отпечаток, метка, число строк) — по ней partial_fit
+    пересчитывает индекс так же, как fit на всех строках
+    """
+    def __init__(self, min_count : int = 1, min_purity : float = 1.0) -> None:
+        self.min_count = min_count
+        self.min_purity = min_purity
+
+    def fit(self, X, y) -> "FingerprintIndex":
+        y = np.asarray(y)
+        keys = np.fromiter((canonical_fingerprint(row) for row in _iter_rows(X)), dtype=np.uint64)
+        self.vote_keys_, self.vote_labels_, self.vote_counts_ = _count_votes(keys, y)
+        return self._build()
+
+    def _build(self) -> "FingerprintIndex":
+        vk, vl, vc = self.vote_keys_, self.vote_labels_, self.vote_counts_
+        if not len(vk):
+            self.keys_ = np.zeros(0, dtype=np.uint64)
+            self.labels_ = np.zeros(0, dtype=vl.dtype)
+            self.counts_ = np.zeros(0, dtype=np.int32)
+            self.n_groups_ = 0
+            return self
+        starts = np.flatnonzero(np.r_[True, vk[1:] != vk[:-1]])
+        group = np.cumsum(np.r_[True, vk[1:] != vk[:-1]]) - 1
+        totals = np.add.reduceat(vc, starts)
+        best = np.maximum.reduceat(vc, starts)
+        # при равенстве голосов — меньшая метка (внутри отпечатка метки по возрастанию), как у argmax в sklearn
+        is_best = np.flatnonzero(vc == best[group])
+        _, first = np.unique(group[is_best], return_index=True)
+        best_row = is_best[first]
+
+        ok = (totals >= self.min_count) & (best / totals >= self.min_purity)
+        self.keys_ = vk[starts][ok]
+        self.labels_ = vl[best_row][ok]
+        self.counts_ = totals[ok].astype(np.int32)
+        self.n_groups_ = len(starts)
+        return self
+
+    def partial_fit(self, X, y) -> "FingerprintIndex":
+        """
+        Дополнение индекса новыми строками без исходных данных: голоса новых строк складываются с таблицей голосов,
+        индекс пересобирается по тем же правилам, что в fit. Результат совпадает с fit на старых и новых строках вместе:
+        отпечаток, для которого пришла другая метка, выпадает, если доля большинства стала ниже min_purity,
+        а отпечатки с числом строк меньше min_count копят голоса между обновлениями
+        """
+        if getattr(self, "vote_keys_", None) is None:
+            raise ValueError("Fingerprint index was saved without vote counts; rebuild it with fit on all rows (update_bundle --refresh)")
+        y = np.asarray(y)
+        keys = np.fromiter((canonical_fingerprint(row) for row in _iter_rows(X)), dtype=np.uint64)
+        labels = np.concatenate([self.vote_labels_, y]).astype(np.result_type(self.vote_labels_.dtype, y.dtype))
+        self.vote_keys_, self.vote_labels_, self.vote_counts_ = _count_votes(
+            np.concatenate([self.vote_keys_, keys]),
+            labels,
+            np.concatenate([self.vote_counts_, np.ones(len(keys), dtype=np.int64)]),
+        )
+        return self._build()
+
+    def __len__(self) -> int:
+        return len(self.keys_)
+
+    def _find(self, key : int) -> int:
+        i = int(np.searchsorted(self.keys_, np.uint64(key)))
+        return i if i < len(self.keys_) and self.keys_[i] == key else -1
+
+    def lookup(self, row : dict[str, Any]):
+        """
+        Метка для строки или None, если такого отпечатка в обучении не было
+        """
+        i = self._find(canonical_fingerprint(row))
+        return None if i < 0 else self.labels_[i]
+
+    def lookup_many(self, X) -> tuple[np.ndarray, np.ndarray]:
+        """
+        (метки, маска попаданий) для всех строк X; на местах промахов в метках 0
+        """
+        keys = np.fromiter((canonical_fingerprint(r) for r in _iter_rows(X)), dtype=np.uint64)
+        if not len(self.keys_):
+            return np.zeros(len(keys), dtype=self.labels_.dtype), np.zeros(len(keys), dtype=bool)
+        pos = np.minimum(np.searchsorted(self.keys_, keys), len(self.keys_) - 1)
+        hit = self.keys_[pos] == keys
+        return np.where(hit, self.labels_[pos], 0), hit
+
+    def save(self, out_dir : str | Path) -> Path:
+        out = Path(out_dir)
+        out.mkdir(parents=True, exist_ok=True)
+        np.save(out / "keys.npy", self.keys_)
+        np.save(out / "labels.npy", self.labels_)
+        np.save(out / "counts.npy", self.counts_)
+        np.save(out / "vote_keys.npy", self.vote_keys_)
+        np.save(out / "vote_labels.npy", self.vote_labels_)
+        np.save(out / "vote_counts.npy", self.vote_counts_)
+        meta = {"min_count": self.min_count, "min_purity": self.min_purity, "n_groups": self.n_groups_}
+        (out / "index.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+        return out
+
+    @classmethod
+    def load(cls, path : str | Path, *, mmap : bool = True) -> "FingerprintIndex":
+        path = Path(path)
+        meta = json.loads((path / "index.json").read_text(encoding="utf-8"))
+        index = cls(min_count=meta["min_count"], min_purity=meta["min_purity"])
+        mode = "r" if mmap else None
+        index.keys_ = np.load(path / "keys.npy", mmap_mode=mode)
+        index.labels_ = np.load(path / "labels.npy", mmap_mode=mode)
+        index.counts_ = np.load(path / "counts.npy", mmap_mode=mode)
+        # индексы, сохранённые до таблицы голосов, читаются, но partial_fit для них недоступен
+        votes = [path / f"vote_{name}.npy" for name in ("keys", "labels", "counts")]
+        if all(p.exists() for p in votes):
+            index.vote_keys_, index.vote_labels_, index.vote_counts_ = (np.load(p, mmap_mode=mode) for p in votes)
+        else:
+            index.vote_keys_ = index.vote_labels_ = index.vote_counts_ = None
+        index.n_groups_ = meta["n_groups"]
+        return index
+
+
+def load_fingerprint_index(root : str | Path, *, mmap : bool = True) -> FingerprintIndex | None:
+    """
+    Индекс из подпапки fingerprints/ директории модели; None, если модель сохранена без него
+    """
+    path = Path(root) / FINGERPRINT_DIRNAME
+    return FingerprintIndex.load(path, mmap=mmap) if (path / "index.json").exists() else None
+
+
+def predict_with_fingerprints(index : FingerprintIndex, model, X : pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Сначала индекс, модель — только на промахах. Возвращает (метки, маска попаданий)
+    """
+    labels, hit = index.lookup_many(X)
+    pred = labels.astype(np.result_type(labels.dtype, np.int64))
+    if (~hit).any():
+        pred[~hit] = model.predict(X.iloc[np.flatnonzero(~hit)])
+    return pred, hit
+
+
+def fingerprint_report(index : FingerprintIndex, model, X : pd.DataFrame, y, *, n_single : int = 200) -> dict[str, float]:
+    """
+    Доля попаданий в индекс на X, точность ответа индекса и модели на попаданиях, их согласие,
+    accuracy каскада (индекс -> модель) против одной модели и выигрыш в задержке одиночного запроса
+    (p50 поиска в индексе против p50 model.predict на строках-попаданиях)
+    """
+    y = np.asarray(y)
+    labels, hit = index.lookup_many(X)
+    model_pred = model.predict(X)
+    cascade = np.where(hit, labels, model_pred)
+
+    n_hits = int(hit.sum())
+    rows = X.to_dict("records")
+    hit_idx = np.flatnonzero(hit)[:n_single]
+    t_lookup, t_model = [], []
+    for i in hit_idx:
+        t0 = time.perf_counter()
+        index.lookup(rows[i])
+        t1 = time.perf_counter()
+        model.predict(X.iloc[[i]])
+        t2 = time.perf_counter()
+        t_lookup.append(t1 - t0)
+        t_model.append(t2 - t1)
+    p50 = lambda t: float(np.percentile(np.asarray(t) * 1000, 50)) if t else 0.0
+
+    return {
+        "n_rows": len(y),
+        "index_size": len(index),
+        "hit_rate": n_hits / len(y) if len(y) else 0.0,
+        "hit_accuracy": float(np.mean(labels[hit] == y[hit])) if n_hits else 0.0,
+        "model_accuracy_on_hits": float(np.mean(model_pred[hit] == y[hit])) if n_hits else 0.0,
+        "agreement_on_hits": float(np.mean(labels[hit] == model_pred[hit])) if n_hits else 0.0,
+        "model_accuracy": float(np.mean(model_pred == y)),
+        "cascade_accuracy": float(np.mean(cascade == y)),
+        "lookup_p50_ms": p50(t_lookup),
+        "model_p50_ms": p50(t_model),
+        "saved_ms_per_request": (p50(t_model) - p50(t_lookup)) * n_hits / len(y) if len(y) else 0.0,
+    }
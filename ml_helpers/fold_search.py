@@ -0,0 +1,233 @@
+import time, numpy as np
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable
+from joblib import Memory, Parallel, delayed
+from scipy.stats import rankdata
+from sklearn.base import clone
+from sklearn.metrics import get_scorer
+from sklearn.model_selection import ParameterGrid
+
+if TYPE_CHECKING:
+    from .results_store import CVResultsStore
+
+
+@dataclass(frozen=True)
+class FoldFeatures:
+    fold : int
+    train_idx : np.ndarray
+    val_idx : np.ndarray
+    X_train : Any
+    X_val : Any
+
+
+@dataclass
+class CandidateResult:
+    params : dict[str, Any]
+    test_scores : list[float] = field(default_factory=list)
+    fit_times : list[float] = field(default_factory=list)
+    score_times : list[float] = field(default_factory=list)
+
+
+@dataclass(frozen=True)
+class FoldSearchResult:
+    cv_results_ : dict[str, Any]
+    best_index_ : int
+    best_params_ : dict[str, Any]
+    best_score_ : float
+
+
+def _slice_rows(X, idx : np.ndarray):
+    if hasattr(X, "iloc"):
+        return X.iloc[idx]
+    return X[idx]
+
+
+def _fit_fold_features(feat, X, y : np.ndarray, train_idx : np.ndarray, val_idx : np.ndarray) -> tuple[Any, Any]:
+    f = clone(feat)
+    X_train = f.fit_transform(_slice_rows(X, train_idx), y[train_idx])
+    X_val = f.transform(_slice_rows(X, val_idx))
+    return X_train, X_val
+
+
+def precompute_cv_features(
+    feat,
+    X,
+    y,
+    cv,
+    *,
+    memory : Memory | None = None,
+    n_jobs : int | None = None,
+) -> list[FoldFeatures]:
+    """
+    Обучает шаг feat один раз на каждом train-фолде и трансформирует соответствующий valid-фолд.
+    Дальше в поиске переобучается только классификатор.
+    С memory матрицы фолдов кешируются на диске и переиспользуются между запусками
+    """
+    y = np.asarray(y)
+    splits = list(cv.split(X, y))
+    fit_fold = memory.cache(_fit_fold_features) if memory is not None else _fit_fold_features
+
+    outs = Parallel(n_jobs=n_jobs)(
+        delayed(fit_fold)(feat, X, y, tr_idx, va_idx) for tr_idx, va_idx in splits
+    )
+    return [
+        FoldFeatures(fold=i, train_idx=tr_idx, val_idx=va_idx, X_train=X_tr, X_val=X_va)
+        for i, ((tr_idx, va_idx), (X_tr, X_va)) in enumerate(zip(splits, outs))
+    ]
+
+
+def _strip_prefix(param_grid : list[dict] | dict, prefix : str) -> list[dict]:
+    grids = param_grid if isinstance(param_grid, list) else [param_grid]
+    out = []
+    for g in grids:
+        stripped = {}
+        for k, v in g.items():
+            if not k.startswith(prefix):
+                raise ValueError(
+                    f"Parameter {k!r} does not belong to the {prefix!r} step: "
+                    "with precomputed fold features only classifier params can be searched"
+                )
+            stripped[k[len(prefix):]] = v
+        out.append(stripped)
+    return out
+
+
+def _fit_and_score(estimator, params : dict, fold : FoldFeatures, y : np.ndarray, scorer) -> tuple[float, float, float]:
+    est = clone(estimator).set_params(**params)
+
+    t0 = time.perf_counter()
+    est.fit(fold.X_train, y[fold.train_idx])
+    t1 = time.perf_counter()
+    score = scorer(est, fold.X_val, y[fold.val_idx])
+    t2 = time.perf_counter()
+    return float(score), t1 - t0, t2 - t1
+
+
+def _evaluate_plain(
+    estimator,
+    candidates : list[dict],
+    folds : list[FoldFeatures],
+    y : np.ndarray,
+    scorer,
+    *,
+    n_jobs : int | None = None,
+    verbose : int = 0,
+) -> list[CandidateResult]:
+    jobs = [(ci, fold) for ci in range(len(candidates)) for fold in folds]
+    outs = Parallel(n_jobs=n_jobs, verbose=verbose)(
+        delayed(_fit_and_score)(estimator, candidates[ci], fold, y, scorer) for ci, fold in jobs
+    )
+
+    results = [CandidateResult(params=p) for p in candidates]
+    for (ci, _), (score, fit_time, score_time) in zip(jobs, outs):
+        results[ci].test_scores.append(score)
+        results[ci].fit_times.append(fit_time)
+        results[ci].score_times.append(score_time)
+    return results
+
+
+SEARCH_ROUTINES : dict[str, Callable[..., list[CandidateResult]]] = {
+    "plain": _evaluate_plain,
+}
+
+# процедуры, у которых оценка кандидата зависит от соседей по группе (например, путь регуляризации):
+# search -> функция (estimator, candidates) -> ключ группы для каждого кандидата.
+# В кеше результатов ключ группы заменяет имя процедуры, группа берётся из кеша и пересчитывается только целиком
+SEARCH_GROUPS : dict[str, Callable[[Any, list[dict]], list[str]]] = {}
+
+def build_cv_results(results : list[CandidateResult], *, prefix : str = "clf__") -> FoldSearchResult:
+    """
+    Собирает отчёт в формате search.cv_results_ (его можно передать в pd.DataFrame)
+    """
+    n_splits = len(results[0].test_scores) if results else 0
+    scores = np.array([r.test_scores for r in results], dtype=float).reshape(len(results), n_splits)
+    fit_times = np.array([r.fit_times for r in results], dtype=float).reshape(len(results), n_splits)
+    score_times = np.array([r.score_times for r in results], dtype=float).reshape(len(results), n_splits)
+
+    params = [{f"{prefix}{k}": v for k, v in r.params.items()} for r in results]
+    mean_scores = scores.mean(axis=1)
+
+    cv_results = {
+        "params": params,
+        "mean_fit_time": fit_times.mean(axis=1),
+        "std_fit_time": fit_times.std(axis=1),
+        "mean_score_time": score_times.mean(axis=1),
+        "std_score_time": score_times.std(axis=1),
+    }
+    for name in sorted({k for p in params for k in p}):
+        cv_results[f"param_{name}"] = [p.get(name) for p in params]
+    for i in range(n_splits):
+        cv_results[f"split{i}_test_score"] = scores[:, i]
+    cv_results["mean_test_score"] = mean_scores
+    cv_results["std_test_score"] = scores.std(axis=1)
+    # как в sklearn: одинаковые значения получают одинаковый (минимальный) ранг
+    ranks = rankdata(-mean_scores, method="min").astype(np.int32)
+    cv_results["rank_test_score"] = ranks
+
+    best_index = int(ranks.argmin())
+    return FoldSearchResult(
+        cv_results_=cv_results,
+        best_index_=best_index,
+        best_params_=params[best_index],
+        best_score_=float(mean_scores[best_index]),
+    )
+
+
+def fold_grid_search(
+    estimator,
+    param_grid : list[dict] | dict,
+    folds : list[FoldFeatures],
+    y,
+    *,
+    scoring : str,
+    search : str = "plain",
+    prefix : str = "clf__",
+    n_jobs : int | None = None,
+    verbose : int = 0,
+    store : "CVResultsStore | None" = None,
+) -> FoldSearchResult:
+    """
+    Аналог GridSearchCV поверх заранее посчитанных признаков фолдов (precompute_cv_features).
+    param_grid — результат prepare_param_grids (ключи с префиксом clf__).
+    Со store кандидаты, уже оценённые на тех же данных/признаках/CV, берутся из кеша,
+    а в отчёт попадают вместе с новыми; для процедур из SEARCH_GROUPS (reg_path) — только если
+    в кеше вся группа с тем же составом, иначе группа пересчитывается целиком
+    """
+    if not isinstance(scoring, str):
+        raise ValueError("fold_grid_search supports a single scoring metric only")
+    if search not in SEARCH_ROUTINES:
+        raise ValueError(f"Unknown search routine: {search!r}, expected one of {sorted(SEARCH_ROUTINES)}")
+
+    y = np.asarray(y)
+    candidates = list(ParameterGrid(_strip_prefix(param_grid, prefix)))
+    scorer = get_scorer(scoring)
+    routine = SEARCH_ROUTINES[search]
+
+    group_keys = SEARCH_GROUPS[search](estimator, candidates) if search in SEARCH_GROUPS else [search] * len(candidates)
+    groups : dict[str, list[int]] = {}
+    for ci, key in enumerate(group_keys):
+        groups.setdefault(key, []).append(ci)
+
+    cached : dict[int, CandidateResult] = {}
+    if store is not None:
+        for key, idx in groups.items():
+            found = store.get_many(estimator, [candidates[ci] for ci in idx], scoring=scoring, search=key)
+            found = {idx[j]: r for j, r in found.items() if len(r.test_scores) == len(folds)}
+            if search not in SEARCH_GROUPS or len(found) == len(idx):
+                cached.update(found)
+    todo = [ci for ci in range(len(candidates)) if ci not in cached]
+    if verbose and store is not None:
+        print(f"fold_grid_search: {len(cached)} of {len(candidates)} candidates taken from the results store")
+
+    fresh = routine(estimator, [candidates[ci] for ci in todo], folds, y, scorer, n_jobs=n_jobs, verbose=verbose) if todo else []
+    if store is not None and fresh:
+        by_key : dict[str, list[CandidateResult]] = {}
+        for ci, r in zip(todo, fresh):
+            by_key.setdefault(group_keys[ci], []).append(r)
+        for key, rs in by_key.items():
+            store.put_many(estimator, rs, scoring=scoring, search=key)
+
+    results = [cached.get(ci) for ci in range(len(candidates))]
+    for ci, r in zip(todo, fresh):
+        results[ci] = r
+    return build_cv_results(results, prefix=prefix)   # type: ignore
@@ -0,0 +1,130 @@
+import numpy as np, pandas as pd, scipy.sparse as sp
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import normalize
+from .ann_knn import IVFCosineKNN
+from .cascade import ConfidenceCascadeClassifier
+from .cosine_knn import SparseCosineKNN
+from .prototypes import PrototypeSelectionClassifier
+from .routed import ConstantClassifier, ErrorCodeRouter
+
+
+def _merge_labels(classes : np.ndarray, y_enc : np.ndarray, y_new : np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # новые метки могут расширить classes_: старые коды пересчитываются под объединённый отсортированный список
+    merged = np.union1d(classes, y_new)
+    return merged, np.concatenate([np.searchsorted(merged, classes[y_enc]), np.searchsorted(merged, y_new)])
+
+
+def _append_sklearn_knn(clf : KNeighborsClassifier, X_new, y_new : np.ndarray) -> None:
+    # brute-force kNN в fit только запоминает строки, так что повторный fit на склеенной матрице дешёвый
+    X_old = clf._fit_X
+    X = sp.vstack([X_old, X_new], format="csr") if sp.issparse(X_old) else np.vstack([X_old, np.asarray(X_new)])
+    clf.fit(X, np.concatenate([clf.classes_[clf._y], y_new]))
+
+
+def _append_cosine_knn(clf : SparseCosineKNN, X_new, y_new : np.ndarray) -> None:
+    Xn = normalize(sp.csr_matrix(X_new, dtype=np.float64), copy=True)
+    clf._fit_X_T = sp.hstack([clf._fit_X_T, Xn.T], format="csr")
+    clf.classes_, clf._y = _merge_labels(clf.classes_, clf._y, y_new)
+    clf.n_samples_fit_ += Xn.shape[0]
+
+
+def _append_ivf_knn(clf : IVFCosineKNN, X_new, y_new : np.ndarray) -> None:
+    # центроиды и проекция заморожены: новые строки попадают в ближайший существующий список
+    Xn = normalize(sp.csr_matrix(X_new, dtype=np.float64), copy=True)
+    assign = np.argmax(clf._project(Xn) @ clf.centroids_.T, axis=1)
+    n_old = clf.n_samples_fit_
+
+    segments = []
+    for l, (lo, hi) in enumerate(zip(clf.list_offsets_[:-1], clf.list_offsets_[1:])):
+        rows = np.flatnonzero(assign == l)
+        segments.append(np.concatenate([clf.list_rows_[lo:hi], n_old + rows]))
+        if len(rows):
+            clf._lists_T[l] = sp.hstack([clf._lists_T[l], Xn[rows].T], format="csr")
+    clf.list_rows_ = np.concatenate(segments)
+    clf.list_offsets_ = np.concatenate([[0], np.cumsum([len(s) for s in segments])])
+    clf.classes_, clf._y = _merge_labels(clf.classes_, clf._y, y_new)
+    clf.n_samples_fit_ += Xn.shape[0]
+
+
+def _append_prototypes(clf : PrototypeSelectionClassifier, X_new, y_new : np.ndarray) -> None:
+    # новые строки добавляются эталонами без отбора; support_ по-прежнему индексирует исходное обучение
+    append_to_classifier(clf.estimator_, X_new, y_new)
+    clf.classes_ = clf.estimator_.classes_
+
+
+def _append_cascade(clf : ConfidenceCascadeClassifier, X_new, y_new : np.ndarray) -> None:
+    # быстрая (линейная) модель и порог не дообучаются; новые строки доступны через kNN на неуверенных запросах
+    unknown = np.setdiff1d(y_new, clf.fast_.classes_)
+    if len(unknown):
+        raise ValueError(f"New classes {unknown.tolist()} are unknown to the fast model of the cascade, full refresh required")
+    append_to_classifier(clf.slow_, X_new, y_new)
+
+
+APPENDERS = {
+    KNeighborsClassifier: _append_sklearn_knn,
+    SparseCosineKNN: _append_cosine_knn,
+    IVFCosineKNN: _append_ivf_knn,
+    PrototypeSelectionClassifier: _append_prototypes,
+    ConfidenceCascadeClassifier: _append_cascade,
+}
+
+def append_to_classifier(clf, X_new, y_new) -> None:
+    """
+    Добавляет строки признаков X_new с метками y_new в обученный kNN-классификатор на месте
+    """
+    appender = APPENDERS.get(type(clf))
+    if appender is None:
+        raise TypeError(f"No incremental update for {type(clf).__name__}, full refresh required")
+    appender(clf, X_new, np.asarray(y_new))
+
+
+def _append_pipeline(pipe : Pipeline, X_new : pd.DataFrame, y_new : np.ndarray) -> None:
+    # векторизатор заморожен: словари и idf те же, новые строки только переводятся в признаки
+    append_to_classifier(pipe.named_steps["clf"], pipe.named_steps["feat"].transform(X_new), y_new)
+
+
+def _append_router(router : ErrorCodeRouter, X_new : pd.DataFrame, y_new : np.ndarray) -> None:
+    codes = router._codes(X_new)
+    for code in np.unique(codes):
+        mask = codes == code
+        model = router.models_.get(code)
+        if model is None:
+            # код, которого не было в обучении, получает свою модель только на новых строках
+            router.models_[code] = router._fit_one(X_new[mask], y_new[mask])
+        elif isinstance(model, ConstantClassifier):
+            if np.all(y_new[mask] == model.label_):
+                continue
+            # у кода появилась вторая рекомендация — вместо константы нужна модель, а старых строк в бандле нет
+            raise ValueError(f"Error code {code} had a single recommendation, new labels require full refresh")
+        else:
+            _append_pipeline(model, X_new[mask], y_new[mask])
+    if router.fallback == "global":
+        _append_pipeline(router.fallback_, X_new, y_new)
+    router.classes_ = np.union1d(router.classes_, y_new)
+
+
+def append_rows(model, X_new : pd.DataFrame, y_new) -> dict[str, int]:
+    """
+    Дополняет обученную модель (Pipeline feat + kNN или ErrorCodeRouter из таких) новыми размеченными строками
+    без переобучения: векторизатор заморожен, признаки новых строк дописываются в опорную матрицу kNN,
+    IVF-списки и классы обновляются. Модель меняется на месте.
+    Возвращает число добавленных строк и размер опорной выборки после обновления
+    """
+    y_new = np.asarray(y_new)
+    if isinstance(model, ErrorCodeRouter):
+        _append_router(model, X_new, y_new)
+        ref = model.fallback_ if isinstance(model.fallback_, Pipeline) else None
+    elif isinstance(model, Pipeline):
+        _append_pipeline(model, X_new, y_new)
+        ref = model
+    else:
+        raise TypeError(f"Expected Pipeline or ErrorCodeRouter, got {type(model).__name__}")
+    return {"n_added": len(y_new), "n_reference": reference_size(ref) if ref is not None else -1}
+
+
+def reference_size(pipe : Pipeline) -> int:
+    clf = pipe.named_steps["clf"]
+    clf = getattr(clf, "slow_", clf)
+    clf = getattr(clf, "estimator_", clf)
+    return int(clf.n_samples_fit_)
@@ -0,0 +1,190 @@
+import time, numpy as np, scipy.sparse as sp
+from joblib import Parallel, delayed
+from sklearn import get_config
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.preprocessing import normalize
+from sklearn.utils import gen_batches
+from sklearn.utils.extmath import weighted_mode
+try:
+    # sklearn >= 1.7: произведение двух CSR сразу в плотный буфер, без промежуточной разреженной матрицы
+    from sklearn.utils.sparsefuncs import sparse_matmul_to_dense
+except ImportError:
+    sparse_matmul_to_dense = None
+from .fold_search import CandidateResult, FoldFeatures, SEARCH_ROUTINES
+
+
+KNN_SEARCH_PARAMS = {"n_neighbors", "weights"}
+
+def chunk_n_rows(row_bytes : int, max_n_rows : int, working_memory : float | None = None) -> int:
+    # сколько строк матрицы расстояний помещается в working_memory (МБ), как в sklearn
+    if working_memory is None:
+        working_memory = get_config()["working_memory"]
+    n_rows = int(working_memory * (2 ** 20) // max(row_bytes, 1))
+    return max(1, min(n_rows, max_n_rows))
+
+
+def cosine_topk(X_query, X_ref_normalized_T, k : int, *, working_memory : float | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k ближайших по косинусному расстоянию, те же операции, что у
+    KNeighborsClassifier(metric="cosine", algorithm="brute"): normalize -> sparse dot -> 1 - S -> clip,
+    argpartition + argsort. X_ref_normalized_T — уже L2-нормированная и транспонированная обучающая матрица.
+    Возвращает (dist, ind) формы (n_query, k), отсортированные по возрастанию расстояния
+    """
+    n_query = X_query.shape[0]
+    n_ref = X_ref_normalized_T.shape[1]
+    k = min(k, n_ref)
+
+    Xq = normalize(X_query, copy=True)
+    n_rows = chunk_n_rows(8 * n_ref, n_query, working_memory)
+    fast = (
+        sparse_matmul_to_dense is not None
+        and sp.issparse(Xq) and sp.issparse(X_ref_normalized_T)
+        and Xq.dtype == X_ref_normalized_T.dtype == np.float64
+    )
+    buf = np.empty((n_rows, n_ref), dtype=np.float64) if fast else None
+
+    dist_out = np.empty((n_query, k), dtype=np.float64)
+    ind_out = np.empty((n_query, k), dtype=np.intp)
+    for sl in gen_batches(n_query, n_rows):
+        if fast:
+            S = sparse_matmul_to_dense(Xq[sl].tocsr(), X_ref_normalized_T, out=buf[: sl.stop - sl.start])   # type: ignore
+        else:
+            S = Xq[sl] @ X_ref_normalized_T
+            S = S.toarray() if hasattr(S, "toarray") else np.asarray(S)
+        S *= -1
+        S += 1
+        D = np.clip(S, 0.0, 2.0, out=S)
+
+        rows = np.arange(D.shape[0])[:, None]
+        ind = np.argpartition(D, k - 1, axis=1)[:, :k]
+        ind = ind[rows, np.argsort(D[rows, ind])]
+        dist_out[sl] = D[rows, ind]
+        ind_out[sl] = ind
+    return dist_out, ind_out
+
+
+def neighbor_weights(dist : np.ndarray, weights : str) -> np.ndarray | None:
+    # как sklearn.neighbors._base._get_weights
+    if weights == "uniform":
+        return None
+    if weights == "distance":
+        with np.errstate(divide="ignore"):
+            w = 1.0 / dist
+        inf_mask = np.isinf(w)
+        inf_row = np.any(inf_mask, axis=1)
+        w[inf_row] = inf_mask[inf_row]
+        return w
+    raise ValueError(f"Unsupported weights: {weights!r}")
+
+
+def vote_predict(neigh_y : np.ndarray, w : np.ndarray | None, n_classes : int) -> np.ndarray:
+    """
+    Индексы предсказанных классов (в порядке classes_), как KNeighborsClassifier.predict
+    """
+    if w is None:
+        counts = np.zeros((neigh_y.shape[0], n_classes), dtype=np.intp)
+        np.add.at(counts, (np.arange(neigh_y.shape[0])[:, None], neigh_y), 1)
+        return counts.argmax(axis=1)
+    mode, _ = weighted_mode(neigh_y, w, axis=1)
+    return np.asarray(mode.ravel(), dtype=np.intp)
+
+
+def vote_proba(neigh_y : np.ndarray, w : np.ndarray | None, n_classes : int) -> np.ndarray:
+    """
+    Вероятности классов, как KNeighborsClassifier.predict_proba (тот же порядок суммирования)
+    """
+    if w is None:
+        w = np.ones_like(neigh_y)
+    all_rows = np.arange(neigh_y.shape[0])
+    proba = np.zeros((neigh_y.shape[0], n_classes))
+    for i, idx in enumerate(neigh_y.T):
+        proba[all_rows, idx] += w[:, i]
+    normalizer = proba.sum(axis=1)[:, np.newaxis]
+    proba /= normalizer
+    return proba
+
+
+class _PrecomputedClassifier(ClassifierMixin, BaseEstimator):
+    """
+    Заглушка для sklearn-скореров: отдаёт заранее посчитанные выходы kNN для valid-фолда
+    """
+    def __init__(self, classes, neigh_y, w) -> None:
+        self.classes = classes
+        self.neigh_y = neigh_y
+        self.w = w
+
+    def fit(self, X, y):
+        return self
+
+    @property
+    def classes_(self):
+        return self.classes
+
+    def predict(self, X):
+        return self.classes[vote_predict(self.neigh_y, self.w, len(self.classes))]
+
+    def predict_proba(self, X):
+        return vote_proba(self.neigh_y, self.w, len(self.classes))
+
+
+def _evaluate_fold(estimator, candidates : list[dict], fold : FoldFeatures, y : np.ndarray, scorer) -> list[tuple[float, float, float]]:
+    y_train = y[fold.train_idx]
+    y_val = y[fold.val_idx]
+    classes, y_train_idx = np.unique(y_train, return_inverse=True)
+    k_max = max(c.get("n_neighbors", estimator.n_neighbors) for c in candidates)
+
+    t0 = time.perf_counter()
+    X_ref_T = normalize(fold.X_train, copy=True).T
+    # плотные признаки (features.reduction) остаются ndarray — cosine_topk считает их через GEMM
+    X_ref_T = X_ref_T.tocsr() if sp.issparse(X_ref_T) else np.ascontiguousarray(X_ref_T)
+    dist, ind = cosine_topk(fold.X_val, X_ref_T, k_max)
+    shared_time = (time.perf_counter() - t0) / len(candidates)
+
+    outs = []
+    for params in candidates:
+        k = params.get("n_neighbors", estimator.n_neighbors)
+        t1 = time.perf_counter()
+        neigh_y = y_train_idx[ind[:, :k]]
+        w = neighbor_weights(dist[:, :k], params.get("weights", estimator.weights))
+        score = scorer(_PrecomputedClassifier(classes, neigh_y, w), fold.X_val, y_val)
+        outs.append((float(score), 0.0, shared_time + time.perf_counter() - t1))
+    return outs
+
+
+def _evaluate_shared_neighbors(
+    estimator,
+    candidates : list[dict],
+    folds : list[FoldFeatures],
+    y : np.ndarray,
+    scorer,
+    *,
+    n_jobs : int | None = None,
+    verbose : int = 0,
+) -> list[CandidateResult]:
+    """
+    Поиск по сетке kNN (n_neighbors x weights): на каждом фолде соседи и расстояния считаются один раз
+    для max(n_neighbors), каждый кандидат берёт префикс этого списка.
+    Результат совпадает с обычным GridSearchCV с точностью до равных расстояний на границе k-го соседа
+    """
+    est_params = estimator.get_params()
+    # у SparseCosineKNN нет metric/algorithm: он всегда cosine + brute
+    if est_params.get("metric", "cosine") != "cosine" or est_params.get("algorithm", "brute") not in {"brute", "auto"}:
+        raise ValueError("shared_neighbors search supports cosine brute-force kNN only (KNeighborsClassifier or SparseCosineKNN)")
+    extra = {k for c in candidates for k in c} - KNN_SEARCH_PARAMS
+    if extra:
+        raise ValueError(f"shared_neighbors search can vary only {sorted(KNN_SEARCH_PARAMS)}, got also: {sorted(extra)}")
+
+    per_fold = Parallel(n_jobs=n_jobs, verbose=verbose)(
+        delayed(_evaluate_fold)(estimator, candidates, fold, y, scorer) for fold in folds
+    )
+
+    results = [CandidateResult(params=p) for p in candidates]
+    for outs in per_fold:
+        for res, (score, fit_time, score_time) in zip(results, outs):
+            res.test_scores.append(score)
+            res.fit_times.append(fit_time)
+            res.score_times.append(score_time)
+    return results
+
+
+SEARCH_ROUTINES["shared_neighbors"] = _evaluate_shared_neighbors
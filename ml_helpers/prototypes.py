@@ -0,0 +1,157 @@
+import hashlib, numpy as np, scipy.sparse as sp
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import normalize
+from sklearn.utils.validation import check_is_fitted
+from .knn_search import cosine_topk
+
+
+def select_dedupe(X : sp.csr_matrix, y : np.ndarray, **_) -> np.ndarray:
+    """
+    Оставляет по одной строке из группы одинаковых (признаки + метка) — типичные повторы шаблонов generate_data
+    """
+    X = sp.csr_matrix(X)
+    X.sort_indices()
+    seen, keep = set(), []
+    for i in range(X.shape[0]):
+        lo, hi = X.indptr[i], X.indptr[i + 1]
+        h = hashlib.blake2b(digest_size=16)
+        h.update(X.indices[lo:hi].tobytes())
+        h.update(X.data[lo:hi].tobytes())
+        key = (h.digest(), y[i])
+        if key not in seen:
+            seen.add(key)
+            keep.append(i)
+    return np.asarray(keep, dtype=np.intp)
+
+
+def select_enn(X : sp.csr_matrix, y : np.ndarray, *, n_neighbors : int = 3, **_) -> np.ndarray:
+    """
+    Edited NN (Wilson): удаляет строки, метка которых не совпадает с большинством их n_neighbors соседей
+    """
+    Xn_T = normalize(X, copy=True).T.tocsr()
+    k = min(n_neighbors + 1, X.shape[0])
+    _, ind = cosine_topk(X, Xn_T, k)
+
+    # сама строка обычно первая, но при дубликатах может оказаться не на нулевой позиции
+    keep = []
+    for i, row in enumerate(ind):
+        neigh = row[row != i][: k - 1]
+        labels, counts = np.unique(y[neigh], return_counts=True)
+        if len(labels) == 0 or labels[np.argmax(counts)] == y[i]:
+            keep.append(i)
+    return np.asarray(keep, dtype=np.intp)
+
+
+def select_cnn(X : sp.csr_matrix, y : np.ndarray, *, max_passes : int = 20, random_state : int | None = 42, **_) -> np.ndarray:
+    """
+    Condensed NN (Hart), пакетный вариант: начиная с одной строки на класс, за проход добавляет
+    строки, которые 1-NN по текущему набору классифицирует неверно, пока ошибки не закончатся
+    """
+    rng = np.random.default_rng(random_state)
+    Xn = normalize(X, copy=True)
+    store = [int(rng.choice(np.flatnonzero(y == c))) for c in np.unique(y)]
+
+    for _ in range(max_passes):
+        store_idx = np.asarray(store, dtype=np.intp)
+        _, ind = cosine_topk(Xn, Xn[store_idx].T.tocsr(), 1)
+        wrong = np.flatnonzero(y[store_idx[ind[:, 0]]] != y)
+        if len(wrong) == 0:
+            break
+        # за проход добавляется не больше sqrt(ошибок класса) строк: в последовательном алгоритме Харта
+        # каждая добавленная строка исправляет соседние, добавление всех ошибок сразу раздувает набор
+        for c in np.unique(y[wrong]):
+            cand = wrong[y[wrong] == c]
+            n_add = int(np.ceil(np.sqrt(len(cand))))
+            store.extend(int(i) for i in rng.choice(cand, size=n_add, replace=False))
+    return np.unique(np.asarray(store, dtype=np.intp))
+
+
+def select_kmeans(X : sp.csr_matrix, y : np.ndarray, *, cluster_ratio : float = 0.1, random_state : int | None = 42, **_) -> np.ndarray:
+    """
+    Кластеризация по классам (сферический k-means), в набор идёт ближайшая к центроиду реальная строка,
+    чтобы эталоны оставались разреженными строками исходного пространства
+    """
+    Xn = normalize(X, copy=True)
+    keep = []
+    for c in np.unique(y):
+        idx = np.flatnonzero(y == c)
+        n_clusters = max(1, int(np.ceil(cluster_ratio * len(idx))))
+        if n_clusters >= len(idx):
+            keep.extend(idx)
+            continue
+        km = MiniBatchKMeans(n_clusters=n_clusters, n_init=3, random_state=random_state).fit(Xn[idx])
+        sims = Xn[idx] @ normalize(km.cluster_centers_).T
+        keep.extend(idx[np.unique(np.asarray(sims).argmax(axis=0))])
+    return np.unique(np.asarray(keep, dtype=np.intp))
+
+
+PROTOTYPE_STRATEGIES = {
+    "dedupe": select_dedupe,
+    "enn": select_enn,
+    "cnn": select_cnn,
+    "kmeans": select_kmeans,
+}
+
+class PrototypeSelectionClassifier(ClassifierMixin, BaseEstimator):
+    """
+    Отбор эталонов для kNN при обучении: strategy — одна стратегия из PROTOTYPE_STRATEGIES
+    или их цепочка (например ["dedupe", "enn", "cnn"]), estimator обучается только на отобранных строках.
+    Каждый класс сохраняет хотя бы одну строку. support_ — индексы эталонов в обучающей выборке
+    """
+    def __init__(
+        self,
+        estimator,
+        *,
+        strategy : str | list[str] = "dedupe",
+        n_neighbors : int = 3,
+        max_passes : int = 20,
+        cluster_ratio : float = 0.1,
+        random_state : int | None = 42,
+    ) -> None:
+        self.estimator = estimator
+        self.strategy = strategy
+        self.n_neighbors = n_neighbors
+        self.max_passes = max_passes
+        self.cluster_ratio = cluster_ratio
+        self.random_state = random_state
+
+    def fit(self, X, y):
+        X = sp.csr_matrix(X)
+        y = np.asarray(y)
+        steps = [self.strategy] if isinstance(self.strategy, str) else list(self.strategy)
+        unknown = [s for s in steps if s not in PROTOTYPE_STRATEGIES]
+        if unknown:
+            raise ValueError(f"Unknown prototype strategy: {unknown}, expected one of {sorted(PROTOTYPE_STRATEGIES)}")
+
+        self.classes_ = np.unique(y)
+        support = np.arange(X.shape[0])
+        for name in steps:
+            sel = PROTOTYPE_STRATEGIES[name](
+                X[support], y[support],
+                n_neighbors=self.n_neighbors,
+                max_passes=self.max_passes,
+                cluster_ratio=self.cluster_ratio,
+                random_state=self.random_state,
+            )
+            # класс не должен исчезнуть целиком (ENN может вычистить редкий класс)
+            lost = np.setdiff1d(np.unique(y[support]), np.unique(y[support][sel]))
+            extra = [np.flatnonzero(y[support] == c)[0] for c in lost]
+            support = support[np.union1d(sel, np.asarray(extra, dtype=np.intp))]
+
+        self.support_ = support
+        self.estimator_ = clone(self.estimator)
+        # kNN: соседей не может быть больше, чем эталонов
+        k = self.estimator_.get_params().get("n_neighbors")
+        if isinstance(k, int) and k > len(support):
+            self.estimator_.set_params(n_neighbors=len(support))
+        self.estimator_.fit(X[support], y[support])
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        check_is_fitted(self, "estimator_")
+        return self.estimator_.predict(X)
+
+    def predict_proba(self, X) -> np.ndarray:
+        check_is_fitted(self, "estimator_")
+        return self.estimator_.predict_proba(X)
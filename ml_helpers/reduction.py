@@ -0,0 +1,59 @@
+import numpy as np, scipy.sparse as sp
+from sklearn.base import BaseEstimator, TransformerMixin
+from sklearn.decomposition import TruncatedSVD
+from sklearn.preprocessing import normalize as l2_normalize
+from sklearn.random_projection import SparseRandomProjection
+from sklearn.utils.validation import check_is_fitted
+
+
+REDUCTION_METHODS = ("svd", "random_projection")
+
+class DenseReducer(TransformerMixin, BaseEstimator):
+    """
+    Сжатие разреженных признаков ColumnTransformer в плотные float32 (n_components столбцов):
+      - "svd": TruncatedSVD (LSA), компоненты обучаются по данным; матрица проекции плотная float32
+        n_features x n_components — при сотнях тысяч n-грамм стоит включать selection
+      - "random_projection": SparseRandomProjection, от данных зависит только число столбцов
+    normalize=True делает строки L2-единичными: косинус становится скалярным произведением,
+    и kNN по косинусу считается плотным матричным умножением (BLAS)
+    """
+    def __init__(
+        self,
+        method : str = "svd",
+        n_components : int = 256,
+        normalize : bool = True,
+        random_state : int | None = 42,
+    ) -> None:
+        self.method = method
+        self.n_components = n_components
+        self.normalize = normalize
+        self.random_state = random_state
+
+    def fit(self, X, y=None):
+        if self.method not in REDUCTION_METHODS:
+            raise ValueError(f"Unsupported reduction method: {self.method!r}, expected one of {REDUCTION_METHODS}")
+        n_samples, n_features = X.shape
+        if self.method == "svd":
+            # TruncatedSVD требует n_components < n_features; маленькие срезы (роутер по кодам) ограничивают и строки
+            self.n_components_ = max(1, min(self.n_components, n_features - 1, n_samples))
+            svd = TruncatedSVD(n_components=self.n_components_, random_state=self.random_state).fit(X)
+            self.explained_variance_ratio_ = svd.explained_variance_ratio_
+            projection = np.ascontiguousarray(svd.components_.T, dtype=np.float32)
+        else:
+            self.n_components_ = self.n_components
+            rp = SparseRandomProjection(n_components=self.n_components_, random_state=self.random_state).fit(X)
+            projection = sp.csr_matrix(rp.components_.T, dtype=np.float32)
+        # transform — одно умножение X @ projection_ (n_features x n_components) в float32:
+        # у TruncatedSVD.transform разные dtype приводят к копии всей матрицы компонент на каждом запросе
+        self.projection_ = projection
+        self.n_features_in_ = n_features
+        return self
+
+    def transform(self, X) -> np.ndarray:
+        check_is_fitted(self, "projection_")
+        X = X.astype(np.float32) if sp.issparse(X) else np.asarray(X, dtype=np.float32)
+        Z = X @ self.projection_
+        Z = np.ascontiguousarray(Z.toarray() if sp.issparse(Z) else Z, dtype=np.float32)
+        if self.normalize:
+            Z = l2_normalize(Z, copy=False)
+        return Z
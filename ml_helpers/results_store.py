@@ -0,0 +1,140 @@
+import json, sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from sklearn.base import clone
+from config import CV_RESULTS_DB_PATH
+from .fold_search import CandidateResult
+
+
+SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS cv_results (
+    data_fingerprint TEXT NOT NULL,
+    feature_hash TEXT NOT NULL,
+    estimator TEXT NOT NULL,
+    params TEXT NOT NULL,
+    cv TEXT NOT NULL,
+    scoring TEXT NOT NULL,
+    search TEXT NOT NULL,
+    test_scores TEXT NOT NULL,
+    fit_times TEXT NOT NULL,
+    score_times TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    PRIMARY KEY (data_fingerprint, feature_hash, estimator, params, cv, scoring, search)
+);
+"""
+
+def _dumps(obj) -> str:
+    return json.dumps(obj, sort_keys=True, ensure_ascii=False, default=repr)
+
+
+def cv_strategy_key(cv) -> str:
+    # секция стратегии из конфига (dict) или сам объект сплиттера (его repr содержит все параметры)
+    if isinstance(cv, dict):
+        return _dumps(cv)
+    return repr(cv)
+
+
+def estimator_key(estimator) -> str:
+    cls = type(estimator)
+    return f"{cls.__module__}.{cls.__qualname__}"
+
+
+def candidate_params_key(estimator, params : dict) -> str:
+    """
+    Полный набор параметров классификатора (базовые из конфига + параметры кандидата),
+    чтобы изменение params в default.yaml тоже инвалидировало запись
+    """
+    return _dumps(clone(estimator).set_params(**params).get_params(deep=False))
+
+
+class CVResultsStore:
+    """
+    SQLite-кеш результатов кросс-валидации между запусками подбора.
+    Запись идентифицируется (отпечаток данных, хеш признаков, тип оценщика, параметры, стратегия CV)
+    плюс метрика и процедура поиска
+    """
+    def __init__(
+        self,
+        *,
+        data_fingerprint : str,
+        feature_hash : str,
+        cv,
+        path : str | Path = CV_RESULTS_DB_PATH,
+    ) -> None:
+        self.path = Path(path)
+        self.data_fingerprint = data_fingerprint
+        self.feature_hash = feature_hash
+        self.cv = cv_strategy_key(cv)
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with sqlite3.connect(self.path) as conn:
+            conn.executescript(SCHEMA_SQL)
+
+    def _key(self, estimator, params : dict, scoring : str, search : str) -> tuple:
+        return (
+            self.data_fingerprint,
+            self.feature_hash,
+            estimator_key(estimator),
+            candidate_params_key(estimator, params),
+            self.cv,
+            scoring,
+            search,
+        )
+
+    def get_many(self, estimator, candidates : list[dict], *, scoring : str, search : str) -> dict[int, CandidateResult]:
+        """
+        Возвращает {индекс кандидата: сохранённый результат} для уже оценённых кандидатов
+        """
+        found = {}
+        with sqlite3.connect(self.path) as conn:
+            for ci, params in enumerate(candidates):
+                row = conn.execute(
+                    "SELECT test_scores, fit_times, score_times FROM cv_results "
+                    "WHERE data_fingerprint = ? AND feature_hash = ? AND estimator = ? AND params = ? "
+                    "AND cv = ? AND scoring = ? AND search = ?",
+                    self._key(estimator, params, scoring, search),
+                ).fetchone()
+                if row is None:
+                    continue
+                test_scores, fit_times, score_times = (json.loads(v) for v in row)
+                found[ci] = CandidateResult(params=params, test_scores=test_scores, fit_times=fit_times, score_times=score_times)
+        return found
+
+    def put_many(self, estimator, results : list[CandidateResult], *, scoring : str, search : str) -> None:
+        created_at = datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        rows = [
+            (
+                *self._key(estimator, r.params, scoring, search),
+                json.dumps(r.test_scores),
+                json.dumps(r.fit_times),
+                json.dumps(r.score_times),
+                created_at,
+            )
+            for r in results
+        ]
+        with sqlite3.connect(self.path) as conn:
+            conn.executemany("INSERT OR REPLACE INTO cv_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def clear(self) -> int:
+        """
+        Удаляет записи для текущих данных/признаков/CV, возвращает число удалённых строк
+        """
+        with sqlite3.connect(self.path) as conn:
+            cur = conn.execute(
+                "DELETE FROM cv_results WHERE data_fingerprint = ? AND feature_hash = ? AND cv = ?",
+                (self.data_fingerprint, self.feature_hash, self.cv),
+            )
+            return cur.rowcount
+
+
+def make_results_store(cfg : dict, *, data_fingerprint : str, feature_hash : str, cv) -> CVResultsStore | None:
+    store_cfg = cfg.get("training", {}).get("results_store", {}) or {}
+    if not store_cfg.get("enabled", False):
+        return None
+    return CVResultsStore(
+        data_fingerprint=data_fingerprint,
+        feature_hash=feature_hash,
+        cv=cv,
+        path=store_cfg.get("path") or CV_RESULTS_DB_PATH,
+    )
+
@@ -0,0 +1,114 @@
+import json, re, numpy as np, pandas as pd
+from sklearn.base import BaseEstimator, ClassifierMixin, clone
+from sklearn.utils.validation import check_is_fitted
+
+
+ERROR_CODE_RE = re.compile(r"C\d{4}")
+UNKNOWN_CODE = ""
+
+def error_code_from_tokens(tokens_json : str) -> str:
+    # error_tokenizer сохраняет код ошибки (C2065, ...) первым токеном
+    try:
+        tokens = json.loads(tokens_json)
+    except (TypeError, ValueError):
+        return UNKNOWN_CODE
+    for tok in tokens[:1]:
+        if ERROR_CODE_RE.fullmatch(tok):
+            return tok
+    return UNKNOWN_CODE
+
+
+class ConstantClassifier(ClassifierMixin, BaseEstimator):
+    """
+    Ответ для кода ошибки, у которого в обучении встретилась одна рекомендация
+    """
+    def __init__(self, label=None) -> None:
+        self.label = label
+
+    def fit(self, X, y):
+        self.classes_ = np.unique(y)
+        self.label_ = self.classes_[0] if self.label is None else self.label
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        return np.full(len(X), self.label_, dtype=self.classes_.dtype)
+
+    def predict_proba(self, X) -> np.ndarray:
+        proba = np.zeros((len(X), len(self.classes_)))
+        proba[:, np.searchsorted(self.classes_, self.label_)] = 1.0
+        return proba
+
+
+class ErrorCodeRouter(ClassifierMixin, BaseEstimator):
+    """
+    Диспетчер по коду ошибки: на каждый код обучается своя копия estimator (обычно Pipeline feat + clf)
+    только на строках этого кода, для кодов с единственной рекомендацией — ConstantClassifier.
+    Код берётся из столбца code_column, а если его нет — из первого токена tokens_column.
+    Коды, не встречавшиеся в обучении, уходят в fallback: "global" (estimator на всех данных) или "majority"
+    """
+    def __init__(
+        self,
+        estimator,
+        *,
+        code_column : str = "error_code",
+        tokens_column : str = "error_text_tokens",
+        fallback : str = "global",
+    ) -> None:
+        self.estimator = estimator
+        self.code_column = code_column
+        self.tokens_column = tokens_column
+        self.fallback = fallback
+
+    def _codes(self, X : pd.DataFrame) -> np.ndarray:
+        if self.code_column in X.columns:
+            return X[self.code_column].fillna(UNKNOWN_CODE).astype(str).to_numpy()
+        return X[self.tokens_column].map(error_code_from_tokens).to_numpy()
+
+    def _fit_one(self, X : pd.DataFrame, y : np.ndarray):
+        if len(np.unique(y)) == 1:
+            return ConstantClassifier().fit(X, y)
+        est = clone(self.estimator)
+        # kNN на маленьком срезе: соседей не может быть больше, чем строк
+        for name, value in est.get_params().items():
+            if name.endswith("n_neighbors") and isinstance(value, int) and value > len(y):
+                est.set_params(**{name: len(y)})
+        return est.fit(X, y)
+
+    def fit(self, X : pd.DataFrame, y):
+        if self.fallback not in {"global", "majority"}:
+            raise ValueError(f"Unsupported fallback: {self.fallback!r}")
+        y = np.asarray(y)
+        codes = self._codes(X)
+
+        self.classes_ = np.unique(y)
+        self.models_ = {}
+        for code in np.unique(codes):
+            mask = codes == code
+            self.models_[code] = self._fit_one(X[mask], y[mask])
+
+        if self.fallback == "global":
+            self.fallback_ = self._fit_one(X, y)
+        else:
+            values, counts = np.unique(y, return_counts=True)
+            self.fallback_ = ConstantClassifier(label=values[np.argmax(counts)]).fit(X, y)
+        return self
+
+    def _route(self, X : pd.DataFrame):
+        check_is_fitted(self, "models_")
+        codes = self._codes(X)
+        for code in np.unique(codes):
+            idx = np.flatnonzero(codes == code)
+            yield idx, self.models_.get(code, self.fallback_)
+
+    def predict(self, X : pd.DataFrame) -> np.ndarray:
+        out = np.empty(len(X), dtype=self.classes_.dtype)
+        for idx, model in self._route(X):
+            out[idx] = model.predict(X.iloc[idx])
+        return out
+
+    def predict_proba(self, X : pd.DataFrame) -> np.ndarray:
+        out = np.zeros((len(X), len(self.classes_)))
+        for idx, model in self._route(X):
+            cols = np.searchsorted(self.classes_, model.classes_)
+            out[np.ix_(idx, cols)] = model.predict_proba(X.iloc[idx])
+        return out
@@ -0,0 +1,198 @@
+import os, shutil, tempfile, time, numpy as np, scipy.sparse as sp
+from pathlib import Path
+from joblib import Parallel, delayed
+from sklearn.base import clone
+from .fold_search import _slice_rows
+from .sparse_io import save_csr, load_csr
+
+
+SHM_DIR = Path("/dev/shm")
+
+def default_shared_dir() -> Path:
+    # /dev/shm — файлы в RAM, страницы общие для всех процессов; иначе обычный temp (через page cache)
+    if SHM_DIR.is_dir() and os.access(SHM_DIR, os.W_OK):
+        return SHM_DIR
+    return Path(tempfile.gettempdir())
+
+
+class SharedCSR:
+    """
+    CSR-матрица в memmap-файлах (data/indices/indptr в формате sparse_io).
+    Пиклится как путь: воркер joblib открывает те же файлы, а не получает копию массивов
+    """
+    def __init__(self, root : str | Path, *, owner : bool = False) -> None:
+        self.root = Path(root)
+        self.owner = owner
+        self._matrix = None
+
+    @classmethod
+    def from_matrix(cls, X, *, root : str | Path | None = None) -> "SharedCSR":
+        if root is None:
+            root = tempfile.mkdtemp(prefix="tppo_csr_", dir=default_shared_dir())
+        save_csr(sp.csr_matrix(X), root)
+        return cls(root, owner=True)
+
+    @property
+    def matrix(self) -> sp.csr_matrix:
+        if self._matrix is None:
+            self._matrix = load_csr(self.root, mmap=True)
+        return self._matrix
+
+    @property
+    def shape(self) -> tuple[int, int]:
+        return self.matrix.shape
+
+    def take(self, rows : np.ndarray) -> sp.csr_matrix:
+        # копируются только выбранные строки, остальное остаётся в общих страницах
+        return self.matrix[rows]
+
+    def close(self) -> None:
+        self._matrix = None
+        if self.owner:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self) -> "SharedCSR":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __reduce__(self):
+        # в другой процесс уходит только путь, владельцем файлов остаётся создавший процесс
+        return (SharedCSR, (str(self.root),))
+
+
+class SharedFold:
+    """
+    Фолд поверх общей матрицы: X — все строки, трансформированные векторизатором,
+    обученным только на train_idx этого фолда. Совместим с FoldFeatures (X_train / X_val),
+    поэтому подходит для fold_grid_search
+    """
+    def __init__(self, fold : int, train_idx : np.ndarray, val_idx : np.ndarray, X : SharedCSR) -> None:
+        self.fold = fold
+        self.train_idx = train_idx
+        self.val_idx = val_idx
+        self.X = X
+
+    @property
+    def X_train(self) -> sp.csr_matrix:
+        return self.X.take(self.train_idx)
+
+    @property
+    def X_val(self) -> sp.csr_matrix:
+        return self.X.take(self.val_idx)
+
+
+class SharedFolds(list):
+    """
+    Список SharedFold, владеет общим каталогом с матрицами фолдов; close() удаляет его
+    """
+    def __init__(self, folds : list[SharedFold], root : Path) -> None:
+        super().__init__(folds)
+        self.root = root
+
+    def close(self) -> None:
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def __enter__(self) -> "SharedFolds":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _vectorize_fold(feat, X, y : np.ndarray, train_idx : np.ndarray, out_dir : Path) -> SharedCSR:
+    f = clone(feat).fit(_slice_rows(X, train_idx), y[train_idx])
+    shared = SharedCSR.from_matrix(f.transform(X), root=out_dir)
+    shared.owner = False
+    return shared
+
+
+def share_cv_features(
+    feat,
+    X,
+    y,
+    cv,
+    *,
+    shared_dir : str | Path | None = None,
+    n_jobs : int | None = None,
+) -> SharedFolds:
+    """
+    Для каждого фолда обучает feat на train-части и один раз трансформирует все строки X,
+    результат пишется в общий каталог (по умолчанию /dev/shm). Дальше воркеры получают
+    только путь и индексы строк, DataFrame с JSON-строками повторно не пиклится и не векторизуется
+    """
+    y = np.asarray(y)
+    splits = list(cv.split(X, y))
+    root = Path(tempfile.mkdtemp(prefix="tppo_folds_", dir=shared_dir or default_shared_dir()))
+
+    try:
+        shared = Parallel(n_jobs=n_jobs)(
+            delayed(_vectorize_fold)(feat, X, y, tr_idx, root / f"fold{i}") for i, (tr_idx, _) in enumerate(splits)
+        )
+    except BaseException:
+        shutil.rmtree(root, ignore_errors=True)
+        raise
+
+    folds = [
+        SharedFold(fold=i, train_idx=tr_idx, val_idx=va_idx, X=X_shared)
+        for i, ((tr_idx, va_idx), X_shared) in enumerate(zip(splits, shared))
+    ]
+    return SharedFolds(folds, root)
+
+
+def _fold_output(estimator, fold : SharedFold, y : np.ndarray, method : str) -> tuple[np.ndarray, np.ndarray, np.ndarray, float]:
+    est = clone(estimator)
+    t0 = time.perf_counter()
+    est.fit(fold.X_train, y[fold.train_idx])
+    out = getattr(est, method)(fold.X_val)
+    return fold.val_idx, out, est.classes_, time.perf_counter() - t0
+
+
+def parallel_fold_outputs(
+    estimator,
+    folds : list[SharedFold],
+    y,
+    *,
+    method : str = "predict_proba",
+    n_jobs : int | None = None,
+    verbose : int = 0,
+) -> list[tuple[np.ndarray, np.ndarray, np.ndarray, float]]:
+    """
+    Обучает клон estimator (только классификатор, без шага feat) на каждом фолде и возвращает
+    [(val_idx, выход method на valid-части, classes_, время)] в порядке фолдов
+    """
+    y = np.asarray(y)
+    return Parallel(n_jobs=n_jobs, verbose=verbose)(
+        delayed(_fold_output)(estimator, fold, y, method) for fold in folds
+    )
+
+
+def parallel_cross_val_predict(
+    estimator,
+    folds : list[SharedFold],
+    y,
+    *,
+    method : str = "predict",
+    n_jobs : int | None = None,
+    verbose : int = 0,
+) -> np.ndarray:
+    """
+    Аналог cross_val_predict(Pipeline(feat, clf)) поверх общих матриц фолдов.
+    Для predict_proba столбцы выровнены по классам всего y, как в sklearn
+    """
+    y = np.asarray(y)
+    outs = parallel_fold_outputs(estimator, folds, y, method=method, n_jobs=n_jobs, verbose=verbose)
+
+    if method == "predict":
+        pred = np.empty(len(y), dtype=outs[0][1].dtype)
+        for val_idx, out, _, _ in outs:
+            pred[val_idx] = out
+        return pred
+
+    classes = np.unique(y)
+    pred = np.zeros((len(y), len(classes)), dtype=float)
+    for val_idx, out, est_classes, _ in outs:
+        cols = np.searchsorted(classes, est_classes)
+        pred[np.ix_(val_idx, cols)] = out
+    return pred
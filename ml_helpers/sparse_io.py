@@ -0,0 +1,45 @@
+import json, numpy as np, scipy.sparse as sp
+from pathlib import Path
+
+
+CSR_PARTS = ("data", "indices", "indptr")
+CSR_META_FILENAME = "csr.json"
+
+def save_csr(X, out_dir : str | Path) -> Path:
+    """
+    Сохраняет CSR-матрицу в виде трёх несжатых .npy (data/indices/indptr) + csr.json с формой,
+    чтобы потом открывать её через np.load(mmap_mode="r") без распаковки
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    X = sp.csr_matrix(X)
+    if not X.has_sorted_indices:
+        # csr_matrix(X) разделяет массивы с матрицей вызывающего — сортируется копия
+        X = X.copy()
+        X.sort_indices()
+    for part in CSR_PARTS:
+        np.save(out / f"{part}.npy", getattr(X, part), allow_pickle=False)
+
+    meta = {
+        "shape": list(X.shape),
+        "nnz": int(X.nnz),
+        "dtype": str(X.dtype),
+    }
+    (out / CSR_META_FILENAME).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return out
+
+
+def load_csr(in_dir : str | Path, *, mmap : bool = True) -> sp.csr_matrix:
+    src = Path(in_dir)
+    meta_path = src / CSR_META_FILENAME
+    if not meta_path.exists():
+        raise FileNotFoundError(f"CSR meta not found: {meta_path}")
+
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    mmap_mode = "r" if mmap else None
+    data, indices, indptr = (np.load(src / f"{part}.npy", mmap_mode=mmap_mode, allow_pickle=False) for part in CSR_PARTS)
+    # copy=False: массивы остаются view над memmap, данные не читаются целиком в память
+    X = sp.csr_matrix((data, indices, indptr), shape=tuple(meta["shape"]), copy=False)
+    X.has_sorted_indices = True
+    return X
@@ -1,4 +1,5 @@
 import json, numpy as np
+from sklearn.feature_selection import mutual_info_classif
 
 
 def _tokens_col_to_tokens(X):
@@ -12,4 +13,10 @@ def _dict_col_to_dicts(X):
 
 
 def _identity(x):
-    return x
\ No newline at end of file
+    return x
+
+
+def _mutual_info(X, y):
+    # взаимная информация метки с наличием n-граммы: веса TF-IDF непрерывные, поэтому признак бинаризуется
+    present = (X > 0).astype(np.int8)
+    return mutual_info_classif(present, y, discrete_features=True, random_state=42)
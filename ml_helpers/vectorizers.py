@@ -3,7 +3,10 @@ from sklearn.preprocessing import FunctionTransformer, StandardScaler, MaxAbsSca
 from sklearn.feature_extraction import DictVectorizer
 from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer, TfidfVectorizer
 from sklearn.compose import ColumnTransformer
-from .transformers import _identity, _dict_col_to_dicts, _tokens_col_to_tokens
+from sklearn.feature_selection import SelectKBest, chi2
+from .transformers import _identity, _dict_col_to_dicts, _tokens_col_to_tokens, _mutual_info
+from .dawg_vocab import DawgTfidfVectorizer
+from .reduction import DenseReducer
 
 
 PREPROCESSORS = {
@@ -12,6 +15,28 @@ PREPROCESSORS = {
 TOKENIZERS = {
     "identity": _identity,
 }
+SCORE_FUNCS = {
+    "chi2": chi2,
+    "mutual_info": _mutual_info,
+}
+# score_func, которые требуют неотрицательных признаков (chi2 падает на отрицательных значениях)
+NONNEGATIVE_SCORE_FUNCS = {"chi2"}
+
+def _apply_selection_params(base_params : dict, selection : dict) -> dict:
+    # min_df / max_features из selection перекрывают параметры векторизатора
+    for key in ("min_df", "max_features"):
+        if selection.get(key) is not None:
+            base_params[key] = selection[key]
+    return base_params
+
+
+def build_selector(selection : dict) -> SelectKBest | None:
+    score_func = selection.get("score_func")
+    if score_func is None:
+        return None
+    if score_func not in SCORE_FUNCS:
+        raise ValueError(f"Unsupported score_func: {score_func}")
+    return SelectKBest(SCORE_FUNCS[score_func], k=selection["k"])
 
 def build_text_tokens(field_cfg : dict, *, lowercase : bool, naive_bayes_compatible : bool) -> Pipeline:
     mode = field_cfg["mode"]
@@ -23,9 +48,13 @@ def build_text_tokens(field_cfg : dict, *, lowercase : bool, naive_bayes_compati
 
     preprocessor = PREPROCESSORS[preprocessor_name]
     tokenizer = TOKENIZERS[tokenizer_name]
+
+    selection = field_cfg.get("selection") or {}
+    if not selection.get("enabled", False):
+        selection = {}
     
     if mode == "CountVectorizer":
-        base_params = dict(field_cfg["CountVectorizer"])
+        base_params = _apply_selection_params(dict(field_cfg["CountVectorizer"]), selection)
         vect = CountVectorizer(
             lowercase=lowercase,
             ngram_range=ngram_range,
@@ -36,8 +65,8 @@ def build_text_tokens(field_cfg : dict, *, lowercase : bool, naive_bayes_compati
         )
     elif mode == "HashingVectorizer":
         base_params = dict(field_cfg["HashingVectorizer"])
-        if naive_bayes_compatible:
-            base_params["alternate_sign"] = False  # чтобы не получить отрицательные значения
+        if naive_bayes_compatible or selection.get("score_func") in NONNEGATIVE_SCORE_FUNCS:
+            base_params["alternate_sign"] = False  # чтобы не получить отрицательные значения (MultinomialNB, chi2)
         vect = HashingVectorizer(
             lowercase=lowercase,
             ngram_range=ngram_range,
@@ -46,9 +75,11 @@ def build_text_tokens(field_cfg : dict, *, lowercase : bool, naive_bayes_compati
             token_pattern=token_pattern,
             **base_params,
         )
-    elif mode == "TfidfVectorizer":
-        base_params = dict(field_cfg["TfidfVectorizer"])
-        vect = TfidfVectorizer(
+    elif mode in {"TfidfVectorizer", "DawgTfidfVectorizer"}:
+        # DawgTfidfVectorizer берёт те же параметры, словарь после fit хранится в DAWG
+        base_params = _apply_selection_params(dict(field_cfg["TfidfVectorizer"]), selection)
+        vect_cls = DawgTfidfVectorizer if mode == "DawgTfidfVectorizer" else TfidfVectorizer
+        vect = vect_cls(
             lowercase=lowercase,
             ngram_range=ngram_range,
             preprocessor=preprocessor,
@@ -66,7 +97,12 @@ def build_text_tokens(field_cfg : dict, *, lowercase : bool, naive_bayes_compati
         raise ValueError(f"Unsupported scaler: {scale_name}")
     
     to_tokens = FunctionTransformer(_tokens_col_to_tokens, validate=False)
-    steps = [("to_tokens", to_tokens), ("vect", vect), ("scale", scale)]
+    steps = [("to_tokens", to_tokens), ("vect", vect)]
+    selector = build_selector(selection)
+    if selector is not None:
+        # top-k по chi2 / mutual_info считается по y, который ColumnTransformer передаёт в fit
+        steps.append(("select", selector))
+    steps.append(("scale", scale))
     return Pipeline(steps)
 
 
@@ -94,7 +130,7 @@ def build_numeric_dict(field_cfg : dict) -> Pipeline:
     return ctx_vec
 
 
-def build_vectorizer_from_cfg(cfg : dict, *, col_map : dict[str, str] | None = None) -> ColumnTransformer:
+def build_vectorizer_from_cfg(cfg : dict, *, col_map : dict[str, str] | None = None) -> ColumnTransformer | Pipeline:
     features = cfg["features"]
     lowercase = bool(features["lowercase"])
     nb_ok = bool(features["naive_bayes_compatible"])
@@ -125,4 +161,16 @@ def build_vectorizer_from_cfg(cfg : dict, *, col_map : dict[str, str] | None = N
         col_map["for_ctx_numeric"],
     ))
 
-    return ColumnTransformer(transformers=tr, remainder="drop")
\ No newline at end of file
+    columns = ColumnTransformer(transformers=tr, remainder="drop")
+
+    # features.reduction: плотное float32-представление поверх всех полей
+    reduction = features.get("reduction") or {}
+    if not reduction.get("enabled", False):
+        return columns
+    reducer = DenseReducer(
+        method=reduction.get("method", "svd"),
+        n_components=int(reduction.get("n_components", 256)),
+        normalize=bool(reduction.get("normalize", True)),
+        random_state=reduction.get("random_state", 42),
+    )
+    return Pipeline([("columns", columns), ("reduce", reducer)])
\ No newline at end of file
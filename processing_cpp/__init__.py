@@ -1,9 +1,11 @@
-from .compile_cpp import compile_get_error_info, clear_build_tmp, normalize_includes, strip_cpp_comments
+from .compile_cpp import compile_get_error_info, cl_get_error_info, set_compile_backend, clear_build_tmp, normalize_includes, strip_cpp_comments
 from .parsing_cpp import safe_extract_context
 
 
 __all__ = [
     "compile_get_error_info",
+    "cl_get_error_info",
+    "set_compile_backend",
     "clear_build_tmp",
     "normalize_includes",
     "strip_cpp_comments",
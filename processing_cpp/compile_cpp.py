@@ -1,11 +1,15 @@
-import subprocess, uuid, os, re
+import subprocess, threading, uuid, os, re
+from pathlib import Path
+from typing import Callable
 from config import BUILD_DIR
+from instrumentation import timed
 
 
 BUILD_DIR.mkdir(parents=True, exist_ok=True)
 CPP_LINE_RE_FIND = re.compile(r"\.cpp\((\d+)\)")
 BITS_HEADER_RE_FIND = re.compile(r"(?<= )bits/stdc\+\+\.h(?=:(?!:))")
 BITS_HEADER_RE_REPLACE = re.compile(r'#\s*include\s*(<\s*bits/stdc\+\+\.h\s*>|"\s*bits/stdc\+\+\.h\s*")')
+COMPILE_BACKEND_ENV = "TPPO_COMPILE_BACKEND"
 CL_CMD_BASE = [
         "cl",
         "/nologo",
@@ -49,7 +53,7 @@ def compile(source_code : str) -> str | None:
     return text
 
 
-def compile_get_error_info(source_code : str) -> tuple[str | None, int | None]:
+def cl_get_error_info(source_code : str) -> tuple[str | None, int | None]:
     temp = compile(source_code)
     if temp is None:
         return (None, None)
@@ -75,12 +79,39 @@ def compile_get_error_info(source_code : str) -> tuple[str | None, int | None]:
     return (res, error_line)
 
 
+_backend : Callable[[str], tuple[str | None, int | None]] | None = None
+# первый вызов compile_get_error_info приходит одновременно из нескольких потоков пула компиляции
+_backend_lock = threading.Lock()
+
+def set_compile_backend(mode : str, store_path : str | Path | None = None) -> None:
+    # режимы — processing_cpp.replay.make_backend: cl, replay, replay+cl, record
+    global _backend
+    from .replay import make_backend    # replay сам импортирует cl_get_error_info из этого модуля
+    with _backend_lock:
+        _backend = make_backend(mode, store_path)
+
+
+@timed("compile")
+def compile_get_error_info(source_code : str) -> tuple[str | None, int | None]:
+    # бэкенд выбирается при первом вызове по TPPO_COMPILE_BACKEND (по умолчанию cl)
+    global _backend
+    backend = _backend
+    if backend is None:
+        from .replay import make_backend
+        with _backend_lock:
+            if _backend is None:
+                _backend = make_backend(os.environ.get(COMPILE_BACKEND_ENV, "cl"))
+            backend = _backend
+    return backend(source_code)
+
+
 def clear_build_tmp() -> None:
     for pattern in ("*.cpp", "*.obj", "*.exe"):
         for file in BUILD_DIR.glob(pattern):
             os.remove(file)
 
 
+@timed("strip")
 def strip_cpp_comments(code : str) -> str:
     code = code.strip()
     result = []
@@ -5,6 +5,7 @@ from clang.cindex import TranslationUnit, CursorKind, Cursor, TokenKind, Token
 from collections import defaultdict, Counter
 from .compile_cpp import normalize_includes
 from config import TEMP_OUTPUT_DIR
+from instrumentation import stage
 
 
 FILE_NAME = "code.cpp"
@@ -465,17 +466,20 @@ def extract_error_context(tu : TranslationUnit, idx : TUIndex, line : int, with_
 
 def safe_extract_context(source_code : str, error_line : int, with_macros : bool, radius : int = 2) -> dict[str, int | str | list | dict]:
     try:
-        tu = parse(source_code, with_macros)
+        with stage("parse"):
+            tu = parse(source_code, with_macros)
     except Exception as e:
         print(f"error: parse_failed: {e}, line: {error_line}")
         return {}
     try:
-        idx = build_tu_index(tu, with_macros)
+        with stage("index"):
+            idx = build_tu_index(tu, with_macros)
     except Exception as e:
         print(f"error: index_failed: {e}, line: {error_line}")
         return {}
     try:
-        return extract_error_context(tu, idx, error_line, with_macros, radius) # type: ignore
+        with stage("extract"):
+            return extract_error_context(tu, idx, error_line, with_macros, radius) # type: ignore
     except Exception as e:
         print(f"error: extract_failed: {e}, line: {error_line}")
         return {}
@@ -0,0 +1,200 @@
+import argparse, hashlib, json, os, sqlite3, threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable
+from config import DB_SNAPSHOT_PATH, REPLAY_DB_PATH
+from instrumentation import cache_event
+from .compile_cpp import cl_get_error_info, strip_cpp_comments
+
+
+REPLAY_DB_ENV = "TPPO_REPLAY_DB"
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS compile_results (
+    source_hash TEXT PRIMARY KEY,
+    error_text TEXT NULL,
+    error_line INTEGER NULL,
+    origin TEXT NOT NULL,
+    recorded_at TEXT NOT NULL
+);
+"""
+
+class ReplayMiss(KeyError):
+    pass
+
+
+def source_hash(source_code : str) -> str:
+    return hashlib.sha256(source_code.encode("utf-8")).hexdigest()
+
+
+def training_data_key(source_code : str) -> str | None:
+    """
+    Ключ строки training_data: хеш исходника после strip_cpp_comments — именно его Recommender передаёт
+    в compile_get_error_info. cl при разметке видел исходник с комментариями, поэтому ответ переносится, только
+    если strip не убрал ни одного перевода строки (блочные комментарии, ведущие пустые строки): иначе error_line
+    указывает не на ту строку. Для таких строк — None
+    """
+    stripped = strip_cpp_comments(source_code)
+    if stripped.count("\n") != source_code.rstrip().count("\n"):
+        return None
+    return source_hash(stripped)
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class ReplayStore:
+    """
+    Записанные ответы компилятора: sha256 исходника -> (error_text, error_line), как у compile_get_error_info.
+    Совпадение только точное — исходник тот же, что передаётся компилятору (после strip_cpp_comments).
+    Одно соединение на хранилище под блокировкой: compile вызывается из пула потоков сервиса
+    """
+    def __init__(
+        self,
+        path : str | Path = REPLAY_DB_PATH,
+        *,
+        readonly : bool = False,
+        compile_fn : Callable[[str], tuple[str | None, int | None]] = cl_get_error_info,
+    ) -> None:
+        self.path = Path(path)
+        self.compile_fn = compile_fn
+        if readonly:
+            if not self.path.exists():
+                raise FileNotFoundError(f"Не найдено хранилище ответов компилятора: {self.path}")
+            self._conn = sqlite3.connect(f"file:{self.path.as_posix()}?mode=ro", uri=True, check_same_thread=False)
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def get(self, source_code : str) -> tuple[str | None, int | None] | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT error_text, error_line FROM compile_results WHERE source_hash = ?", (source_hash(source_code),)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        cache_event("replay", row is not None)
+        return None if row is None else (row[0], row[1])
+
+    def put(self, source_code : str, result : tuple[str | None, int | None], origin : str = "cl") -> None:
+        # (None, None) cl возвращает только по таймауту — такой ответ не записывается
+        if result == (None, None):
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO compile_results (source_hash, error_text, error_line, origin, recorded_at) VALUES (?, ?, ?, ?, ?)",
+                (source_hash(source_code), result[0], result[1], origin, _now()),
+            )
+            self._conn.commit()
+            self.recorded += 1
+
+    def replay(self, source_code : str) -> tuple[str | None, int | None]:
+        result = self.get(source_code)
+        if result is None:
+            raise ReplayMiss(f"Нет записанного ответа компилятора для исходника {source_hash(source_code)[:16]}")
+        return result
+
+    def replay_or_compile(self, source_code : str) -> tuple[str | None, int | None]:
+        result = self.get(source_code)
+        if result is None:
+            result = self.compile_fn(source_code)
+            self.put(source_code, result)
+        return result
+
+    def record(self, source_code : str) -> tuple[str | None, int | None]:
+        result = self.compile_fn(source_code)
+        self.put(source_code, result)
+        return result
+
+    def import_training_data(self, db_path : str | Path = DB_SNAPSHOT_PATH, *, batch_size : int = 10000) -> dict[str, int]:
+        """
+        Ответы cl, сохранённые при разметке (training_data: source_code, error_text, error_line),
+        под ключом training_data_key. Уже записанные исходники не перезаписываются.
+        Возвращает число добавленных и пропущенных (strip сдвинул строки) строк
+        """
+        added = skipped = 0
+        with sqlite3.connect(db_path) as src:
+            cur = src.execute("SELECT source_code, error_text, error_line FROM training_data ORDER BY training_data_id")
+            while rows := cur.fetchmany(batch_size):
+                now = _now()
+                batch = []
+                for code, text, line in rows:
+                    key = training_data_key(code)
+                    if key is None:
+                        skipped += 1
+                    else:
+                        batch.append((key, text, line, now))
+                with self._lock:
+                    before = self._conn.total_changes
+                    self._conn.executemany(
+                        "INSERT OR IGNORE INTO compile_results (source_hash, error_text, error_line, origin, recorded_at) VALUES (?, ?, ?, 'training_data', ?)",
+                        batch,
+                    )
+                    self._conn.commit()
+                    added += self._conn.total_changes - before
+        return {"added": added, "skipped": skipped}
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM compile_results").fetchone()[0]
+
+    def stats(self) -> dict[str, int | str | dict[str, int]]:
+        with self._lock:
+            origins = dict(self._conn.execute("SELECT origin, COUNT(*) FROM compile_results GROUP BY origin").fetchall())
+        return {"path": str(self.path), "size": sum(origins.values()), "origins": origins,
+                "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+# режим TPPO_COMPILE_BACKEND -> (хранилище только для чтения, метод ReplayStore); cl — без хранилища
+MODES = {
+    "replay": (True, "replay"),
+    "replay+cl": (False, "replay_or_compile"),
+    "record": (False, "record"),
+}
+
+def make_backend(mode : str, store_path : str | Path | None = None) -> Callable[[str], tuple[str | None, int | None]]:
+    """
+    Функция компиляции для режима: cl — настоящий компилятор, replay — только записанные ответы (промах — ReplayMiss),
+    replay+cl — записанные ответы, промахи компилируются и записываются, record — всегда cl с записью ответа.
+    Хранилище — store_path, TPPO_REPLAY_DB или config.REPLAY_DB_PATH
+    """
+    if mode == "cl":
+        return cl_get_error_info
+    if mode not in MODES:
+        raise ValueError(f"Unknown compile backend: {mode!r}, expected one of {['cl', *MODES]}")
+    readonly, method = MODES[mode]
+    store = ReplayStore(store_path or os.environ.get(REPLAY_DB_ENV) or REPLAY_DB_PATH, readonly=readonly)
+    return getattr(store, method)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Хранилище записанных ответов компилятора для TPPO_COMPILE_BACKEND=replay")
+    parser.add_argument("--store", type=Path, default=Path(os.environ.get(REPLAY_DB_ENV) or REPLAY_DB_PATH))
+    sub = parser.add_subparsers(dest="command", required=True)
+    imp = sub.add_parser("import", help="перенести ответы cl из training_data")
+    imp.add_argument("--db", type=Path, default=DB_SNAPSHOT_PATH)
+    sub.add_parser("stats", help="размер хранилища по источникам")
+    args = parser.parse_args()
+
+    store = ReplayStore(args.store)
+    if args.command == "import":
+        result = store.import_training_data(args.db)
+        print(f"added {result['added']}, skipped {result['skipped']} (strip_cpp_comments shifts lines)")
+    print(json.dumps(store.stats(), ensure_ascii=False, indent=2))
+    store.close()
+
+
+if __name__ == "__main__":
+    main()